@@ -9,8 +9,12 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 # Import modules
-from modules.config import ADMIN_USER_IDS
+from modules.config import ADMIN_USER_IDS, WEBHOOK_URL
 from modules.handlers import register_all_handlers
+from modules.services import start_background_services, stop_background_services
+from modules.utils.edit_dedup import EditDedupMiddleware
+from modules.utils.outbound import get_outbound
+from modules.webhook import run_webhook
 
 def setup_logging():
     """Setup logging configuration from environment variables"""
@@ -80,17 +84,30 @@ async def main():
         token=bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
     )
+    # Не отправлять правки сообщений, которые ничего не меняют
+    bot.session.middleware(EditDedupMiddleware())
+    # Лимиты Telegram: общий и по чатам, ожидание retry_after вместо ошибок 429
+    bot.session.middleware(get_outbound())
     
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
       # Register all handlers
     register_all_handlers(dp)
-    
+
+    # Background services (traffic sampler etc.)
+    dp.startup.register(start_background_services)
+    dp.shutdown.register(stop_background_services)
+
     try:
-        # Drop pending updates and start polling
-        await bot.delete_webhook(drop_pending_updates=True)
-        logger.info("Starting bot polling...")
-        await dp.start_polling(bot)
+        if WEBHOOK_URL:
+            # Telegram pushes updates to the embedded web server
+            logger.info("Starting bot in webhook mode...")
+            await run_webhook(bot, dp)
+        else:
+            # Drop pending updates and start polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Starting bot polling...")
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Critical error during polling: {e}", exc_info=True)
         raise
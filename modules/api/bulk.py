@@ -1,6 +1,7 @@
 import logging
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Awaitable, Callable, List, NamedTuple, Optional, Union
 from modules.api.client import RemnaAPI
+from modules.config import BULK_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -167,12 +168,12 @@ class BulkAPI:
             return None
     
     @staticmethod
-    async def bulk_update_users_inbounds(uuids: List[str], inbounds: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    async def bulk_update_users_inbounds(uuids: List[str], inbounds: List[str]) -> Optional[Dict[str, Any]]:
         """Bulk update users inbounds by UUIDs
         
         Args:
             uuids: List of user UUIDs to update
-            inbounds: List of inbound configurations
+            inbounds: UUIDs of inbounds that become the users' active inbounds
             
         Returns:
             Result of bulk inbounds update or None if error
@@ -355,6 +356,41 @@ class BulkAPI:
             logger.error(f"Error in bulk extend users expiry: {e}")
             return None
 
+class ChunkedResult(NamedTuple):
+    """Итог bulk-операции, выполненной пачками"""
+    succeeded: int
+    failed: int
+
+
+async def bulk_in_chunks(operation: Callable[[List[str]], Awaitable[Optional[Dict[str, Any]]]],
+                         uuids: List[str], chunk_size: int = BULK_CHUNK_SIZE,
+                         progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> ChunkedResult:
+    """Run a BulkAPI operation over uuids in chunks of chunk_size
+    
+    A failed chunk does not stop the remaining ones; its users are counted as failed.
+    
+    Args:
+        operation: BulkAPI method that takes a list of UUIDs
+        uuids: User UUIDs to process
+        chunk_size: UUIDs per request
+        progress: Called with (processed, total) after every chunk
+        
+    Returns:
+        Number of users in succeeded and failed chunks
+    """
+    chunk_size = max(1, chunk_size)
+    succeeded = failed = 0
+    for start in range(0, len(uuids), chunk_size):
+        chunk = uuids[start:start + chunk_size]
+        if await operation(chunk) is None:
+            failed += len(chunk)
+        else:
+            succeeded += len(chunk)
+        if progress is not None:
+            await progress(start + len(chunk), len(uuids))
+    return ChunkedResult(succeeded, failed)
+
+
 # Convenience функции для частых операций
 async def delete_expired_users() -> Optional[Dict[str, Any]]:
     """Delete all expired users"""
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from modules.api import users as users_api
+from modules.api.bulk import BulkAPI
+from modules.api.executor import run_bounded
+from modules.config import BULK_CHUNK_SIZE, MUTATION_COALESCE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+ENABLE = "enable"
+DISABLE = "disable"
+RESET_TRAFFIC = "reset_traffic"
+
+
+class Mutation(NamedTuple):
+    """Одиночный и bulk-вариант одного изменения пользователя"""
+    single: Callable[[str], Awaitable[Any]]
+    bulk: Callable[[List[str]], Awaitable[Any]]
+
+
+# У панели нет /users/bulk/enable и /disable — статус меняется через /users/bulk/update
+MUTATIONS: Dict[str, Mutation] = {
+    ENABLE: Mutation(users_api.enable_user, partial(BulkAPI.bulk_update_users, fields={"status": "ACTIVE"})),
+    DISABLE: Mutation(users_api.disable_user, partial(BulkAPI.bulk_update_users, fields={"status": "DISABLED"})),
+    RESET_TRAFFIC: Mutation(users_api.reset_user_traffic, BulkAPI.bulk_reset_user_traffic),
+}
+
+# Включение и выключение одного пользователя должны дойти до панели в порядке нажатий
+_CONFLICTS = {ENABLE: DISABLE, DISABLE: ENABLE}
+
+
+class _Batch:
+    def __init__(self, op: str):
+        self.op = op
+        self.waiters: Dict[str, asyncio.Future] = {}
+        # Пачки, которые должны выполниться раньше этой
+        self.after: List[asyncio.Task] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class MutationCoalescer:
+    """Buffer single-user mutations of the same type and send them as one bulk request
+
+    The first call of a type opens a window of window seconds; every call of
+    that type during the window joins the same batch. A batch of one user goes
+    to the per-user endpoint, larger batches to the bulk endpoint. Every caller
+    awaits its own result: if the bulk request fails, the batch is retried
+    per user so one bad UUID does not fail the others.
+    """
+
+    def __init__(self, window: float = MUTATION_COALESCE_WINDOW, max_batch: int = BULK_CHUNK_SIZE):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[str, _Batch] = {}
+        self._flushing = set()
+
+    async def submit(self, op: str, user_uuid: str) -> Any:
+        """Apply mutation op to one user
+
+        Returns:
+            Result of the per-user call, the bulk response, or None on error
+        """
+        mutation = MUTATIONS[op]
+        if self.window <= 0:
+            return await mutation.single(user_uuid)
+
+        batch = self._pending.get(op)
+        if batch is None:
+            batch = self._pending[op] = _Batch(op)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, op)
+
+        conflict = self._pending.get(_CONFLICTS.get(op))
+        if conflict is not None and user_uuid in conflict.waiters:
+            batch.after.append(self._flush(conflict.op))
+
+        waiter = batch.waiters.get(user_uuid)
+        if waiter is None:
+            waiter = batch.waiters[user_uuid] = asyncio.get_running_loop().create_future()
+        if len(batch.waiters) >= self.max_batch:
+            self._flush(op)
+        # shield: отмена одного обработчика не должна отменять общий результат
+        return await asyncio.shield(waiter)
+
+    def _flush(self, op: str) -> Optional[asyncio.Task]:
+        batch = self._pending.pop(op, None)
+        if batch is None:
+            return None
+        if batch.timer is not None:
+            batch.timer.cancel()
+        batch.task = asyncio.create_task(self._send(batch), name=f"coalesce-{op}")
+        self._flushing.add(batch.task)
+        batch.task.add_done_callback(self._flushing.discard)
+        return batch.task
+
+    async def _send(self, batch: _Batch):
+        if batch.after:
+            await asyncio.gather(*batch.after, return_exceptions=True)
+
+        mutation = MUTATIONS[batch.op]
+        uuids = list(batch.waiters)
+        results: Dict[str, Any] = {}
+        try:
+            if len(uuids) == 1:
+                results[uuids[0]] = await mutation.single(uuids[0])
+            else:
+                logger.info(f"Coalesced {len(uuids)} {batch.op} calls into one bulk request")
+                response = await mutation.bulk(uuids)
+                if response:
+                    results = dict.fromkeys(uuids, response)
+                else:
+                    logger.warning(f"Bulk {batch.op} failed, retrying {len(uuids)} users one by one")
+                    for task in await run_bounded(uuids, mutation.single, retries=0):
+                        results[task.item] = task.result
+        except Exception as e:
+            logger.error(f"Error sending coalesced {batch.op}: {e}")
+
+        for uuid, waiter in batch.waiters.items():
+            if not waiter.done():
+                waiter.set_result(results.get(uuid))
+
+    async def flush(self):
+        """Send every buffered batch now and wait for the responses"""
+        for op in list(self._pending):
+            self._flush(op)
+        if self._flushing:
+            await asyncio.gather(*list(self._flushing), return_exceptions=True)
+
+
+_coalescer: Optional[MutationCoalescer] = None
+
+
+def get_mutation_coalescer() -> MutationCoalescer:
+    """Shared coalescer for single-user mutations"""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = MutationCoalescer()
+    return _coalescer
+
+
+async def flush_mutations():
+    if _coalescer is not None:
+        await _coalescer.flush()
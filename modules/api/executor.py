@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, NamedTuple, Optional, TypeVar
+
+from modules.config import API_CONCURRENCY, API_RETRIES, API_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TaskResult(NamedTuple):
+    """Итог операции над одной сущностью"""
+    item: Any
+    result: Any
+    attempts: int
+
+    @property
+    def ok(self) -> bool:
+        return _succeeded(self.result)
+
+
+class BoundedResult(list):
+    """Список TaskResult в порядке входных элементов"""
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for task in self if task.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self) - self.succeeded
+
+    def failed_items(self) -> List[Any]:
+        return [task.item for task in self if not task.ok]
+
+
+def _succeeded(result: Any) -> bool:
+    # Методы API сообщают об ошибке через None или False
+    return result is not None and result is not False
+
+
+async def run_bounded(items: Iterable[T], operation: Callable[[T], Awaitable[Any]],
+                      concurrency: int = API_CONCURRENCY, retries: int = API_RETRIES,
+                      retry_delay: float = API_RETRY_DELAY,
+                      progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> BoundedResult:
+    """Apply a per-entity API operation to many items with bounded parallelism
+
+    At most concurrency operations are in flight at once. A call that returns
+    None/False or raises is retried up to retries times with exponential backoff;
+    a failed item does not stop the remaining ones. If progress raises (a
+    cancelled job), no new items are started and the exception is re-raised
+    once the calls in flight have finished.
+
+    Args:
+        items: Entities to process (UUIDs, dicts, ...)
+        operation: API method called with one item
+        concurrency: Maximum simultaneous requests to the panel
+        retries: Extra attempts for a failed item
+        retry_delay: Delay before the first retry in seconds, doubled on each next one
+        progress: Called with (processed, total) after every item
+
+    Returns:
+        TaskResult per item in the order of items
+    """
+    items = list(items)
+    total = len(items)
+    results: List[Optional[TaskResult]] = [None] * total
+    done = 0
+
+    async def attempt(item: T) -> TaskResult:
+        for number in range(1, max(0, retries) + 2):
+            try:
+                result = await operation(item)
+            except Exception as e:
+                logger.warning(f"Attempt {number} of {getattr(operation, '__name__', operation)} failed for {item}: {e}")
+                result = None
+            if _succeeded(result) or number > retries:
+                return TaskResult(item, result, number)
+            await asyncio.sleep(retry_delay * 2 ** (number - 1))
+
+    # Воркеры разбирают общий итератор — одновременно не больше concurrency запросов
+    queue = iter(enumerate(items))
+    stopped = False
+
+    async def worker():
+        nonlocal done, stopped
+        for index, item in queue:
+            if stopped:
+                return
+            results[index] = await attempt(item)
+            done += 1
+            if progress is not None:
+                try:
+                    await progress(done, total)
+                except BaseException:
+                    # Отмена задачи: новые элементы не берём, начатые запросы доводим до конца
+                    stopped = True
+                    raise
+
+    outcomes = await asyncio.gather(
+        *(worker() for _ in range(min(max(1, concurrency), total))), return_exceptions=True
+    )
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+    outcome = BoundedResult(results)
+    if outcome.failed:
+        logger.warning(f"{getattr(operation, '__name__', operation)}: {outcome.failed} of {total} items failed")
+    return outcome
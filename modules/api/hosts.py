@@ -342,6 +342,81 @@ async def bulk_restart_hosts(uuids):
         logger.error(f"Error bulk restarting hosts: {e}")
         return False
 
+async def bulk_delete_hosts(uuids):
+    """Массово удалить хосты по UUID"""
+    try:
+        if not uuids or not isinstance(uuids, list) or len(uuids) == 0:
+            logger.error("Host UUIDs list is empty or invalid")
+            return False
+            
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/hosts/bulk/delete"
+            data = {"uuids": uuids}
+            logger.info(f"Making direct API call to bulk delete hosts: {url}")
+            
+            response = await client.post(url, headers=_get_headers(), json=data)
+            
+            if response.status_code in [200, 201]:
+                logger.info(f"Bulk deleted {len(uuids)} hosts")
+                return True
+            else:
+                logger.error(f"API call failed with status {response.status_code}: {response.text}")
+                return False
+                
+    except Exception as e:
+        logger.error(f"Error bulk deleting hosts: {e}")
+        return False
+
+async def bulk_set_hosts_port(uuids, port):
+    """Массово задать порт хостам по UUID"""
+    try:
+        if not uuids or not isinstance(uuids, list) or len(uuids) == 0:
+            logger.error("Host UUIDs list is empty or invalid")
+            return False
+            
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/hosts/bulk/set-port"
+            data = {"uuids": uuids, "port": port}
+            logger.info(f"Making direct API call to bulk set hosts port: {url}")
+            
+            response = await client.post(url, headers=_get_headers(), json=data)
+            
+            if response.status_code in [200, 201]:
+                logger.info(f"Bulk set port {port} for {len(uuids)} hosts")
+                return True
+            else:
+                logger.error(f"API call failed with status {response.status_code}: {response.text}")
+                return False
+                
+    except Exception as e:
+        logger.error(f"Error bulk setting hosts port: {e}")
+        return False
+
+async def bulk_set_hosts_inbound(uuids, inbound_uuid):
+    """Массово привязать хосты к inbound'у по UUID"""
+    try:
+        if not uuids or not isinstance(uuids, list) or len(uuids) == 0:
+            logger.error("Host UUIDs list is empty or invalid")
+            return False
+            
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/hosts/bulk/set-inbound"
+            data = {"uuids": uuids, "inboundUuid": inbound_uuid}
+            logger.info(f"Making direct API call to bulk set hosts inbound: {url}")
+            
+            response = await client.post(url, headers=_get_headers(), json=data)
+            
+            if response.status_code in [200, 201]:
+                logger.info(f"Bulk set inbound {inbound_uuid} for {len(uuids)} hosts")
+                return True
+            else:
+                logger.error(f"API call failed with status {response.status_code}: {response.text}")
+                return False
+                
+    except Exception as e:
+        logger.error(f"Error bulk setting hosts inbound: {e}")
+        return False
+
 async def get_host_usage(host_uuid: str, start_date: str = None, end_date: str = None):
     """Получить статистику использования хоста"""
     try:
@@ -580,6 +655,18 @@ class HostsAPI:
     async def bulk_restart_hosts(uuids):
         return await bulk_restart_hosts(uuids)
     
+    @staticmethod
+    async def bulk_delete_hosts(uuids):
+        return await bulk_delete_hosts(uuids)
+    
+    @staticmethod
+    async def bulk_set_hosts_port(uuids, port):
+        return await bulk_set_hosts_port(uuids, port)
+    
+    @staticmethod
+    async def bulk_set_hosts_inbound(uuids, inbound_uuid):
+        return await bulk_set_hosts_inbound(uuids, inbound_uuid)
+    
     @staticmethod
     async def get_host_usage(host_uuid: str, start_date: str = None, end_date: str = None):
         return await get_host_usage(host_uuid, start_date, end_date)
@@ -284,7 +284,7 @@ async def enable_user(user_uuid: str):
             return None
             
         async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-            url = f"{API_BASE_URL}/users/{user_uuid}/enable"
+            url = f"{API_BASE_URL}/users/{user_uuid}/actions/enable"
             logger.info(f"Making direct API call to enable user: {url}")
             
             response = await client.post(url, headers=_get_headers())
@@ -313,7 +313,7 @@ async def disable_user(user_uuid: str):
             return None
             
         async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-            url = f"{API_BASE_URL}/users/{user_uuid}/disable"
+            url = f"{API_BASE_URL}/users/{user_uuid}/actions/disable"
             logger.info(f"Making direct API call to disable user: {url}")
             
             response = await client.post(url, headers=_get_headers())
@@ -334,6 +334,35 @@ async def disable_user(user_uuid: str):
         logger.error(f"Error disabling user {user_uuid}: {e}")
         return None
 
+async def reset_user_traffic(user_uuid: str):
+    """Сбросить использованный трафик пользователя"""
+    try:
+        if not user_uuid:
+            logger.error("User UUID is required")
+            return None
+            
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/users/{user_uuid}/actions/reset-traffic"
+            logger.info(f"Making direct API call to reset user traffic: {url}")
+            
+            response = await client.post(url, headers=_get_headers())
+            
+            if response.status_code in [200, 201]:
+                user_data = response.json()
+                logger.info(f"User {user_uuid} traffic reset successfully")
+                
+                # Парсим ответ API
+                if isinstance(user_data, dict) and 'response' in user_data:
+                    return user_data['response']
+                return user_data
+            else:
+                logger.error(f"Failed to reset traffic for user {user_uuid}. Status: {response.status_code}, Response: {response.text}")
+                return None
+                
+    except Exception as e:
+        logger.error(f"Error resetting traffic for user {user_uuid}: {e}")
+        return None
+
 async def get_users_count():
     """Получить количество пользователей"""
     try:
@@ -478,4 +507,75 @@ async def get_users_stats():
             'inactive': 0,
             'expired': 0,
             'total_traffic': 0
-        }
\ No newline at end of file
+        }
+
+async def get_user_usage_range(user_uuid: str, start: str, end: str):
+    """Получить использование трафика пользователем по дням и нодам за период
+
+    Args:
+        user_uuid: UUID пользователя
+        start: Начало периода (ISO 8601)
+        end: Конец периода (ISO 8601)
+
+    Returns:
+        Список записей {userUuid, nodeUuid, nodeName, total, date} или None при ошибке
+    """
+    try:
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/users/stats/usage/{user_uuid}/range"
+            logger.info(f"Making direct API call to: {url} ({start} - {end})")
+            
+            response = await client.get(url, headers=_get_headers(), params={'start': start, 'end': end})
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                # API может возвращать данные в формате {'response': [...]}
+                if isinstance(data, dict) and 'response' in data:
+                    data = data['response']
+                return data if isinstance(data, list) else []
+            else:
+                logger.error(f"Failed to get usage for user {user_uuid}. Status: {response.status_code}, Response: {response.text}")
+                return None
+                
+    except Exception as e:
+        logger.error(f"Error getting usage range for user {user_uuid}: {e}")
+        return None
+
+async def get_users_page(start: int, size: int):
+    """Получить одну страницу пользователей
+
+    Args:
+        start: Смещение от начала списка
+        size: Размер страницы
+
+    Returns:
+        Кортеж (список пользователей, общее количество) или None при ошибке
+    """
+    try:
+        async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
+            url = f"{API_BASE_URL}/users"
+            logger.info(f"Making direct API call to: {url} (start={start}, size={size})")
+            
+            response = await client.get(url, headers=_get_headers(), params={'start': start, 'size': size})
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                # API возвращает данные в формате {'response': {'total': X, 'users': [...]}}
+                if isinstance(data, dict) and 'response' in data:
+                    data = data['response']
+                if isinstance(data, dict):
+                    users = data.get('users') or data.get('data') or []
+                    return users, int(data.get('total') or len(users))
+                if isinstance(data, list):
+                    return data, len(data)
+                logger.error(f"Unexpected users page response structure: {type(data)}")
+                return None
+            else:
+                logger.error(f"Failed to get users page. Status: {response.status_code}, Response: {response.text}")
+                return None
+                
+    except Exception as e:
+        logger.error(f"Error getting users page (start={start}, size={size}): {e}")
+        return None
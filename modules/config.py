@@ -65,3 +65,80 @@ DASHBOARD_SHOW_UPTIME = os.getenv("DASHBOARD_SHOW_UPTIME", "true").lower() == "t
 # Настройки поиска пользователей
 ENABLE_PARTIAL_SEARCH = os.getenv("ENABLE_PARTIAL_SEARCH", "true").lower() == "true"
 SEARCH_MIN_LENGTH = int(os.getenv("SEARCH_MIN_LENGTH", "2"))
+
+# Локальное хранилище данных бота (метрики, журналы)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Сбор метрик трафика
+ENABLE_METRICS_SAMPLER = os.getenv("ENABLE_METRICS_SAMPLER", "true").lower() == "true"
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", os.path.join(DATA_DIR, "metrics.db"))
+METRICS_SAMPLE_INTERVAL = int(os.getenv("METRICS_SAMPLE_INTERVAL", "60"))
+
+# Сроки хранения для каждого уровня детализации метрик
+METRICS_RAW_RETENTION_HOURS = int(os.getenv("METRICS_RAW_RETENTION_HOURS", "48"))
+METRICS_1M_RETENTION_DAYS = int(os.getenv("METRICS_1M_RETENTION_DAYS", "8"))
+METRICS_1H_RETENTION_DAYS = int(os.getenv("METRICS_1H_RETENTION_DAYS", "95"))
+METRICS_1D_RETENTION_DAYS = int(os.getenv("METRICS_1D_RETENTION_DAYS", "1830"))
+
+# Кэш истории использования трафика пользователями (секунды)
+USER_USAGE_CACHE_TTL = int(os.getenv("USER_USAGE_CACHE_TTL", "600"))
+USER_USAGE_TODAY_TTL = int(os.getenv("USER_USAGE_TODAY_TTL", "60"))
+
+# Локальный снимок пользователей (для алертов, графиков и кэшей)
+ENABLE_USER_SNAPSHOT = os.getenv("ENABLE_USER_SNAPSHOT", "true").lower() == "true"
+USER_SNAPSHOT_INTERVAL = int(os.getenv("USER_SNAPSHOT_INTERVAL", "300"))
+
+# Отрисовка графиков
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "1"))
+
+# Массовые операции: сколько UUID отправлять в одном bulk-запросе
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# Сколько одиночных запросов изменения пользователей выполнять одновременно
+BULK_UPDATE_CONCURRENCY = int(os.getenv("BULK_UPDATE_CONCURRENCY", "5"))
+# Поштучные операции над многими сущностями (без bulk-эндпоинта)
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "5"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_RETRY_DELAY = float(os.getenv("API_RETRY_DELAY", "1"))
+# Окно (сек), в котором одиночные включения/выключения/сбросы трафика
+# собираются в один bulk-запрос; 0 — отправлять сразу
+MUTATION_COALESCE_WINDOW = float(os.getenv("MUTATION_COALESCE_WINDOW", "0.3"))
+# Импорт пользователей из файла: максимум создаваемых за один раз
+IMPORT_MAX_USERS = int(os.getenv("IMPORT_MAX_USERS", "10000"))
+
+# Фоновые задачи массовых операций
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", "2"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "20"))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+
+# Общий кэш экранов статистики
+SCREEN_CACHE_TTL = int(os.getenv("SCREEN_CACHE_TTL", "30"))
+
+# Алерты администраторам
+ENABLE_ALERTS = os.getenv("ENABLE_ALERTS", "true").lower() == "true"
+ALERT_CHECK_INTERVAL = int(os.getenv("ALERT_CHECK_INTERVAL", "60"))
+ALERT_COOLDOWN = int(os.getenv("ALERT_COOLDOWN", "3600"))
+ALERT_TRAFFIC_THRESHOLD = int(os.getenv("ALERT_TRAFFIC_THRESHOLD", "90"))
+ALERT_EXPIRY_DAYS = int(os.getenv("ALERT_EXPIRY_DAYS", "3"))
+
+# Наблюдатель за нодами
+ENABLE_NODE_WATCHER = os.getenv("ENABLE_NODE_WATCHER", "true").lower() == "true"
+NODE_WATCH_INTERVAL = int(os.getenv("NODE_WATCH_INTERVAL", "30"))
+NODE_WATCH_DEBOUNCE = int(os.getenv("NODE_WATCH_DEBOUNCE", "2"))
+
+# Живой мониторинг
+LIVE_MONITOR_MIN_INTERVAL = int(os.getenv("LIVE_MONITOR_MIN_INTERVAL", "5"))
+LIVE_MONITOR_MAX_INTERVAL = int(os.getenv("LIVE_MONITOR_MAX_INTERVAL", "60"))
+LIVE_MONITOR_IDLE_TIMEOUT = int(os.getenv("LIVE_MONITOR_IDLE_TIMEOUT", "600"))
+
+# Ограничение исходящих запросов к Telegram
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+
+# Webhook (если WEBHOOK_URL не задан, бот работает через long polling)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENT = int(os.getenv("WEBHOOK_MAX_CONCURRENT", "20"))
@@ -11,9 +11,16 @@ from .stats_handlers import router as stats_router
 from .host_handlers import router as host_router
 from .inbound_handlers import router as inbound_router
 from .bulk_handlers import router as bulk_router
+from .job_handlers import router as job_router
+
+from modules.services.live_monitor import LiveMonitorMiddleware
+from .callback_routes import CallbackRouteTable
 
 def register_all_handlers(dp: Dispatcher):
     """Register all handlers with the dispatcher"""
+    # Уход с экрана мониторинга останавливает автообновление этого сообщения
+    dp.callback_query.outer_middleware(LiveMonitorMiddleware())
+
     dp.include_router(start_router)
     dp.include_router(menu_router)
     dp.include_router(user_router)
@@ -22,3 +29,7 @@ def register_all_handlers(dp: Dispatcher):
     dp.include_router(host_router)
     dp.include_router(inbound_router)
     dp.include_router(bulk_router)
+    dp.include_router(job_router)
+
+    # Выбор обработчика callback поиском по таблице вместо перебора фильтров всех роутеров
+    dp.callback_query.outer_middleware(CallbackRouteTable(dp))
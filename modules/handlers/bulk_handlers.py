@@ -2,13 +2,21 @@ from aiogram import Router, types, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
 import logging
-import asyncio
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import BulkStates
 from modules.api.client import RemnaAPI
+from modules.api.bulk import BulkAPI
+from modules.config import BULK_CHUNK_SIZE
+from modules.services import rollback
+from modules.services.bulk_planner import UpdatePlan, run_update_step
+from modules.services.durable_jobs import Step, register_job_kind, submit_durable_job
+from modules.services.job_journal import StepRecord
+from modules.services.jobs import Job
+from modules.services.user_pages import get_user_pager, iter_user_pages
 from modules.utils.formatters_aiogram import (
     format_bytes, format_datetime, escape_markdown
 )
@@ -47,6 +55,7 @@ async def show_bulk_menu(callback: types.CallbackQuery):
     builder.row(types.InlineKeyboardButton(text="🖥️ Операции с серверами", callback_data="bulk_nodes"))
     
     # Статистика и экспорт
+    builder.row(types.InlineKeyboardButton(text="📋 Фоновые задачи", callback_data="jobs"))
     builder.row(
         types.InlineKeyboardButton(text="📊 Статистика операций", callback_data="bulk_stats"),
         types.InlineKeyboardButton(text="📄 Экспорт данных", callback_data="bulk_export")
@@ -105,6 +114,150 @@ async def show_bulk_menu(callback: types.CallbackQuery):
         reply_markup=builder.as_markup()
     )
 
+# ================ USER SELECTION ================
+
+# Сколько пользователей показывать в подтверждении операции
+SAMPLE_SIZE = 5
+
+# Статусы, которые считаются неактивными при массовом удалении
+INACTIVE_STATUSES = ("DISABLED", "LIMITED", "EXPIRED")
+
+# Этап фоновой задачи, на котором отбираются пользователи
+SCAN_STAGE = "🔍 Просматриваю пользователей..."
+
+
+class UserSelection(NamedTuple):
+    """Пользователи, отобранные для массовой операции"""
+    uuids: List[str]
+    samples: List[Dict]
+    total: int
+
+
+async def select_users(predicate: Callable[[Dict], bool],
+                       progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> UserSelection:
+    """Обойти всех пользователей панели постранично и отобрать подходящих
+
+    В памяти остаются только UUID и несколько примеров для подтверждения.
+    """
+    uuids, samples, total = [], [], 0
+    async for users, done, total in iter_user_pages():
+        for user in users:
+            if user.get('uuid') and predicate(user):
+                uuids.append(user['uuid'])
+                if len(samples) < SAMPLE_SIZE:
+                    samples.append(user)
+        if progress is not None:
+            await progress(done, total)
+    return UserSelection(uuids, samples, total)
+
+
+def _expire_date(user: Dict) -> Optional[datetime]:
+    expire_at = user.get('expireAt')
+    if not expire_at:
+        return None
+    try:
+        return datetime.fromisoformat(expire_at.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def _is_expired(user: Dict) -> bool:
+    expire_date = _expire_date(user)
+    return expire_date is not None and expire_date < datetime.now(timezone.utc)
+
+
+def _is_overlimit(user: Dict) -> bool:
+    traffic_limit = user.get('trafficLimitBytes') or 0
+    return traffic_limit > 0 and (user.get('usedTrafficBytes') or 0) >= traffic_limit
+
+
+def _is_inactive(user: Dict) -> bool:
+    return user.get('status') in INACTIVE_STATUSES
+
+
+def _affected_rows(result: Optional[Dict]) -> Optional[int]:
+    """Число затронутых пользователей из ответа bulk-эндпоинта, если панель его вернула"""
+    if not isinstance(result, dict):
+        return None
+    response = result.get('response', result)
+    if isinstance(response, dict) and isinstance(response.get('affectedRows'), int):
+        return response['affectedRows']
+    return None
+
+
+def _back_to_bulk_markup() -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
+    ]])
+
+
+async def _submit_job(callback: types.CallbackQuery, kind: str, title: str, params: Optional[Dict] = None):
+    """Выполнить операцию фоновой задачей в сообщении подтверждения"""
+    job = await submit_durable_job(
+        kind, title, params or {}, callback.message,
+        done_markup=_back_to_bulk_markup(),
+        started_by=callback.from_user.id
+    )
+    if job is None:
+        await callback.answer("ℹ️ Эта операция уже запущена, см. /jobs", show_alert=True)
+    else:
+        await callback.answer()
+
+
+async def _submit_confirmed_delete(callback: types.CallbackQuery, state: FSMContext, kind: str, title: str):
+    """Запустить удаление только тех пользователей, что были на экране подтверждения"""
+    key = f"{kind}_uuids"
+    uuids = (await state.get_data()).get(key)
+    if not uuids:
+        await callback.answer("❌ Данные подтверждения устарели, откройте операцию заново", show_alert=True)
+        return
+    await state.update_data(**{key: None})
+    await _submit_job(callback, kind, title, {"uuids": uuids})
+
+
+def _confirmed_steps(params: Dict, selection: UserSelection) -> List[Step]:
+    """Шаги удаления подтверждённых пользователей, которые всё ещё подходят под условие
+
+    Пользователи, попавшие под условие уже после подтверждения, не удаляются.
+    Список UUID из params убирается, в итоге остаётся только число пропущенных.
+    """
+    confirmed = set(params.pop("uuids", None) or ())
+    uuids = [uuid for uuid in selection.uuids if uuid in confirmed]
+    params["skipped"] = len(confirmed) - len(uuids)
+    return _uuid_steps(uuids)
+
+
+def _skipped_line(params: Dict) -> str:
+    skipped = params.get("skipped")
+    return f"• Пропущено (изменились после подтверждения): {skipped}\n" if skipped else ""
+
+
+def _uuid_steps(uuids: List[str]) -> List[Step]:
+    """Шаги задачи: пачки UUID по BULK_CHUNK_SIZE"""
+    return [
+        ({"uuids": uuids[start:start + BULK_CHUNK_SIZE]}, len(uuids[start:start + BULK_CHUNK_SIZE]))
+        for start in range(0, len(uuids), BULK_CHUNK_SIZE)
+    ]
+
+
+def _uuid_step(operation: Callable[[List[str]], Awaitable[Optional[Dict]]]):
+    """Шаг задачи, который отправляет пачку UUID одним bulk-запросом"""
+    async def run_step(payload: Dict, progress) -> Tuple[int, int]:
+        uuids = payload["uuids"]
+        if await operation(uuids) is None:
+            return 0, len(uuids)
+        return len(uuids), 0
+    return run_step
+
+
+def _step_totals(steps: List[StepRecord]) -> Tuple[int, int]:
+    return sum(step.succeeded for step in steps), sum(step.failed for step in steps)
+
+
+def _invalidate_user_views():
+    """Сбросить загруженные страницы пользователей после массового изменения"""
+    get_user_pager().invalidate()
+
 # ================ TRAFFIC OPERATIONS ================
 
 @router.callback_query(F.data == "bulk_reset_all_traffic", AuthFilter())
@@ -113,11 +266,7 @@ async def bulk_reset_all_traffic_confirm(callback: types.CallbackQuery, state: F
     await callback.answer()
     
     try:
-        sdk = RemnaAPI.get_sdk()
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        total_users = len(users_response.users) if users_response and users_response.users else 0
-        users_with_traffic = sum(1 for user in users_response.users if user.used_traffic and user.used_traffic > 0) if users_response and users_response.users else 0
+        selection = await select_users(lambda user: (user.get('usedTrafficBytes') or 0) > 0)
         
         builder = InlineKeyboardBuilder()
         builder.row(
@@ -127,8 +276,8 @@ async def bulk_reset_all_traffic_confirm(callback: types.CallbackQuery, state: F
         
         message = f"🔄 **Сброс трафика всем пользователям**\n\n"
         message += f"**Затронуто будет:**\n"
-        message += f"• Всего пользователей: {total_users}\n"
-        message += f"• С использованным трафиком: {users_with_traffic}\n\n"
+        message += f"• Всего пользователей: {selection.total}\n"
+        message += f"• С использованным трафиком: {len(selection.uuids)}\n\n"
         message += f"⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n"
         message += f"У всех пользователей будет обнулен счетчик использованного трафика.\n\n"
         message += f"Продолжить?"
@@ -144,88 +293,37 @@ async def bulk_reset_all_traffic_confirm(callback: types.CallbackQuery, state: F
 
 @router.callback_query(F.data == "confirm_reset_all_traffic", AuthFilter())
 async def confirm_reset_all_traffic(callback: types.CallbackQuery, state: FSMContext):
-    """Reset traffic for all users"""
-    await callback.answer()
-    await callback.message.edit_text("🔄 Сбрасываю трафик всем пользователям...")
+    """Reset traffic for all users with a single bulk request"""
+    await _submit_job(callback, "reset_all_traffic", "🔄 Сброс трафика всем пользователям")
+
+async def _plan_reset_all_traffic(job: Job, params: Dict) -> List[Step]:
+    # Один запрос без списка пользователей — число затронутых сообщит панель
+    return [({}, 0)]
+
+async def _reset_all_traffic_step(payload: Dict, progress) -> Tuple[int, int]:
+    result = await BulkAPI.bulk_reset_all_users_traffic()
+    if result is None:
+        return 0, 1
+    return _affected_rows(result) or 0, 0
+
+def _reset_all_traffic_summary(params: Dict, steps: List[StepRecord]) -> str:
+    affected, failed = _step_totals(steps)
+    if failed:
+        return ("❌ **Не удалось сбросить трафик**\n\n"
+                "Панель вернула ошибку, подробности в логах бота.")
     
-    try:
-        sdk = RemnaAPI.get_sdk()
-        
-        # Получаем всех пользователей
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        if not users_response or not users_response.users:
-            await callback.message.edit_text(
-                "❌ Пользователи не найдены",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Сбрасываем трафик по частям для избежания таймаутов
-        success_count = 0
-        error_count = 0
-        total_users = len(users_response.users)
-        
-        # Обрабатываем пользователей группами по 10
-        for i in range(0, total_users, 10):
-            batch = users_response.users[i:i+10]
-            
-            # Обновляем прогресс
-            if i > 0:
-                progress = (i / total_users) * 100
-                await callback.message.edit_text(
-                    f"🔄 Сбрасываю трафик... {progress:.1f}% ({i}/{total_users})"
-                )
-            
-            # Обрабатываем текущую группу
-            for user in batch:
-                try:
-                    if user.used_traffic and user.used_traffic > 0:
-                        # Сбрасываем трафик через SDK
-                        success = await sdk.users.reset_user_traffic(user.uuid)
-                        if success:
-                            success_count += 1
-                        else:
-                            error_count += 1
-                except Exception as e:
-                    logger.error(f"Error resetting traffic for user {user.uuid}: {e}")
-                    error_count += 1
-            
-            # Небольшая пауза между группами
-            await asyncio.sleep(0.1)
-        
-        # Результат операции
-        builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk"))
-        
-        if success_count > 0:
-            message = f"✅ **Сброс трафика завершен**\n\n"
-            message += f"• Успешно обработано: {success_count}\n"
-            if error_count > 0:
-                message += f"• Ошибок: {error_count}\n"
-            message += f"• Всего пользователей: {total_users}"
-        else:
-            message = f"❌ **Не удалось сбросить трафик**\n\n"
-            message += f"Возможные причины:\n"
-            message += f"• Нет пользователей с трафиком\n"
-            message += f"• Ошибки API\n"
-            message += f"• Проблемы подключения"
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in bulk traffic reset: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при сбросе трафика",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-            ]])
-        )
+    message = f"✅ **Сброс трафика завершен**\n\n"
+    if affected:
+        message += f"• Обработано пользователей: {affected}"
+    else:
+        message += f"• Трафик сброшен всем пользователям"
+    return message
+
+register_job_kind(
+    "reset_all_traffic", "🔄 Сбрасываю трафик всем пользователям...",
+    _plan_reset_all_traffic, _reset_all_traffic_step, _reset_all_traffic_summary,
+    after=_invalidate_user_views
+)
 
 # ================ RESET OVERLIMIT TRAFFIC ================
 
@@ -235,20 +333,12 @@ async def bulk_reset_overlimit_confirm(callback: types.CallbackQuery, state: FSM
     await callback.answer()
     
     try:
-        sdk = RemnaAPI.get_sdk()
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
+        selection = await select_users(_is_overlimit)
         
-        if not users_response or not users_response.users:
+        if not selection.total:
             await callback.answer("❌ Пользователи не найдены", show_alert=True)
             return
         
-        # Находим пользователей, превысивших лимит
-        overlimit_users = []
-        for user in users_response.users:
-            if user.traffic_limit and user.used_traffic:
-                if user.used_traffic >= user.traffic_limit:
-                    overlimit_users.append(user)
-        
         builder = InlineKeyboardBuilder()
         builder.row(
             types.InlineKeyboardButton(text="✅ Да, сбросить превысившим", callback_data="confirm_reset_overlimit"),
@@ -256,18 +346,20 @@ async def bulk_reset_overlimit_confirm(callback: types.CallbackQuery, state: FSM
         )
         
         message = f"⚡ **Сброс трафика пользователям, превысившим лимит**\n\n"
-        message += f"**Будет обработано:** {len(overlimit_users)} пользователей\n\n"
+        message += f"**Будет обработано:** {len(selection.uuids)} пользователей\n\n"
         
-        if len(overlimit_users) > 0:
+        if selection.samples:
             # Показываем примеры пользователей для сброса
             message += f"**Примеры пользователей:**\n"
-            for i, user in enumerate(overlimit_users[:5]):
-                usage_percent = (user.used_traffic / user.traffic_limit * 100) if user.traffic_limit > 0 else 0
-                traffic_info = f" ({format_bytes(user.used_traffic)}/{format_bytes(user.traffic_limit)} - {usage_percent:.1f}%)"
-                message += f"• {escape_markdown(user.username)}{traffic_info}\n"
+            for user in selection.samples:
+                used_traffic = user.get('usedTrafficBytes') or 0
+                traffic_limit = user.get('trafficLimitBytes') or 0
+                usage_percent = used_traffic / traffic_limit * 100
+                traffic_info = f" ({format_bytes(used_traffic)}/{format_bytes(traffic_limit)} - {usage_percent:.1f}%)"
+                message += f"• {escape_markdown(user.get('username', ''))}{traffic_info}\n"
             
-            if len(overlimit_users) > 5:
-                message += f"• ... и еще {len(overlimit_users) - 5}\n"
+            if len(selection.uuids) > len(selection.samples):
+                message += f"• ... и еще {len(selection.uuids) - len(selection.samples)}\n"
         
         message += f"\n💡 **Действие:** Трафик будет сброшен до 0, лимиты останутся без изменений.\n"
         message += f"⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n\n"
@@ -284,88 +376,31 @@ async def bulk_reset_overlimit_confirm(callback: types.CallbackQuery, state: FSM
 
 @router.callback_query(F.data == "confirm_reset_overlimit", AuthFilter())
 async def confirm_reset_overlimit(callback: types.CallbackQuery, state: FSMContext):
-    """Reset traffic for users who exceeded limit"""
-    await callback.answer()
-    await callback.message.edit_text("⚡ Сбрасываю трафик пользователям, превысившим лимит...")
+    """Reset traffic for users who exceeded limit in bulk chunks"""
+    await _submit_job(callback, "reset_overlimit", "⚡ Сброс трафика превысившим лимит")
+
+async def _plan_reset_overlimit(job: Job, params: Dict) -> List[Step]:
+    selection = await select_users(_is_overlimit, progress=job.progress(SCAN_STAGE))
+    return _uuid_steps(selection.uuids)
+
+def _reset_overlimit_summary(params: Dict, steps: List[StepRecord]) -> str:
+    if not steps:
+        return "ℹ️ Пользователей, превысивших лимит, не найдено"
     
-    try:
-        sdk = RemnaAPI.get_sdk()
-        
-        # Получаем всех пользователей
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        if not users_response or not users_response.users:
-            await callback.message.edit_text(
-                "❌ Пользователи не найдены",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Фильтруем пользователей, превысивших лимит
-        overlimit_users = []
-        for user in users_response.users:
-            if user.traffic_limit and user.used_traffic:
-                if user.used_traffic >= user.traffic_limit:
-                    overlimit_users.append(user)
-        
-        if not overlimit_users:
-            await callback.message.edit_text(
-                "ℹ️ Пользователей, превысивших лимит, не найдено",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Сбрасываем трафик превысившим лимит
-        success_count = 0
-        error_count = 0
-        
-        for i, user in enumerate(overlimit_users):
-            try:
-                # Обновляем прогресс каждые 5 пользователей
-                if i > 0 and i % 5 == 0:
-                    progress = (i / len(overlimit_users)) * 100
-                    await callback.message.edit_text(
-                        f"⚡ Сбрасываю трафик превысившим... {progress:.1f}% ({i}/{len(overlimit_users)})"
-                    )
-                
-                success = await sdk.users.reset_user_traffic(user.uuid)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error resetting traffic for overlimit user {user.uuid}: {e}")
-                error_count += 1
-        
-        # Результат операции
-        builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk"))
-        
-        message = f"✅ **Сброс трафика превысившим лимит завершен**\n\n"
-        message += f"• Успешно сброшено: {success_count}\n"
-        if error_count > 0:
-            message += f"• Ошибок: {error_count}\n"
-        message += f"• Всего обработано: {len(overlimit_users)}\n\n"
-        message += f"💡 **Результат:** Пользователи могут снова использовать VPN."
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in bulk reset overlimit: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при сбросе трафика превысивших лимит",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-            ]])
-        )
+    succeeded, failed = _step_totals(steps)
+    message = f"✅ **Сброс трафика превысившим лимит завершен**\n\n"
+    message += f"• Успешно сброшено: {succeeded}\n"
+    if failed > 0:
+        message += f"• Ошибок: {failed}\n"
+    message += f"• Всего обработано: {succeeded + failed}\n\n"
+    message += f"💡 **Результат:** Пользователи могут снова использовать VPN."
+    return message
+
+register_job_kind(
+    "reset_overlimit", "⚡ Сбрасываю трафик превысившим...",
+    _plan_reset_overlimit, _uuid_step(BulkAPI.bulk_reset_user_traffic), _reset_overlimit_summary,
+    after=_invalidate_user_views
+)
 
 # ================ DELETE OPERATIONS ================
 
@@ -375,15 +410,13 @@ async def bulk_delete_inactive_confirm(callback: types.CallbackQuery, state: FSM
     await callback.answer()
     
     try:
-        sdk = RemnaAPI.get_sdk()
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
+        selection = await select_users(_is_inactive)
+        await state.update_data(delete_inactive_uuids=selection.uuids)
         
-        if not users_response or not users_response.users:
+        if not selection.total:
             await callback.answer("❌ Пользователи не найдены", show_alert=True)
             return
         
-        inactive_users = [user for user in users_response.users if not user.is_active]
-        
         builder = InlineKeyboardBuilder()
         builder.row(
             types.InlineKeyboardButton(text="✅ Да, удалить неактивных", callback_data="confirm_delete_inactive"),
@@ -391,16 +424,16 @@ async def bulk_delete_inactive_confirm(callback: types.CallbackQuery, state: FSM
         )
         
         message = f"❌ **Удаление неактивных пользователей**\n\n"
-        message += f"**Будет удалено:** {len(inactive_users)} пользователей\n\n"
+        message += f"**Будет удалено:** {len(selection.uuids)} пользователей\n\n"
         
-        if len(inactive_users) > 0:
+        if selection.samples:
             # Показываем примеры пользователей для удаления
             message += f"**Примеры пользователей:**\n"
-            for i, user in enumerate(inactive_users[:5]):
-                message += f"• {escape_markdown(user.username)}\n"
+            for user in selection.samples:
+                message += f"• {escape_markdown(user.get('username', ''))}\n"
             
-            if len(inactive_users) > 5:
-                message += f"• ... и еще {len(inactive_users) - 5}\n"
+            if len(selection.uuids) > len(selection.samples):
+                message += f"• ... и еще {len(selection.uuids) - len(selection.samples)}\n"
         
         message += f"\n⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n"
         message += f"Все неактивные пользователи будут удалены из системы.\n\n"
@@ -417,83 +450,31 @@ async def bulk_delete_inactive_confirm(callback: types.CallbackQuery, state: FSM
 
 @router.callback_query(F.data == "confirm_delete_inactive", AuthFilter())
 async def confirm_delete_inactive(callback: types.CallbackQuery, state: FSMContext):
-    """Delete all inactive users"""
-    await callback.answer()
-    await callback.message.edit_text("❌ Удаляю неактивных пользователей...")
+    """Delete the confirmed inactive users in bulk chunks"""
+    await _submit_confirmed_delete(callback, state, "delete_inactive", "❌ Удаление неактивных пользователей")
+
+async def _plan_delete_inactive(job: Job, params: Dict) -> List[Step]:
+    selection = await select_users(_is_inactive, progress=job.progress(SCAN_STAGE))
+    return _confirmed_steps(params, selection)
+
+def _delete_inactive_summary(params: Dict, steps: List[StepRecord]) -> str:
+    if not steps:
+        return "ℹ️ Подтвержденные пользователи уже не неактивны, удалять некого"
     
-    try:
-        sdk = RemnaAPI.get_sdk()
-        
-        # Получаем всех пользователей
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        if not users_response or not users_response.users:
-            await callback.message.edit_text(
-                "❌ Пользователи не найдены",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Фильтруем неактивных пользователей
-        inactive_users = [user for user in users_response.users if not user.is_active]
-        
-        if not inactive_users:
-            await callback.message.edit_text(
-                "ℹ️ Неактивных пользователей не найдено",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Удаляем пользователей
-        success_count = 0
-        error_count = 0
-        
-        for i, user in enumerate(inactive_users):
-            try:
-                # Обновляем прогресс каждые 5 пользователей
-                if i > 0 and i % 5 == 0:
-                    progress = (i / len(inactive_users)) * 100
-                    await callback.message.edit_text(
-                        f"❌ Удаляю неактивных... {progress:.1f}% ({i}/{len(inactive_users)})"
-                    )
-                
-                success = await sdk.users.delete_user(user.uuid)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error deleting user {user.uuid}: {e}")
-                error_count += 1
-        
-        # Результат операции
-        builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk"))
-        
-        message = f"✅ **Удаление неактивных завершено**\n\n"
-        message += f"• Успешно удалено: {success_count}\n"
-        if error_count > 0:
-            message += f"• Ошибок: {error_count}\n"
-        message += f"• Всего обработано: {len(inactive_users)}"
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in bulk delete inactive: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при удалении неактивных пользователей",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-            ]])
-        )
+    succeeded, failed = _step_totals(steps)
+    message = f"✅ **Удаление неактивных завершено**\n\n"
+    message += f"• Успешно удалено: {succeeded}\n"
+    if failed > 0:
+        message += f"• Ошибок: {failed}\n"
+    message += _skipped_line(params)
+    message += f"• Всего обработано: {succeeded + failed}"
+    return message
+
+register_job_kind(
+    "delete_inactive", "❌ Удаляю неактивных...",
+    _plan_delete_inactive, _uuid_step(BulkAPI.bulk_delete_users), _delete_inactive_summary,
+    after=_invalidate_user_views
+)
 
 @router.callback_query(F.data == ("bulk_delete_expired"), AuthFilter())
 async def bulk_delete_expired_confirm(callback: types.CallbackQuery, state: FSMContext):
@@ -501,26 +482,13 @@ async def bulk_delete_expired_confirm(callback: types.CallbackQuery, state: FSMC
     await callback.answer()
     
     try:
-        sdk = RemnaAPI.get_sdk()
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
+        selection = await select_users(_is_expired)
+        await state.update_data(delete_expired_uuids=selection.uuids)
         
-        if not users_response or not users_response.users:
+        if not selection.total:
             await callback.answer("❌ Пользователи не найдены", show_alert=True)
             return
         
-        # Находим истекших пользователей
-        now = datetime.now()
-        expired_users = []
-        
-        for user in users_response.users:
-            if user.expire_at:
-                try:
-                    expire_date = datetime.fromisoformat(user.expire_at.replace('Z', '+00:00'))
-                    if expire_date < now:
-                        expired_users.append(user)
-                except:
-                    pass
-        
         builder = InlineKeyboardBuilder()
         builder.row(
             types.InlineKeyboardButton(text="✅ Да, удалить истекших", callback_data="confirm_delete_expired"),
@@ -528,23 +496,18 @@ async def bulk_delete_expired_confirm(callback: types.CallbackQuery, state: FSMC
         )
         
         message = f"❌ **Удаление пользователей с истекшим сроком**\n\n"
-        message += f"**Будет удалено:** {len(expired_users)} пользователей\n\n"
+        message += f"**Будет удалено:** {len(selection.uuids)} пользователей\n\n"
         
-        if len(expired_users) > 0:
+        if selection.samples:
             # Показываем примеры пользователей для удаления
             message += f"**Примеры пользователей:**\n"
-            for i, user in enumerate(expired_users[:5]):
-                expire_date = ""
-                if user.expire_at:
-                    try:
-                        expire_dt = datetime.fromisoformat(user.expire_at.replace('Z', '+00:00'))
-                        expire_date = f" (истек {expire_dt.strftime('%d.%m.%Y')})"
-                    except:
-                        pass
-                message += f"• {escape_markdown(user.username)}{expire_date}\n"
+            for user in selection.samples:
+                expire_date = _expire_date(user)
+                expire_info = f" (истек {expire_date.strftime('%d.%m.%Y')})" if expire_date else ""
+                message += f"• {escape_markdown(user.get('username', ''))}{expire_info}\n"
             
-            if len(expired_users) > 5:
-                message += f"• ... и еще {len(expired_users) - 5}\n"
+            if len(selection.uuids) > len(selection.samples):
+                message += f"• ... и еще {len(selection.uuids) - len(selection.samples)}\n"
         
         message += f"\n⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n"
         message += f"Все пользователи с истекшим сроком будут удалены из системы.\n\n"
@@ -561,106 +524,69 @@ async def bulk_delete_expired_confirm(callback: types.CallbackQuery, state: FSMC
 
 @router.callback_query(F.data == "confirm_delete_expired", AuthFilter())
 async def confirm_delete_expired(callback: types.CallbackQuery, state: FSMContext):
-    """Delete all expired users"""
-    await callback.answer()
-    await callback.message.edit_text("❌ Удаляю пользователей с истекшим сроком...")
+    """Delete the confirmed expired users in bulk chunks"""
+    await _submit_confirmed_delete(callback, state, "delete_expired", "❌ Удаление пользователей с истекшим сроком")
+
+async def _plan_delete_expired(job: Job, params: Dict) -> List[Step]:
+    selection = await select_users(_is_expired, progress=job.progress(SCAN_STAGE))
+    return _confirmed_steps(params, selection)
+
+def _delete_expired_summary(params: Dict, steps: List[StepRecord]) -> str:
+    if not steps:
+        return "ℹ️ Подтвержденные пользователи уже не истекшие, удалять некого"
     
-    try:
-        sdk = RemnaAPI.get_sdk()
-        
-        # Получаем всех пользователей
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        if not users_response or not users_response.users:
-            await callback.message.edit_text(
-                "❌ Пользователи не найдены",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Фильтруем истекших пользователей
-        now = datetime.now()
-        expired_users = []
-        
-        for user in users_response.users:
-            if user.expire_at:
-                try:
-                    expire_date = datetime.fromisoformat(user.expire_at.replace('Z', '+00:00'))
-                    if expire_date < now:
-                        expired_users.append(user)
-                except:
-                    pass
-        
-        if not expired_users:
-            await callback.message.edit_text(
-                "ℹ️ Пользователей с истекшим сроком не найдено",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Удаляем пользователей
-        success_count = 0
-        error_count = 0
-        
-        for i, user in enumerate(expired_users):
-            try:
-                # Обновляем прогресс каждые 5 пользователей
-                if i > 0 and i % 5 == 0:
-                    progress = (i / len(expired_users)) * 100
-                    await callback.message.edit_text(
-                        f"❌ Удаляю истекших... {progress:.1f}% ({i}/{len(expired_users)})"
-                    )
-                
-                success = await sdk.users.delete_user(user.uuid)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error deleting expired user {user.uuid}: {e}")
-                error_count += 1
-        
-        # Результат операции
-        builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk"))
-        
-        message = f"✅ **Удаление истекших завершено**\n\n"
-        message += f"• Успешно удалено: {success_count}\n"
-        if error_count > 0:
-            message += f"• Ошибок: {error_count}\n"
-        message += f"• Всего обработано: {len(expired_users)}"
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in bulk delete expired: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при удалении истекших пользователей",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-            ]])
-        )
+    succeeded, failed = _step_totals(steps)
+    message = f"✅ **Удаление истекших завершено**\n\n"
+    message += f"• Успешно удалено: {succeeded}\n"
+    if failed > 0:
+        message += f"• Ошибок: {failed}\n"
+    message += _skipped_line(params)
+    message += f"• Всего обработано: {succeeded + failed}"
+    return message
+
+register_job_kind(
+    "delete_expired", "❌ Удаляю истекших...",
+    _plan_delete_expired, _uuid_step(BulkAPI.bulk_delete_users), _delete_expired_summary,
+    after=_invalidate_user_views
+)
 
 # ================ EXTEND OPERATIONS ================
 
+async def _extend_month_plan(progress: Optional[Callable[[int, int], Awaitable[None]]] = None):
+    """План продления всех пользователей на месяц и новая дата для истекших
+
+    Пользователи без срока или с истекшим сроком получают одну и ту же дату
+    и уходят общими bulk-запросами.
+    """
+    now = datetime.now(timezone.utc)
+    one_month_later = now + timedelta(days=30)
+    plan = UpdatePlan()
+    
+    async for users, done, total in iter_user_pages():
+        for user in users:
+            if not user.get('uuid'):
+                continue
+            current_expire = _expire_date(user)
+            # Если срок еще не истек, добавляем месяц к текущему сроку, иначе — месяц от сегодня
+            if current_expire and current_expire > now:
+                new_expire = current_expire + timedelta(days=30)
+            else:
+                new_expire = one_month_later
+            plan.add(user['uuid'], {"expireAt": new_expire.isoformat()})
+        if progress is not None:
+            await progress(done, total)
+    
+    return plan, one_month_later
+
 @router.callback_query(F.data == "bulk_extend_month", AuthFilter())
 async def bulk_extend_month_confirm(callback: types.CallbackQuery, state: FSMContext):
-    """Confirm extend all users for one month"""
+    """Confirm extend all users for one month with a dry-run of the API calls"""
     await callback.answer()
     
     try:
-        sdk = RemnaAPI.get_sdk()
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
+        plan, _ = await _extend_month_plan()
         
-        if not users_response or not users_response.users:
+        if not plan.users:
             await callback.answer("❌ Пользователи не найдены", show_alert=True)
             return
         
@@ -670,14 +596,13 @@ async def bulk_extend_month_confirm(callback: types.CallbackQuery, state: FSMCon
             types.InlineKeyboardButton(text="❌ Отмена", callback_data="bulk")
         )
         
-        total_users = len(users_response.users)
-        
         message = f"📅 **Продление на месяц всем пользователям**\n\n"
-        message += f"**Будет затронуто:** {total_users} пользователей\n\n"
+        message += f"**Будет затронуто:** {plan.users} пользователей\n\n"
         message += f"**Операция:**\n"
         message += f"• Пользователям без срока истечения - установится срок через месяц\n"
         message += f"• Пользователям с существующим сроком - добавится месяц\n\n"
-        message += f"⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n\n"
+        message += plan.preview() + "\n"
+        message += f"↩️ Прежние сроки сохранятся — продление можно будет отменить из итогового сообщения.\n\n"
         message += f"Продолжить?"
         
         await callback.message.edit_text(
@@ -691,98 +616,37 @@ async def bulk_extend_month_confirm(callback: types.CallbackQuery, state: FSMCon
 
 @router.callback_query(F.data == "confirm_extend_month", AuthFilter())
 async def confirm_extend_month(callback: types.CallbackQuery, state: FSMContext):
-    """Extend all users for one month"""
-    await callback.answer()
-    await callback.message.edit_text("📅 Продлеваю всех пользователей на месяц...")
+    """Extend all users for one month using batched updates"""
+    await _submit_job(callback, "extend_month", "📅 Продление всех пользователей на месяц")
+
+async def _plan_extend_month(job: Job, params: Dict) -> List[Step]:
+    # Шаги хранят новые даты, а не «+30 дней» — повтор шага после перезапуска не продлит дважды
+    plan, one_month_later = await _extend_month_plan(progress=job.progress(SCAN_STAGE))
+    params["new_expire"] = one_month_later.isoformat()
+    return plan.steps()
+
+async def _extend_month_step(payload: Dict, progress) -> Tuple[int, int]:
+    return await run_update_step(payload, progress=progress)
+
+def _extend_month_summary(params: Dict, steps: List[StepRecord]) -> str:
+    if not steps:
+        return "❌ Пользователи не найдены"
     
-    try:
-        sdk = RemnaAPI.get_sdk()
-        
-        # Получаем всех пользователей
-        users_response = await sdk.users.get_all_users(start=0, size=1000)
-        
-        if not users_response or not users_response.users:
-            await callback.message.edit_text(
-                "❌ Пользователи не найдены",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                    types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-                ]])
-            )
-            return
-        
-        # Продлеваем пользователей
-        success_count = 0
-        error_count = 0
-        total_users = len(users_response.users)
-        
-        # Подготавливаем новую дату истечения
-        now = datetime.now()
-        one_month_later = now + timedelta(days=30)
-        
-        for i, user in enumerate(users_response.users):
-            try:
-                # Обновляем прогресс каждые 10 пользователей
-                if i > 0 and i % 10 == 0:
-                    progress = (i / total_users) * 100
-                    await callback.message.edit_text(
-                        f"📅 Продлеваю пользователей... {progress:.1f}% ({i}/{total_users})"
-                    )
-                
-                # Определяем новую дату истечения
-                if user.expire_at:
-                    try:
-                        current_expire = datetime.fromisoformat(user.expire_at.replace('Z', '+00:00'))
-                        # Если срок еще не истек, добавляем месяц к текущему сроку
-                        if current_expire > now:
-                            new_expire = current_expire + timedelta(days=30)
-                        else:
-                            # Если срок истек, устанавливаем месяц от сегодня
-                            new_expire = one_month_later
-                    except:
-                        new_expire = one_month_later
-                else:
-                    # Если срока не было, устанавливаем месяц от сегодня
-                    new_expire = one_month_later
-                
-                # Обновляем пользователя через SDK
-                update_data = {
-                    'expire_at': new_expire.isoformat()
-                }
-                
-                success = await sdk.users.update_user(user.uuid, update_data)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error extending user {user.uuid}: {e}")
-                error_count += 1
-        
-        # Результат операции
-        builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk"))
-        
-        message = f"✅ **Продление на месяц завершено**\n\n"
-        message += f"• Успешно продлено: {success_count}\n"
-        if error_count > 0:
-            message += f"• Ошибок: {error_count}\n"
-        message += f"• Всего обработано: {total_users}\n\n"
-        message += f"**Новый срок истечения:** {one_month_later.strftime('%d.%m.%Y')}"
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in bulk extend month: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при продлении пользователей",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="bulk")
-            ]])
-        )
+    succeeded, failed = _step_totals(steps)
+    one_month_later = datetime.fromisoformat(params["new_expire"])
+    message = f"✅ **Продление на месяц завершено**\n\n"
+    message += f"• Успешно продлено: {succeeded}\n"
+    if failed > 0:
+        message += f"• Ошибок: {failed}\n"
+    message += f"• Всего обработано: {succeeded + failed}\n\n"
+    message += f"**Новый срок истечения:** {one_month_later.strftime('%d.%m.%Y')}"
+    return message
+
+register_job_kind(
+    "extend_month", "📅 Продлеваю пользователей...",
+    _plan_extend_month, _extend_month_step, _extend_month_summary,
+    after=_invalidate_user_views, capture=rollback.capture
+)
 
 # ================ PLACEHOLDER OPERATIONS ================
 
@@ -0,0 +1,227 @@
+"""
+Таблица маршрутов callback-кнопок
+
+aiogram перебирает обработчики callback_query всех роутеров по порядку и для
+каждого вычисляет фильтры. Таблица строится один раз после регистрации
+роутеров: обработчики с фильтром F.data == "..." или F.data.in_(...) попадают
+в словарь точных значений, с F.data.startswith(...) — в словарь префиксов.
+Для входящего callback кандидаты находятся поиском по словарям, и фильтры
+проверяются только у них, в том же порядке, что и у aiogram. Обработчики с другими фильтрами
+проверяются как раньше, если они зарегистрированы раньше найденного кандидата.
+
+Таблица опирается только на публичный API aiogram (фильтры роутеров,
+middleware, check/call обработчиков). Единственное исключение — разбор
+MagicFilter: у magic_filter нет публичного доступа к операциям фильтра, и
+версия magic-filter закреплена в requirements.txt. При сборке таблица сначала
+проверяет разбор на эталонных фильтрах, а каждое распознанное значение
+сверяет с публичным MagicFilter.resolve. Если magic_filter устроен иначе или
+разбор не подтвердился, таблица выключается целиком и callback'и идут обычным
+перебором aiogram.
+"""
+import logging
+import operator
+from importlib import metadata
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher, Router, types
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram import F
+from aiogram.utils.magic_filter import MagicFilter
+from magic_filter.operations import CallOperation, ComparatorOperation, FunctionOperation, GetAttributeOperation
+from magic_filter.util import in_op
+
+logger = logging.getLogger(__name__)
+
+# (порядок регистрации, роутер, обработчик)
+Route = Tuple[int, Router, HandlerObject]
+
+# Версия magic-filter, на которой проверен разбор фильтров (см. requirements.txt)
+TESTED_MAGIC_FILTER_VERSION = "1.0.12"
+
+
+class UnsupportedFilters(Exception):
+    """Фильтры нельзя разобрать надёжно — таблица не используется"""
+
+
+def _parse_magic(magic: MagicFilter) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """Разбор F.data == ..., F.data.in_(...) и F.data.startswith(...) по операциям фильтра"""
+    ops = getattr(magic, "_operations", None)
+    if not isinstance(ops, tuple):
+        raise UnsupportedFilters("MagicFilter has no readable operations")
+    if not ops:
+        return None
+    if not isinstance(ops[0], GetAttributeOperation) or ops[0].name != "data":
+        return None
+
+    if (len(ops) == 2 and isinstance(ops[1], ComparatorOperation)
+            and ops[1].comparator is operator.eq and isinstance(ops[1].right, str)):
+        return "exact", (ops[1].right,)
+
+    if (len(ops) == 2 and isinstance(ops[1], FunctionOperation) and ops[1].function is in_op
+            and len(ops[1].args) == 1 and isinstance(ops[1].args[0], (list, tuple, set, frozenset))
+            and all(isinstance(value, str) for value in ops[1].args[0])):
+        return "exact", tuple(ops[1].args[0])
+
+    if (len(ops) == 3 and isinstance(ops[1], GetAttributeOperation) and ops[1].name == "startswith"
+            and isinstance(ops[2], CallOperation) and len(ops[2].args) == 1 and not ops[2].kwargs):
+        prefixes = ops[2].args[0]
+        prefixes = (prefixes,) if isinstance(prefixes, str) else tuple(prefixes)
+        if all(isinstance(prefix, str) and prefix for prefix in prefixes):
+            return "prefix", prefixes
+    return None
+
+
+def _accepts(magic: MagicFilter, data: str) -> bool:
+    try:
+        return bool(magic.resolve(SimpleNamespace(data=data)))
+    except Exception:
+        return False
+
+
+def _data_filter(handler: HandlerObject) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """("exact"|"prefix", значения) для фильтра по callback.data или None"""
+    for filter_object in handler.filters or ():
+        magic = getattr(filter_object, "magic", None)
+        if not isinstance(magic, MagicFilter):
+            continue
+        parsed = _parse_magic(magic)
+        if parsed is None:
+            continue
+        kind, values = parsed
+        # Разбор должен совпасть с тем, как фильтр на самом деле вычисляется
+        probes = values if kind == "exact" else [prefix + "\x00" for prefix in values]
+        if not all(_accepts(magic, probe) for probe in probes):
+            raise UnsupportedFilters(f"filter of {handler.callback.__name__} does not match its parsed {kind} keys")
+        return parsed
+    return None
+
+
+def _self_check():
+    """Разбор эталонных фильтров; UnsupportedFilters, если magic_filter устроен иначе"""
+    samples = (
+        (F.data == "a", ("exact", ("a",))),
+        (F.data.in_(["a", "b"]), ("exact", ("a", "b"))),
+        (F.data.startswith("p:"), ("prefix", ("p:",))),
+        (F.data != "a", None),
+        (~(F.data == "a"), None),
+    )
+    for magic, expected in samples:
+        if _parse_magic(magic) != expected:
+            raise UnsupportedFilters(f"unexpected parse of a sample filter, expected {expected}")
+    try:
+        version = metadata.version("magic-filter")
+    except metadata.PackageNotFoundError:
+        version = None
+    if version != TESTED_MAGIC_FILTER_VERSION:
+        logger.warning(
+            f"magic-filter {version} is not the tested {TESTED_MAGIC_FILTER_VERSION}, "
+            f"callback route table relies on the self-check"
+        )
+
+
+class CallbackRouteTable(BaseMiddleware):
+    """Outer-middleware callback_query: выбор обработчика поиском по словарям"""
+
+    def __init__(self, dispatcher: Dispatcher):
+        self._exact: Dict[str, List[Route]] = {}
+        self._prefix: Dict[str, List[Route]] = {}
+        self._prefix_lengths: List[int] = []
+        self._unindexed: List[Route] = []
+        self.enabled = True
+        try:
+            _self_check()
+            self._build(dispatcher)
+        except UnsupportedFilters as e:
+            logger.warning(f"Callback route table disabled, using regular aiogram dispatch: {e}")
+            self.enabled = False
+
+    def _build(self, dispatcher: Dispatcher):
+        order = 0
+        for router in dispatcher.chain_tail:
+            for handler in router.callback_query.handlers:
+                route = (order, router, handler)
+                order += 1
+                data_filter = _data_filter(handler)
+                if data_filter is None:
+                    self._unindexed.append(route)
+                    continue
+                kind, values = data_filter
+                table = self._exact if kind == "exact" else self._prefix
+                for value in values:
+                    table.setdefault(value, []).append(route)
+
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefix})
+        logger.info(
+            f"Callback route table: {len(self._exact)} exact, {len(self._prefix)} prefix, "
+            f"{len(self._unindexed)} unindexed handlers"
+        )
+
+    def candidates(self, data: str) -> List[Route]:
+        """Обработчики, которые могут принять callback, в порядке регистрации"""
+        routes = list(self._exact.get(data, ()))
+        for length in self._prefix_lengths:
+            if length > len(data):
+                break
+            routes.extend(self._prefix.get(data[:length], ()))
+        if not routes:
+            return []
+
+        # Обработчики без индекса, зарегистрированные раньше последнего кандидата, aiogram тоже проверил бы
+        last = max(route[0] for route in routes)
+        routes.extend(route for route in self._unindexed if route[0] < last)
+        # Обработчик с несколькими подходящими префиксами должен проверяться один раз
+        return sorted({route[0]: route for route in routes}.values(), key=lambda route: route[0])
+
+    @staticmethod
+    async def _check_root_filters(router: Router, event: types.CallbackQuery,
+                                  data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Фильтры уровня роутеров цепочки (как в обычном обходе) или None, если роутер пропускается"""
+        kwargs = dict(data)
+        for chain_router in reversed(tuple(router.chain_head)):
+            result, filter_data = await chain_router.callback_query.check_root_filters(
+                event, **{**kwargs, "event_router": chain_router}
+            )
+            if not result:
+                return None
+            kwargs.update(filter_data)
+        return kwargs
+
+    @staticmethod
+    def _middlewares(router: Router) -> List[Any]:
+        """Inner-middleware callback_query роутера и его родителей, от внешнего к внутреннему"""
+        return [
+            middleware
+            for chain_router in reversed(tuple(router.chain_head))
+            for middleware in chain_router.callback_query.middleware
+        ]
+
+    async def __call__(self, handler: Callable[[types.CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+                       event: types.CallbackQuery, data: Dict[str, Any]) -> Any:
+        if not self.enabled or not event.data:
+            return await handler(event, data)
+
+        root_data: Dict[int, Optional[Dict[str, Any]]] = {}
+        for _, router, handler_object in self.candidates(event.data):
+            if id(router) not in root_data:
+                root_data[id(router)] = await self._check_root_filters(router, event, data)
+            router_data = root_data[id(router)]
+            if router_data is None:
+                continue
+            kwargs = {**router_data, "event_router": router, "handler": handler_object}
+            result, filter_data = await handler_object.check(event, **kwargs)
+            if not result:
+                continue
+            kwargs.update(filter_data)
+            wrapped = router.callback_query.outer_middleware.wrap_middlewares(
+                self._middlewares(router),
+                handler_object.call,
+            )
+            try:
+                return await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+
+        # Ни один кандидат не подошёл — обычный обход роутеров
+        return await handler(event, data)
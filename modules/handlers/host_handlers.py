@@ -3,11 +3,19 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging
+from typing import Any, Dict, List, Optional
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import HostStates
 from modules.api.client import RemnaAPI
-from modules.api.hosts import get_all_hosts, get_host_by_uuid
+from modules.api.hosts import (
+    get_all_hosts, get_host_by_uuid, bulk_enable_hosts, bulk_disable_hosts,
+    bulk_delete_hosts, bulk_set_hosts_port, bulk_set_hosts_inbound
+)
+from modules.api.inbounds import get_all_inbounds
+from modules.services.screen_cache import Screen, get_screen_cache, screen_key
+from modules.utils.callback_data import pack, pack_uuid, unpack, unpack_uuid
+from modules.utils.render_cache import get_rendered, new_generation, page_key, remember_rendered
 from modules.utils.formatters_aiogram import (
     format_bytes, format_datetime, escape_markdown
 )
@@ -83,10 +91,13 @@ async def list_hosts(callback: types.CallbackQuery, state: FSMContext):
             return
 
         # Сохраняем список в состоянии для пагинации
-        await state.update_data(hosts=hosts_list, page=0)
+        generation = new_generation()
+        # Выбор хранится по индексам списка, поэтому новый список начинается без выбора
+        await state.update_data(hosts=hosts_list, page=0, hosts_generation=generation,
+                                hosts_select_mode=False, hosts_selected=0)
         await state.set_state(HostStates.selecting_host)
         
-        await show_hosts_page(callback.message, hosts_list, 0, state)
+        await show_hosts_page(callback.message, hosts_list, 0, state, generation=generation)
 
     except Exception as e:
         logger.error(f"Error listing hosts: {e}")
@@ -98,8 +109,20 @@ async def list_hosts(callback: types.CallbackQuery, state: FSMContext):
             reply_markup=builder.as_markup()
         )
 
-async def show_hosts_page(message: types.Message, hosts: list, page: int, state: FSMContext, per_page: int = 8):
-    """Show hosts page with pagination"""
+async def show_hosts_page(message: types.Message, hosts: list, page: int, state: FSMContext, per_page: int = 8,
+                          generation: Optional[int] = None, selected: Optional[int] = None):
+    """Show hosts page with pagination
+
+    generation — поколение загруженного списка; с ним готовая страница берётся из кэша
+    selected — битовая маска выбранных хостов (бит i — hosts[i]); None — режим выбора выключен
+    """
+    # В режиме выбора страница зависит от выбора, поэтому не кэшируется
+    key = page_key("hosts", page, generation) if generation is not None and selected is None else None
+    cached = get_rendered(key) if key is not None else None
+    if cached is not None:
+        await _edit_page(message, *cached)
+        return
+    
     total_pages = (len(hosts) + per_page - 1) // per_page
     start_idx = page * per_page
     end_idx = start_idx + per_page
@@ -108,7 +131,7 @@ async def show_hosts_page(message: types.Message, hosts: list, page: int, state:
     builder = InlineKeyboardBuilder()
     
     # Список хостов на текущей странице
-    for host in page_hosts:
+    for index, host in enumerate(page_hosts, start_idx):
         remark = host.get('remark', 'Unknown')
         address = host.get('address', 'Unknown')
         port = host.get('port', 'N/A')
@@ -124,10 +147,17 @@ async def show_hosts_page(message: types.Message, hosts: list, page: int, state:
         else:
             display_name = host_name + host_info
         
-        builder.row(types.InlineKeyboardButton(
-            text=display_name,
-            callback_data=f"view_host:{host.get('uuid', '')}"
-        ))
+        if selected is not None:
+            mark = "☑️" if selected >> index & 1 else "⬜"
+            builder.row(types.InlineKeyboardButton(
+                text=f"{mark} {display_name}",
+                callback_data=pack(HOST_SELECT_CALLBACK, index)
+            ))
+        else:
+            builder.row(types.InlineKeyboardButton(
+                text=display_name,
+                callback_data=f"view_host:{host.get('uuid', '')}"
+            ))
     
     # Пагинация
     if total_pages > 1:
@@ -153,25 +183,44 @@ async def show_hosts_page(message: types.Message, hosts: list, page: int, state:
         builder.row(*pagination_buttons)
     
     # Кнопки управления
-    builder.row(
-        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="list_hosts"),
-        types.InlineKeyboardButton(text="📊 Статистика", callback_data="hosts_stats")
-    )
-    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="hosts"))
+    if selected is not None:
+        count = bin(selected).count("1")
+        builder.row(
+            types.InlineKeyboardButton(text="☑️ Вся страница", callback_data=pack(HOST_SELECT_PAGE_CALLBACK, page)),
+            types.InlineKeyboardButton(text="⬜ Снять выбор", callback_data="hosts_select_clear")
+        )
+        builder.row(types.InlineKeyboardButton(text=f"⚙️ Действия с выбранными ({count})", callback_data="hosts_bulk"))
+        builder.row(types.InlineKeyboardButton(text="✖️ Выйти из режима выбора", callback_data="hosts_select_off"))
+    else:
+        builder.row(
+            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="list_hosts"),
+            types.InlineKeyboardButton(text="📊 Статистика", callback_data="hosts_stats")
+        )
+        builder.row(types.InlineKeyboardButton(text="☑️ Выбрать несколько", callback_data="hosts_select_on"))
+        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="hosts"))
     
     message_text = f"🌐 **Список хостов** ({len(hosts)} всего)\n"
     message_text += f"📄 Страница {page + 1} из {total_pages}\n\n"
-    message_text += "Выберите хост для просмотра подробной информации:"
+    if selected is not None:
+        message_text += f"Выбрано хостов: **{bin(selected).count('1')}**. Отметьте хосты и откройте действия:"
+    else:
+        message_text += "Выберите хост для просмотра подробной информации:"
     
+    markup = builder.as_markup()
+    if key is not None:
+        remember_rendered(key, message_text, markup)
+    await _edit_page(message, message_text, markup)
+
+async def _edit_page(message: types.Message, text: str, markup: types.InlineKeyboardMarkup):
     try:
         await message.edit_text(
-            text=message_text,
-            reply_markup=builder.as_markup()
+            text=text,
+            reply_markup=markup
         )
     except Exception:
         await message.answer(
-            text=message_text,
-            reply_markup=builder.as_markup()
+            text=text,
+            reply_markup=markup
         )
 
 @router.callback_query(F.data.startswith("hosts_page:"), AuthFilter())
@@ -184,7 +233,210 @@ async def handle_hosts_pagination(callback: types.CallbackQuery, state: FSMConte
     hosts = data.get('hosts', [])
     
     await state.update_data(page=page)
-    await show_hosts_page(callback.message, hosts, page, state)
+    await show_hosts_page(callback.message, hosts, page, state, generation=data.get('hosts_generation'),
+                          selected=_selection(data))
+
+# ================ MULTI-SELECT ================
+
+# Коды callback_data режима выбора: отметить хост по индексу и всю страницу
+HOST_SELECT_CALLBACK = "hsel"
+HOST_SELECT_PAGE_CALLBACK = "hselp"
+# Выбор inbound'а для выбранных хостов: hbi:<UUID inbound'а>
+HOST_BULK_INBOUND_CALLBACK = "hbi"
+
+HOSTS_PER_PAGE = 8
+
+def _selection(data: Dict[str, Any]) -> Optional[int]:
+    """Битовая маска выбранных хостов или None вне режима выбора"""
+    return data.get('hosts_selected', 0) if data.get('hosts_select_mode') else None
+
+def _selected_hosts(data: Dict[str, Any]) -> List[Dict]:
+    selected = data.get('hosts_selected', 0)
+    return [host for index, host in enumerate(data.get('hosts', [])) if selected >> index & 1]
+
+async def _show_selection(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    await show_hosts_page(message, data.get('hosts', []), data.get('page', 0), state,
+                          selected=_selection(data))
+
+@router.callback_query(F.data.in_({"hosts_select_on", "hosts_select_off", "hosts_select_clear"}), AuthFilter())
+async def toggle_hosts_select_mode(callback: types.CallbackQuery, state: FSMContext):
+    """Enter or leave multi-select mode, or clear the selection"""
+    data = await state.get_data()
+    if not data.get('hosts'):
+        # Список устарел (например, после перезапуска бота) — загружаем заново
+        await list_hosts(callback, state)
+        return
+    await callback.answer()
+
+    if callback.data == "hosts_select_clear":
+        await state.update_data(hosts_selected=0)
+    else:
+        await state.update_data(hosts_select_mode=callback.data == "hosts_select_on", hosts_selected=0)
+    await _show_selection(callback.message, state)
+
+@router.callback_query(F.data.startswith((f"{HOST_SELECT_CALLBACK}:", f"{HOST_SELECT_PAGE_CALLBACK}:")), AuthFilter())
+async def toggle_host_selection(callback: types.CallbackQuery, state: FSMContext):
+    """Select or unselect one host, or the whole current page"""
+    await callback.answer()
+    action, args = unpack(callback.data)
+    data = await state.get_data()
+    hosts = data.get('hosts', [])
+    selected = data.get('hosts_selected', 0)
+
+    if action == HOST_SELECT_CALLBACK:
+        index = int(args[0])
+        if index < len(hosts):
+            selected ^= 1 << index
+    else:
+        start = int(args[0]) * HOSTS_PER_PAGE
+        page_mask = sum(1 << index for index in range(start, min(start + HOSTS_PER_PAGE, len(hosts))))
+        # Если страница уже выбрана целиком — снимаем выбор с неё
+        selected = selected & ~page_mask if selected & page_mask == page_mask else selected | page_mask
+
+    await state.update_data(hosts_selected=selected)
+    await _show_selection(callback.message, state)
+
+@router.callback_query(F.data == "hosts_bulk", AuthFilter())
+async def show_hosts_bulk_menu(callback: types.CallbackQuery, state: FSMContext):
+    """Show bulk actions for the selected hosts"""
+    data = await state.get_data()
+    selected_hosts = _selected_hosts(data)
+    if not selected_hosts:
+        await callback.answer("Сначала отметьте хосты в списке", show_alert=True)
+        return
+    await callback.answer()
+    await state.set_state(HostStates.selecting_host)
+
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🟢 Включить", callback_data="hosts_bulk_do:enable"),
+        types.InlineKeyboardButton(text="🔴 Отключить", callback_data="hosts_bulk_do:disable")
+    )
+    builder.row(
+        types.InlineKeyboardButton(text="🔢 Задать порт", callback_data="hosts_bulk_port"),
+        types.InlineKeyboardButton(text="🔌 Задать Inbound", callback_data="hosts_bulk_inbound")
+    )
+    builder.row(types.InlineKeyboardButton(text="🗑️ Удалить", callback_data="hosts_bulk_delete"))
+    builder.row(types.InlineKeyboardButton(text="🔙 К выбору", callback_data=f"hosts_page:{data.get('page', 0)}"))
+
+    message = f"⚙️ **Действия с выбранными хостами**\n\n"
+    message += f"**Выбрано:** {len(selected_hosts)}\n"
+    for host in selected_hosts[:10]:
+        message += f"• {escape_markdown(host.get('remark', 'Unknown'))}\n"
+    if len(selected_hosts) > 10:
+        message += f"• ... и еще {len(selected_hosts) - 10}\n"
+    message += "\nКаждое действие выполняется одним запросом к панели для всех выбранных хостов."
+
+    await callback.message.edit_text(message, reply_markup=builder.as_markup())
+
+async def _apply_to_selection(message: types.Message, state: FSMContext, title: str, operation, *args,
+                              edit: bool = True):
+    """Отправить один bulk-запрос для всех выбранных хостов и показать итог"""
+    data = await state.get_data()
+    uuids = [host['uuid'] for host in _selected_hosts(data) if host.get('uuid')]
+
+    success = await operation(uuids, *args) if uuids else False
+    if success:
+        get_screen_cache().bump("hosts")
+        await state.update_data(hosts_select_mode=False, hosts_selected=0)
+        text = f"✅ **{title}**\n\nОбработано хостов: {len(uuids)}"
+    else:
+        text = f"❌ **{title}: ошибка**\n\nПанель не выполнила запрос, подробности в логах бота."
+
+    markup = types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text="📋 К списку хостов", callback_data="list_hosts"),
+        types.InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")
+    ]])
+    if edit:
+        await message.edit_text(text, reply_markup=markup)
+    else:
+        await message.answer(text, reply_markup=markup)
+
+HOST_BULK_ACTIONS = {
+    "enable": ("Хосты включены", bulk_enable_hosts),
+    "disable": ("Хосты отключены", bulk_disable_hosts),
+    "delete": ("Хосты удалены", bulk_delete_hosts),
+}
+
+@router.callback_query(F.data.startswith("hosts_bulk_do:"), AuthFilter())
+async def run_hosts_bulk_action(callback: types.CallbackQuery, state: FSMContext):
+    """Enable, disable or delete the selected hosts"""
+    await callback.answer()
+    title, operation = HOST_BULK_ACTIONS[callback.data.split(":", 1)[1]]
+    await _apply_to_selection(callback.message, state, title, operation)
+
+@router.callback_query(F.data == "hosts_bulk_delete", AuthFilter())
+async def confirm_hosts_bulk_delete(callback: types.CallbackQuery, state: FSMContext):
+    """Confirm deletion of the selected hosts"""
+    await callback.answer()
+    data = await state.get_data()
+
+    builder = InlineKeyboardBuilder()
+    builder.row(types.InlineKeyboardButton(text="🗑️ Да, удалить", callback_data="hosts_bulk_do:delete"))
+    builder.row(types.InlineKeyboardButton(text="❌ Отмена", callback_data="hosts_bulk"))
+
+    await callback.message.edit_text(
+        f"🗑️ **Подтверждение удаления хостов**\n\n"
+        f"Будет удалено хостов: **{len(_selected_hosts(data))}**\n\n"
+        f"⚠️ **ВНИМАНИЕ!** Это действие нельзя отменить.\n\n"
+        f"Продолжить?",
+        reply_markup=builder.as_markup()
+    )
+
+@router.callback_query(F.data == "hosts_bulk_port", AuthFilter())
+async def ask_hosts_bulk_port(callback: types.CallbackQuery, state: FSMContext):
+    """Ask for the port to set on the selected hosts"""
+    await callback.answer()
+    await state.set_state(HostStates.bulk_entering_port)
+    await callback.message.edit_text(
+        "🔢 **Порт для выбранных хостов**\n\nВведите порт (1-65535):",
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+            types.InlineKeyboardButton(text="❌ Отмена", callback_data="hosts_bulk")
+        ]])
+    )
+
+@router.message(StateFilter(HostStates.bulk_entering_port), AuthFilter())
+async def handle_hosts_bulk_port(message: types.Message, state: FSMContext):
+    """Set the entered port on the selected hosts"""
+    try:
+        port = int((message.text or "").strip())
+        if not 1 <= port <= 65535:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Порт должен быть числом от 1 до 65535. Попробуйте снова:")
+        return
+
+    await state.set_state(HostStates.selecting_host)
+    await _apply_to_selection(message, state, f"Порт {port} задан", bulk_set_hosts_port, port, edit=False)
+
+@router.callback_query(F.data == "hosts_bulk_inbound", AuthFilter())
+async def choose_hosts_bulk_inbound(callback: types.CallbackQuery, state: FSMContext):
+    """Choose the inbound to bind the selected hosts to"""
+    await callback.answer()
+    inbounds_list = await get_all_inbounds() or []
+
+    builder = InlineKeyboardBuilder()
+    for inbound in inbounds_list:
+        if not inbound.get('uuid'):
+            continue
+        tag = inbound.get('tag', 'Unknown')[:20]
+        builder.row(types.InlineKeyboardButton(
+            text=f"🔌 {tag} ({inbound.get('protocol', 'Unknown')})",
+            callback_data=pack(HOST_BULK_INBOUND_CALLBACK, pack_uuid(inbound['uuid']))
+        ))
+    builder.row(types.InlineKeyboardButton(text="❌ Отмена", callback_data="hosts_bulk"))
+
+    text = "🔌 **Inbound для выбранных хостов**\n\n"
+    text += "Выберите Inbound:" if inbounds_list else "Inbound'ы не найдены."
+    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+
+@router.callback_query(F.data.startswith(f"{HOST_BULK_INBOUND_CALLBACK}:"), AuthFilter())
+async def set_hosts_bulk_inbound(callback: types.CallbackQuery, state: FSMContext):
+    """Bind the selected hosts to the chosen inbound"""
+    await callback.answer()
+    _, args = unpack(callback.data)
+    await _apply_to_selection(callback.message, state, "Inbound задан", bulk_set_hosts_inbound, unpack_uuid(args[0]))
 
 # ================ HOST DETAILS ================
 
@@ -296,6 +548,7 @@ async def enable_host(callback: types.CallbackQuery, state: FSMContext):
         result = await api_client.put(f"hosts/{uuid}/enable")
         
         if result:
+            get_screen_cache().bump("hosts")
             await callback.answer("✅ Хост включен", show_alert=True)
             # Обновляем информацию о хосте
             callback.data = f"view_host:{uuid}"
@@ -320,6 +573,7 @@ async def disable_host(callback: types.CallbackQuery, state: FSMContext):
         result = await api_client.put(f"hosts/{uuid}/disable")
         
         if result:
+            get_screen_cache().bump("hosts")
             await callback.answer("⏸️ Хост отключен", show_alert=True)
             # Обновляем информацию о хосте
             callback.data = f"view_host:{uuid}"
@@ -394,6 +648,7 @@ async def confirm_delete_host(callback: types.CallbackQuery, state: FSMContext):
         result = await api_client.delete(f"hosts/{uuid}")
         
         if result:
+            get_screen_cache().bump("hosts")
             await callback.answer("✅ Хост удален", show_alert=True)
             await state.clear()
             
@@ -636,6 +891,7 @@ async def handle_host_field_input(message: types.Message, state: FSMContext):
             result = await api_client.put(f"hosts/{uuid}", update_data)
             
             if result:
+                get_screen_cache().bump("hosts")
                 # Update stored host data
                 host[field] = validated_value
                 await state.update_data(editing_host=host)
@@ -699,16 +955,102 @@ async def handle_cancel_host_edit(callback: types.CallbackQuery, state: FSMConte
 
 # ================ HOSTS STATISTICS ================
 
+async def _render_hosts_statistics() -> Optional[Screen]:
+    hosts_list = await get_all_hosts()
+
+    if not hosts_list:
+        return None
+
+    # Анализируем данные
+    total_hosts = len(hosts_list)
+    active_hosts = sum(1 for host in hosts_list if host.get('isActive', True))
+    inactive_hosts = total_hosts - active_hosts
+
+    # Статистика по портам
+    port_usage = {}
+    inbound_stats = {}
+
+    for host in hosts_list:
+        # Статистика по портам
+        port = host.get('port')
+        if port:
+            if port not in port_usage:
+                port_usage[port] = 0
+            port_usage[port] += 1
+
+        # Статистика по inbound'ам
+        inbound_uuid = host.get('inboundUuid')
+        if inbound_uuid:
+            if inbound_uuid not in inbound_stats:
+                inbound_stats[inbound_uuid] = {'total': 0, 'active': 0}
+            inbound_stats[inbound_uuid]['total'] += 1
+            if host.get('isActive', True):
+                inbound_stats[inbound_uuid]['active'] += 1
+
+    # Формируем сообщение
+    message_text = "📊 **Статистика хостов**\n\n"
+
+    # Общая статистика
+    message_text += "**📈 Общая статистика:**\n"
+    message_text += f"• Всего хостов: {total_hosts}\n"
+    message_text += f"• Активных: {active_hosts}\n"
+    message_text += f"• Неактивных: {inactive_hosts}\n\n"
+
+    # Статистика по портам
+    if port_usage:
+        sorted_ports = sorted(port_usage.items(), key=lambda x: x[1], reverse=True)[:5]
+        message_text += "**🔢 Популярные порты:**\n"
+        for port, count in sorted_ports:
+            message_text += f"• Порт {port}: {count} хост(ов)\n"
+        message_text += "\n"
+
+    # Статистика по inbound'ам
+    if inbound_stats:
+        message_text += "**🔌 По Inbound'ам:**\n"
+        for inbound_uuid, stats in list(inbound_stats.items())[:5]:
+            short_uuid = inbound_uuid[:8] + "..." if len(inbound_uuid) > 8 else inbound_uuid
+            message_text += f"• {short_uuid}: {stats['active']}/{stats['total']}\n"
+
+        if len(inbound_stats) > 5:
+            message_text += f"• ... и еще {len(inbound_stats) - 5}\n"
+        message_text += "\n"
+
+    # Дополнительная аналитика
+    if total_hosts > 0:
+        active_percentage = (active_hosts / total_hosts) * 100
+        message_text += f"**📊 Анализ:**\n"
+        message_text += f"• Процент активных: {active_percentage:.1f}%\n"
+
+        if inactive_hosts > 0:
+            message_text += f"• ⚠️ Есть неактивные хосты\n"
+
+        # Проверяем дублирующиеся порты
+        duplicate_ports = [port for port, count in port_usage.items() if count > 1]
+        if duplicate_ports:
+            message_text += f"• ⚠️ Дублирующиеся порты: {len(duplicate_ports)}\n"
+
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="hosts_stats"),
+        types.InlineKeyboardButton(text="📋 Список", callback_data="list_hosts")
+    )
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="hosts"))
+
+    return message_text, builder.as_markup()
+
+
 @router.callback_query(F.data == "hosts_stats", AuthFilter())
 async def show_hosts_statistics(callback: types.CallbackQuery):
     """Show hosts statistics"""
     await callback.answer()
-    await callback.message.edit_text("📊 Загрузка статистики хостов...")
-    
+    cache = get_screen_cache()
+    key = screen_key("hosts_stats", generation=cache.version("hosts"))
+    if not cache.is_cached(key):
+        await callback.message.edit_text("📊 Загрузка статистики хостов...")
+
     try:
-        hosts_list = await get_all_hosts()
-        
-        if not hosts_list:
+        screen = await cache.get(key, _render_hosts_statistics)
+        if screen is None:
             await callback.message.edit_text(
                 "❌ Не удалось получить статистику хостов",
                 reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
@@ -716,86 +1058,9 @@ async def show_hosts_statistics(callback: types.CallbackQuery):
                 ]])
             )
             return
-        
-        # Анализируем данные
-        total_hosts = len(hosts_list)
-        active_hosts = sum(1 for host in hosts_list if host.get('isActive', True))
-        inactive_hosts = total_hosts - active_hosts
-        
-        # Статистика по портам
-        port_usage = {}
-        inbound_stats = {}
-        
-        for host in hosts_list:
-            # Статистика по портам
-            port = host.get('port')
-            if port:
-                if port not in port_usage:
-                    port_usage[port] = 0
-                port_usage[port] += 1
-            
-            # Статистика по inbound'ам
-            inbound_uuid = host.get('inboundUuid')
-            if inbound_uuid:
-                if inbound_uuid not in inbound_stats:
-                    inbound_stats[inbound_uuid] = {'total': 0, 'active': 0}
-                inbound_stats[inbound_uuid]['total'] += 1
-                if host.get('isActive', True):
-                    inbound_stats[inbound_uuid]['active'] += 1
-        
-        # Формируем сообщение
-        message_text = "📊 **Статистика хостов**\n\n"
-        
-        # Общая статистика
-        message_text += "**📈 Общая статистика:**\n"
-        message_text += f"• Всего хостов: {total_hosts}\n"
-        message_text += f"• Активных: {active_hosts}\n"
-        message_text += f"• Неактивных: {inactive_hosts}\n\n"
-        
-        # Статистика по портам
-        if port_usage:
-            sorted_ports = sorted(port_usage.items(), key=lambda x: x[1], reverse=True)[:5]
-            message_text += "**🔢 Популярные порты:**\n"
-            for port, count in sorted_ports:
-                message_text += f"• Порт {port}: {count} хост(ов)\n"
-            message_text += "\n"
-        
-        # Статистика по inbound'ам
-        if inbound_stats:
-            message_text += "**🔌 По Inbound'ам:**\n"
-            for inbound_uuid, stats in list(inbound_stats.items())[:5]:
-                short_uuid = inbound_uuid[:8] + "..." if len(inbound_uuid) > 8 else inbound_uuid
-                message_text += f"• {short_uuid}: {stats['active']}/{stats['total']}\n"
-            
-            if len(inbound_stats) > 5:
-                message_text += f"• ... и еще {len(inbound_stats) - 5}\n"
-            message_text += "\n"
-        
-        # Дополнительная аналитика
-        if total_hosts > 0:
-            active_percentage = (active_hosts / total_hosts) * 100
-            message_text += f"**📊 Анализ:**\n"
-            message_text += f"• Процент активных: {active_percentage:.1f}%\n"
-            
-            if inactive_hosts > 0:
-                message_text += f"• ⚠️ Есть неактивные хосты\n"
-            
-            # Проверяем дублирующиеся порты
-            duplicate_ports = [port for port, count in port_usage.items() if count > 1]
-            if duplicate_ports:
-                message_text += f"• ⚠️ Дублирующиеся порты: {len(duplicate_ports)}\n"
-        
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="hosts_stats"),
-            types.InlineKeyboardButton(text="📋 Список", callback_data="list_hosts")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="hosts"))
-        
-        await callback.message.edit_text(
-            text=message_text,
-            reply_markup=builder.as_markup()
-        )
+
+        text, markup = screen
+        await callback.message.edit_text(text=text, reply_markup=markup)
         
     except Exception as e:
         logger.error(f"Error getting hosts statistics: {e}")
@@ -1048,6 +1313,7 @@ async def finalize_host_creation(message: types.Message, state: FSMContext):
         result = await api_client.post("hosts", host_data)
         
         if result:
+            get_screen_cache().bump("hosts")
             await state.clear()
             
             builder = InlineKeyboardBuilder()
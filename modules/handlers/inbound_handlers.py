@@ -3,11 +3,22 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging
+from typing import Dict, List, Optional, Tuple
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import InboundStates
 from modules.api.client import RemnaAPI
 from modules.api.inbounds import get_all_inbounds, get_inbound_by_uuid
+from modules.services import rollback
+from modules.services.bulk_planner import run_update_step
+from modules.services.durable_jobs import Step, register_job_kind, submit_durable_job
+from modules.services.inbound_rollout import ADD, REMOVE, ROLLOUT_SEGMENTS, plan_rollout
+from modules.services.job_journal import StepRecord
+from modules.services.jobs import Job
+from modules.services.screen_cache import Screen, get_screen_cache, screen_key
+from modules.services.user_pages import get_user_pager
+from modules.utils.callback_data import pack, pack_uuid, unpack, unpack_uuid
+from modules.utils.render_cache import get_rendered, new_generation, page_key, remember_rendered
 from modules.utils.formatters_aiogram import (
     format_bytes, format_datetime, escape_markdown
 )
@@ -156,10 +167,11 @@ async def list_inbounds(callback: types.CallbackQuery, state: FSMContext):
             return
         
         # Сохраняем список в состоянии для пагинации
-        await state.update_data(inbounds=inbounds_list, page=0)
+        generation = new_generation()
+        await state.update_data(inbounds=inbounds_list, page=0, inbounds_generation=generation)
         await state.set_state(InboundStates.selecting_inbound)
         
-        await show_inbounds_page(callback.message, inbounds_list, 0, state)
+        await show_inbounds_page(callback.message, inbounds_list, 0, state, generation=generation)
         
     except Exception as e:
         logger.error(f"Error listing inbounds: {e}")
@@ -170,8 +182,18 @@ async def list_inbounds(callback: types.CallbackQuery, state: FSMContext):
             ]])
         )
 
-async def show_inbounds_page(message: types.Message, inbounds: list, page: int, state: FSMContext, per_page: int = 8):
-    """Show inbounds page with pagination"""
+async def show_inbounds_page(message: types.Message, inbounds: list, page: int, state: FSMContext, per_page: int = 8,
+                             generation: Optional[int] = None):
+    """Show inbounds page with pagination
+
+    generation — поколение загруженного списка; с ним готовая страница берётся из кэша
+    """
+    key = page_key("inbounds", page, generation) if generation is not None else None
+    cached = get_rendered(key) if key is not None else None
+    if cached is not None:
+        await _edit_page(message, *cached)
+        return
+    
     total_pages = (len(inbounds) + per_page - 1) // per_page
     start_idx = page * per_page
     end_idx = start_idx + per_page
@@ -235,15 +257,21 @@ async def show_inbounds_page(message: types.Message, inbounds: list, page: int,
     message_text += f"📄 Страница {page + 1} из {total_pages}\n\n"
     message_text += "Выберите Inbound для просмотра подробной информации:"
     
+    markup = builder.as_markup()
+    if key is not None:
+        remember_rendered(key, message_text, markup)
+    await _edit_page(message, message_text, markup)
+
+async def _edit_page(message: types.Message, text: str, markup: types.InlineKeyboardMarkup):
     try:
         await message.edit_text(
-            text=message_text,
-            reply_markup=builder.as_markup()
+            text=text,
+            reply_markup=markup
         )
     except Exception:
         await message.answer(
-            text=message_text,
-            reply_markup=builder.as_markup()
+            text=text,
+            reply_markup=markup
         )
 
 @router.callback_query(F.data.startswith("inbounds_page:"), AuthFilter())
@@ -256,7 +284,7 @@ async def handle_inbounds_pagination(callback: types.CallbackQuery, state: FSMCo
     inbounds = data.get('inbounds', [])
     
     await state.update_data(page=page)
-    await show_inbounds_page(callback.message, inbounds, page, state)
+    await show_inbounds_page(callback.message, inbounds, page, state, generation=data.get('inbounds_generation'))
 
 # ================ VIEW INBOUND DETAILS ================
 
@@ -353,6 +381,7 @@ async def enable_inbound(callback: types.CallbackQuery, state: FSMContext):
         result = await api_client.put(f"inbounds/{uuid}/enable")
         
         if result:
+            get_screen_cache().bump("inbounds")
             await callback.answer("✅ Inbound включен", show_alert=True)
             # Обновляем информацию об inbound
             await show_inbound_details(callback.message, uuid, state)
@@ -376,6 +405,7 @@ async def disable_inbound(callback: types.CallbackQuery, state: FSMContext):
         result = await api_client.put(f"inbounds/{uuid}/disable")
         
         if result:
+            get_screen_cache().bump("inbounds")
             await callback.answer("⏸️ Inbound отключен", show_alert=True)
             # Обновляем информацию об inbound
             await show_inbound_details(callback.message, uuid, state)
@@ -438,6 +468,7 @@ async def confirm_delete_inbound(callback: types.CallbackQuery, state: FSMContex
         result = await api_client.delete(f"inbounds/{uuid}")
         
         if result:
+            get_screen_cache().bump("inbounds", "hosts")
             await callback.answer("✅ Inbound удален", show_alert=True)
             await state.clear()
             
@@ -458,16 +489,96 @@ async def confirm_delete_inbound(callback: types.CallbackQuery, state: FSMContex
 
 # ================ INBOUNDS STATISTICS ================
 
+async def _render_inbounds_statistics() -> Optional[Screen]:
+    inbounds_list = await get_all_inbounds()
+
+    if not inbounds_list:
+        return None
+
+    # Анализируем данные
+    total_inbounds = len(inbounds_list)
+    enabled_inbounds = sum(1 for ib in inbounds_list if ib.get('isEnabled', True))
+    disabled_inbounds = total_inbounds - enabled_inbounds
+
+    # Статистика по протоколам
+    protocol_stats = {}
+    port_usage = {}
+
+    for inbound in inbounds_list:
+        # Статистика по протоколам
+        protocol = inbound.get('protocol', 'Unknown')
+        if protocol not in protocol_stats:
+            protocol_stats[protocol] = {'total': 0, 'enabled': 0}
+        protocol_stats[protocol]['total'] += 1
+        if inbound.get('isEnabled', True):
+            protocol_stats[protocol]['enabled'] += 1
+
+        # Статистика по портам
+        port = inbound.get('port')
+        if port:
+            if port not in port_usage:
+                port_usage[port] = 0
+            port_usage[port] += 1
+
+    # Формируем сообщение
+    message_text = "📊 **Статистика Inbounds**\n\n"
+
+    # Общая статистика
+    message_text += "**📈 Общая статистика:**\n"
+    message_text += f"• Всего Inbounds: {total_inbounds}\n"
+    message_text += f"• Включенных: {enabled_inbounds}\n"
+    message_text += f"• Отключенных: {disabled_inbounds}\n\n"
+
+    # Статистика по протоколам
+    if protocol_stats:
+        message_text += "**🔧 По протоколам:**\n"
+        for protocol, stats in sorted(protocol_stats.items()):
+            percentage = (stats['total'] / total_inbounds) * 100
+            message_text += f"• {protocol}: {stats['enabled']}/{stats['total']} ({percentage:.1f}%)\n"
+        message_text += "\n"
+
+    # Наиболее используемые порты
+    if port_usage:
+        sorted_ports = sorted(port_usage.items(), key=lambda x: x[1], reverse=True)[:5]
+        message_text += "**🔢 Популярные порты:**\n"
+        for port, count in sorted_ports:
+            message_text += f"• Порт {port}: {count} inbound(ов)\n"
+        message_text += "\n"
+
+    # Дополнительная аналитика
+    if total_inbounds > 0:
+        enabled_percentage = (enabled_inbounds / total_inbounds) * 100
+        message_text += f"**📊 Анализ:**\n"
+        message_text += f"• Процент активных: {enabled_percentage:.1f}%\n"
+
+        if disabled_inbounds > 0:
+            message_text += f"• ⚠️ Есть отключенные inbound'ы\n"
+
+        if len(set(port for ib in inbounds_list if ib.get('port'))) != len([ib for ib in inbounds_list if ib.get('port')]):
+            message_text += f"• ⚠️ Есть дублирующиеся порты\n"
+
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="inbounds_stats"),
+        types.InlineKeyboardButton(text="📋 Список", callback_data="list_inbounds")
+    )
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="inbounds"))
+
+    return message_text, builder.as_markup()
+
+
 @router.callback_query(F.data == "inbounds_stats", AuthFilter())
 async def show_inbounds_statistics(callback: types.CallbackQuery):
     """Show inbounds statistics"""
     await callback.answer()
-    await callback.message.edit_text("📊 Загрузка статистики Inbounds...")
-    
+    cache = get_screen_cache()
+    key = screen_key("inbounds_stats", generation=cache.version("inbounds"))
+    if not cache.is_cached(key):
+        await callback.message.edit_text("📊 Загрузка статистики Inbounds...")
+
     try:
-        inbounds_list = await get_all_inbounds()
-        
-        if not inbounds_list:
+        screen = await cache.get(key, _render_inbounds_statistics)
+        if screen is None:
             await callback.message.edit_text(
                 "❌ Не удалось получить статистику Inbounds",
                 reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
@@ -475,80 +586,9 @@ async def show_inbounds_statistics(callback: types.CallbackQuery):
                 ]])
             )
             return
-        
-        # Анализируем данные
-        total_inbounds = len(inbounds_list)
-        enabled_inbounds = sum(1 for ib in inbounds_list if ib.get('isEnabled', True))
-        disabled_inbounds = total_inbounds - enabled_inbounds
-        
-        # Статистика по протоколам
-        protocol_stats = {}
-        port_usage = {}
-        
-        for inbound in inbounds_list:
-            # Статистика по протоколам
-            protocol = inbound.get('protocol', 'Unknown')
-            if protocol not in protocol_stats:
-                protocol_stats[protocol] = {'total': 0, 'enabled': 0}
-            protocol_stats[protocol]['total'] += 1
-            if inbound.get('isEnabled', True):
-                protocol_stats[protocol]['enabled'] += 1
-            
-            # Статистика по портам
-            port = inbound.get('port')
-            if port:
-                if port not in port_usage:
-                    port_usage[port] = 0
-                port_usage[port] += 1
-        
-        # Формируем сообщение
-        message_text = "📊 **Статистика Inbounds**\n\n"
-        
-        # Общая статистика
-        message_text += "**📈 Общая статистика:**\n"
-        message_text += f"• Всего Inbounds: {total_inbounds}\n"
-        message_text += f"• Включенных: {enabled_inbounds}\n"
-        message_text += f"• Отключенных: {disabled_inbounds}\n\n"
-        
-        # Статистика по протоколам
-        if protocol_stats:
-            message_text += "**🔧 По протоколам:**\n"
-            for protocol, stats in sorted(protocol_stats.items()):
-                percentage = (stats['total'] / total_inbounds) * 100
-                message_text += f"• {protocol}: {stats['enabled']}/{stats['total']} ({percentage:.1f}%)\n"
-            message_text += "\n"
-        
-        # Наиболее используемые порты
-        if port_usage:
-            sorted_ports = sorted(port_usage.items(), key=lambda x: x[1], reverse=True)[:5]
-            message_text += "**🔢 Популярные порты:**\n"
-            for port, count in sorted_ports:
-                message_text += f"• Порт {port}: {count} inbound(ов)\n"
-            message_text += "\n"
-        
-        # Дополнительная аналитика
-        if total_inbounds > 0:
-            enabled_percentage = (enabled_inbounds / total_inbounds) * 100
-            message_text += f"**📊 Анализ:**\n"
-            message_text += f"• Процент активных: {enabled_percentage:.1f}%\n"
-            
-            if disabled_inbounds > 0:
-                message_text += f"• ⚠️ Есть отключенные inbound'ы\n"
-            
-            if len(set(port for ib in inbounds_list if ib.get('port'))) != len([ib for ib in inbounds_list if ib.get('port')]):
-                message_text += f"• ⚠️ Есть дублирующиеся порты\n"
-        
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="inbounds_stats"),
-            types.InlineKeyboardButton(text="📋 Список", callback_data="list_inbounds")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="inbounds"))
-        
-        await callback.message.edit_text(
-            text=message_text,
-            reply_markup=builder.as_markup()
-        )
+
+        text, markup = screen
+        await callback.message.edit_text(text=text, reply_markup=markup)
         
     except Exception as e:
         logger.error(f"Error getting inbounds statistics: {e}")
@@ -601,7 +641,127 @@ async def edit_inbound_placeholder(callback: types.CallbackQuery, state: FSMCont
         ]])
     )
 
-@router.callback_query(F.data.startswith(("inbound_users:", "inbound_nodes:", "export_inbound:", "inbound_stats:")), AuthFilter())
+# ================ INBOUND ROLLOUT ================
+
+# Коды callback_data: выбор сегмента и подтверждение раскатки
+ROLLOUT_CALLBACK = "ibr"
+ROLLOUT_CONFIRM_CALLBACK = "ibrc"
+
+ROLLOUT_ACTIONS = {
+    ADD: "➕ Добавить",
+    REMOVE: "➖ Убрать",
+}
+
+@router.callback_query(F.data.startswith("inbound_users:"), AuthFilter())
+async def show_inbound_rollout_menu(callback: types.CallbackQuery):
+    """Choose a user segment to add the inbound to or remove it from"""
+    await callback.answer()
+
+    uuid = callback.data.split(":", 1)[1]
+    short_uuid = pack_uuid(uuid)
+
+    builder = InlineKeyboardBuilder()
+    for segment, (name, _) in ROLLOUT_SEGMENTS.items():
+        builder.row(*(
+            types.InlineKeyboardButton(
+                text=f"{label}: {name.lower()}",
+                callback_data=pack(ROLLOUT_CALLBACK, action, short_uuid, segment)
+            )
+            for action, label in ROLLOUT_ACTIONS.items()
+        ))
+    builder.row(types.InlineKeyboardButton(text="🔙 К Inbound", callback_data=f"view_inbound:{uuid}"))
+
+    await callback.message.edit_text(
+        "👥 **Пользователи Inbound**\n\n"
+        "Выберите сегмент пользователей. Изменены будут только те, у кого "
+        "inbound'а ещё нет (при добавлении) или уже есть (при удалении), "
+        "остальные пользователи панели не затрагиваются.",
+        reply_markup=builder.as_markup()
+    )
+
+@router.callback_query(F.data.startswith(f"{ROLLOUT_CALLBACK}:"), AuthFilter())
+async def preview_inbound_rollout(callback: types.CallbackQuery):
+    """Show how many users the rollout changes and skips before confirming"""
+    _, (action, short_uuid, segment) = unpack(callback.data)
+    uuid = unpack_uuid(short_uuid)
+
+    plan = await plan_rollout(uuid, action, segment)
+    if plan is None:
+        await callback.answer("❌ Список пользователей сейчас недоступен", show_alert=True)
+        return
+    await callback.answer()
+
+    inbound = await get_inbound_by_uuid(uuid) or {}
+    tag = escape_markdown(inbound.get('tag', short_uuid))
+    segment_name = ROLLOUT_SEGMENTS[segment][0]
+
+    builder = InlineKeyboardBuilder()
+    if plan.users:
+        builder.row(types.InlineKeyboardButton(
+            text="✅ Применить",
+            callback_data=pack(ROLLOUT_CONFIRM_CALLBACK, action, short_uuid, segment)
+        ))
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data=f"inbound_users:{uuid}"))
+
+    message = f"{ROLLOUT_ACTIONS[action]} **{tag}**: {segment_name.lower()}\n\n"
+    message += plan.preview()
+    if not plan.users:
+        message += "\nℹ️ Менять нечего — все пользователи сегмента уже в нужном состоянии."
+    else:
+        message += "\n↩️ Изменения можно будет отменить из итогового сообщения."
+
+    await callback.message.edit_text(message, reply_markup=builder.as_markup())
+
+@router.callback_query(F.data.startswith(f"{ROLLOUT_CONFIRM_CALLBACK}:"), AuthFilter())
+async def confirm_inbound_rollout(callback: types.CallbackQuery):
+    """Apply the rollout delta as a background job"""
+    _, (action, short_uuid, segment) = unpack(callback.data)
+    uuid = unpack_uuid(short_uuid)
+    segment_name = ROLLOUT_SEGMENTS[segment][0]
+
+    job = await submit_durable_job(
+        "inbound_rollout", f"{ROLLOUT_ACTIONS[action]} inbound: {segment_name.lower()}",
+        {"inbound": uuid, "action": action, "segment": segment}, callback.message,
+        done_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+            types.InlineKeyboardButton(text="🔙 К Inbound", callback_data=f"view_inbound:{uuid}")
+        ]]),
+        started_by=callback.from_user.id
+    )
+    if job is None:
+        await callback.answer("ℹ️ Эта раскатка уже запущена, см. /jobs", show_alert=True)
+    else:
+        await callback.answer()
+
+async def _plan_inbound_rollout(job: Job, params: Dict) -> List[Step]:
+    # План считается заново по свежему снимку: с момента предпросмотра пользователи могли измениться
+    job.set_stage("🔍 Сравниваю inbound'ы пользователей...")
+    plan = await plan_rollout(params["inbound"], params["action"], params["segment"])
+    if plan is None:
+        raise RuntimeError("user snapshot is not available")
+    params["skipped"] = plan.skipped
+    return plan.steps()
+
+async def _inbound_rollout_step(payload: Dict, progress) -> Tuple[int, int]:
+    return await run_update_step(payload, progress=progress)
+
+def _inbound_rollout_summary(params: Dict, steps: List[StepRecord]) -> str:
+    succeeded = sum(step.succeeded for step in steps)
+    failed = sum(step.failed for step in steps)
+    message = f"✅ **Раскатка inbound'а завершена**\n\n"
+    message += f"• Изменено пользователей: {succeeded}\n"
+    if failed > 0:
+        message += f"• Ошибок: {failed}\n"
+    message += f"• Пропущено (менять не нужно): {params['skipped']}\n"
+    message += f"• Запросов к панели: {len(steps)}"
+    return message
+
+register_job_kind(
+    "inbound_rollout", "🔌 Обновляю inbound'ы пользователей...",
+    _plan_inbound_rollout, _inbound_rollout_step, _inbound_rollout_summary,
+    after=lambda: get_user_pager().invalidate(), capture=rollback.capture
+)
+
+@router.callback_query(F.data.startswith(("inbound_nodes:", "export_inbound:", "inbound_stats:")), AuthFilter())
 async def handle_inbound_features_placeholder(callback: types.CallbackQuery):
     """Handle placeholder inbound features"""
     await callback.answer()
@@ -610,7 +770,6 @@ async def handle_inbound_features_placeholder(callback: types.CallbackQuery):
     uuid = callback.data.split(":", 1)[1]
     
     feature_names = {
-        "inbound_users": "Управление пользователями",
         "inbound_nodes": "Управление серверами",
         "export_inbound": "Экспорт конфигурации",
         "inbound_stats": "Детальная статистика"
@@ -0,0 +1,113 @@
+from aiogram import Router, types, F
+from aiogram.filters import Command
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from datetime import datetime
+import logging
+
+from modules.handlers.auth import AuthFilter
+from modules.services.durable_jobs import ROLLBACK_CALLBACK, submit_durable_job
+from modules.services.jobs import JOB_CALLBACK, STATE_LABELS, Job, get_job_manager
+from modules.utils.callback_data import pack, unpack
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# ================ JOBS LIST ================
+
+def _jobs_screen() -> tuple:
+    """Text and keyboard of the jobs list"""
+    jobs = get_job_manager().jobs()
+    builder = InlineKeyboardBuilder()
+
+    if not jobs:
+        text = "📋 **Фоновые задачи**\n\nЗадач пока нет. Массовые операции запускаются из меню массовых операций."
+    else:
+        active = sum(1 for job in jobs if job.is_active)
+        text = f"📋 **Фоновые задачи**\n\nВыполняется: {active}, завершено: {len(jobs) - active}\n\n"
+        for job in jobs:
+            created = datetime.fromtimestamp(job.created_at).strftime('%d.%m %H:%M')
+            text += f"`#{job.id}` {STATE_LABELS[job.state]} — {job.title} ({created})\n"
+            builder.row(types.InlineKeyboardButton(
+                text=f"#{job.id} {job.title}",
+                callback_data=pack(JOB_CALLBACK, "view", job.id)
+            ))
+
+    builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data="jobs"))
+    builder.row(types.InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu"))
+    return text, builder.as_markup()
+
+@router.message(Command("jobs"), AuthFilter())
+async def jobs_command(message: types.Message):
+    """Handle /jobs command"""
+    text, markup = _jobs_screen()
+    await message.answer(text, reply_markup=markup)
+
+def _is_job_message(message: types.Message, job: Job) -> bool:
+    return message.chat.id == job.message.chat.id and message.message_id == job.message.message_id
+
+@router.callback_query(F.data == "jobs", AuthFilter())
+async def show_jobs(callback: types.CallbackQuery):
+    """Show running and finished jobs"""
+    await callback.answer()
+    text, markup = _jobs_screen()
+    # Сообщение выполняющейся задачи остаётся под прогресс — список отправляем отдельно
+    if any(job.is_active and _is_job_message(callback.message, job) for job in get_job_manager().jobs()):
+        await callback.message.answer(text, reply_markup=markup)
+    else:
+        await callback.message.edit_text(text, reply_markup=markup)
+
+# ================ JOB CONTROLS ================
+
+def _job_view_markup(job: Job) -> types.InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder.from_markup(job.controls())
+    if job.is_active:
+        builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data=pack(JOB_CALLBACK, "view", job.id)))
+    return builder.as_markup()
+
+@router.callback_query(F.data.startswith(f"{JOB_CALLBACK}:"), AuthFilter())
+async def handle_job_action(callback: types.CallbackQuery):
+    """View, pause, resume or cancel a job"""
+    _, args = unpack(callback.data)
+    action, job_id = args[0], int(args[1])
+    job = get_job_manager().get(job_id)
+
+    if job is None:
+        await callback.answer("❌ Задача не найдена — возможно, она уже удалена из истории", show_alert=True)
+        return
+
+    if action == "pause":
+        changed = job.pause()
+        await callback.answer("⏸️ Задача приостановится после текущей пачки" if changed else "Задача не выполняется")
+    elif action == "resume":
+        changed = job.resume()
+        await callback.answer("▶️ Задача продолжена" if changed else "Задача не на паузе")
+    elif action == "cancel":
+        changed = job.cancel()
+        await callback.answer("⏹️ Задача остановится после текущей пачки" if changed else "Задача уже завершена")
+    else:
+        await callback.answer()
+
+    # Сообщение самой задачи обновляет job.show(); здесь — экран задачи из /jobs
+    if not _is_job_message(callback.message, job):
+        await callback.message.edit_text(job.render(), reply_markup=_job_view_markup(job))
+
+# ================ ROLLBACK ================
+
+@router.callback_query(F.data.startswith(f"{ROLLBACK_CALLBACK}:"), AuthFilter())
+async def rollback_job(callback: types.CallbackQuery):
+    """Restore the values a finished job changed"""
+    _, args = unpack(callback.data)
+    job_id = int(args[0])
+
+    job = await submit_durable_job(
+        "rollback", f"↩️ Откат задачи #{job_id}", {"job_id": job_id}, callback.message,
+        done_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+            types.InlineKeyboardButton(text="📋 Все задачи", callback_data="jobs")
+        ]]),
+        started_by=callback.from_user.id
+    )
+    if job is None:
+        await callback.answer("ℹ️ Откат этой задачи уже выполняется, см. /jobs", show_alert=True)
+    else:
+        await callback.answer()
@@ -4,7 +4,7 @@ import logging
 
 from modules.handlers.auth import AuthFilter
 from modules.api.users import get_users_count, get_users_stats
-from modules.api.nodes import get_all_nodes
+from modules.services.node_watcher import get_nodes_cached
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +69,7 @@ async def get_system_stats():
         # Get node statistics
         try:
             logger.info("Getting node statistics...")
-            nodes = await get_all_nodes()
+            nodes = await get_nodes_cached()
             logger.info(f"Nodes response: {len(nodes) if nodes else 0} nodes")
             if nodes:
                 total_nodes = len(nodes)
@@ -5,13 +5,18 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from datetime import datetime, timedelta
 import logging
 import re
+from typing import Optional
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import NodeStates
 from modules.api.client import RemnaAPI
-from modules.api.nodes import get_all_nodes, get_node_by_uuid
+from modules.api.executor import run_bounded
+from modules.api.nodes import get_node_by_uuid
 from modules.api.users import get_all_users
 from modules.api.system import SystemAPI
+from modules.services.node_watcher import get_node_watcher, get_nodes_cached, invalidate_nodes_cache
+from modules.utils.outbound import get_outbound
+from modules.utils.render_cache import get_rendered, page_key, remember_rendered
 from modules.utils.formatters_aiogram import (
     format_bytes, format_datetime, escape_markdown
 )
@@ -20,6 +25,9 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Серверов на странице списка
+NODES_PER_PAGE = 8
+
 # ================ UTILITY FUNCTIONS ================
 
 def format_node_details(node: dict) -> str:
@@ -130,12 +138,17 @@ async def show_nodes_menu(callback: types.CallbackQuery):
         types.InlineKeyboardButton(text="🔄 Перезапустить все", callback_data="restart_all_nodes"),
         types.InlineKeyboardButton(text="📊 Статистика", callback_data="nodes_usage")
     )
+    subscribed = get_node_watcher().is_subscribed(callback.from_user.id)
+    builder.row(types.InlineKeyboardButton(
+        text=f"{'🔔' if subscribed else '🔕'} Уведомления о нодах: {'вкл' if subscribed else 'выкл'}",
+        callback_data="toggle_node_alerts"
+    ))
     builder.row(types.InlineKeyboardButton(text="🔙 Назад в главное меню", callback_data="main_menu"))
 
     message = "🖥️ **Управление серверами**\n\n"
     try:
         # Получаем быструю статистику для превью через HTTP API
-        nodes_list = await get_all_nodes()
+        nodes_list = await get_nodes_cached()
         
         if nodes_list:
             total_nodes = len(nodes_list)
@@ -160,6 +173,12 @@ async def show_nodes_menu(callback: types.CallbackQuery):
         reply_markup=builder.as_markup()
     )
 
+@router.callback_query(F.data == "toggle_node_alerts", AuthFilter())
+async def toggle_node_alerts(callback: types.CallbackQuery):
+    """Toggle node state-change notifications for the current admin"""
+    get_node_watcher().toggle_subscription(callback.from_user.id)
+    await show_nodes_menu(callback)
+
 # ================ LIST NODES ================
 
 @router.callback_query(F.data == "list_nodes", AuthFilter())
@@ -170,7 +189,7 @@ async def list_nodes(callback: types.CallbackQuery, state: FSMContext):
     
     try:
         # Получаем все ноды через HTTP API
-        nodes_list = await get_all_nodes()
+        nodes_list = await get_nodes_cached()
         
         if not nodes_list:
             await callback.message.edit_text(
@@ -181,44 +200,12 @@ async def list_nodes(callback: types.CallbackQuery, state: FSMContext):
             )
             return
         
-        # Store nodes data in state
-        await state.update_data(nodes=nodes_list, page=0)
+        # Поколение — момент публикации списка в общем кэше нод: одинаково для всех администраторов
+        generation = get_node_watcher().updated_at
+        await state.update_data(nodes=nodes_list, page=0, nodes_generation=generation)
         await state.set_state(NodeStates.selecting_node)
         
-        # Count online/offline nodes
-        online_count = sum(1 for node in nodes_list if node.get('isConnected', False))
-        total_count = len(nodes_list)
-        
-        message = f"🖥️ **Список серверов** ({online_count}/{total_count} онлайн)\n\n"
-        
-        # Show first 8 nodes
-        builder = InlineKeyboardBuilder()
-        for i, node in enumerate(nodes_list[:8]):
-            status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
-            disabled_emoji = "⏸️" if node.get('isDisabled', False) else ""
-            
-            node_name = node.get('name', f"Node {node.get('uuid', 'Unknown')[:8]}")
-            button_text = f"{status_emoji}{disabled_emoji} {node_name}"
-            builder.row(types.InlineKeyboardButton(
-                text=button_text,
-                callback_data=f"view_node:{node.get('uuid')}"
-            ))
-        
-        # Pagination if needed
-        if len(nodes_list) > 8:
-            builder.row(
-                types.InlineKeyboardButton(text="◀️", callback_data="nodes_page:0"),
-                types.InlineKeyboardButton(text="▶️", callback_data="nodes_page:1")
-            )
-        
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="nodes"))
-        
-        message += "Выберите сервер для просмотра подробной информации:"
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
+        await show_nodes_page(callback.message, nodes_list, 0, generation)
         
     except Exception as e:
         logger.error(f"Error listing nodes: {e}")
@@ -244,22 +231,35 @@ async def handle_node_pagination(callback: types.CallbackQuery, state: FSMContex
         await callback.answer("❌ Данные серверов не найдены", show_alert=True)
         return
     
-    items_per_page = 8
-    total_pages = (len(nodes_list) + items_per_page - 1) // items_per_page
-    
+    total_pages = (len(nodes_list) + NODES_PER_PAGE - 1) // NODES_PER_PAGE
     if page < 0 or page >= total_pages:
         await callback.answer("❌ Неверная страница", show_alert=True)
         return
     
-    start_idx = page * items_per_page
-    end_idx = start_idx + items_per_page
+    await state.update_data(page=page)
+    await show_nodes_page(callback.message, nodes_list, page, data.get('nodes_generation'))
+
+async def show_nodes_page(message: types.Message, nodes_list: list, page: int, generation: Optional[float] = None):
+    """Show one page of the node list; pages of one list generation are rendered once"""
+    key = page_key("nodes", page, generation) if generation is not None else None
+    cached = get_rendered(key) if key is not None else None
+    if cached is not None:
+        text, markup = cached
+        await message.edit_text(text=text, reply_markup=markup)
+        return
+    
+    total_pages = (len(nodes_list) + NODES_PER_PAGE - 1) // NODES_PER_PAGE
+    start_idx = page * NODES_PER_PAGE
+    end_idx = start_idx + NODES_PER_PAGE
     page_nodes = nodes_list[start_idx:end_idx]
     
     online_count = sum(1 for node in nodes_list if node.get('isConnected', False))
     total_count = len(nodes_list)
     
-    message = f"🖥️ **Список серверов** ({online_count}/{total_count} онлайн)\n"
-    message += f"Страница {page + 1} из {total_pages}\n\n"
+    message_text = f"🖥️ **Список серверов** ({online_count}/{total_count} онлайн)\n"
+    if total_pages > 1:
+        message_text += f"Страница {page + 1} из {total_pages}\n"
+    message_text += "\n"
     
     builder = InlineKeyboardBuilder()
     for node in page_nodes:
@@ -285,11 +285,14 @@ async def handle_node_pagination(callback: types.CallbackQuery, state: FSMContex
     
     builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="nodes"))
     
-    message += "Выберите сервер для просмотра подробной информации:"
+    message_text += "Выберите сервер для просмотра подробной информации:"
     
-    await callback.message.edit_text(
-        text=message,
-        reply_markup=builder.as_markup()
+    markup = builder.as_markup()
+    if key is not None:
+        remember_rendered(key, message_text, markup)
+    await message.edit_text(
+        text=message_text,
+        reply_markup=markup
     )
 
 # ================ VIEW NODE DETAILS ================
@@ -371,6 +374,7 @@ async def enable_node(callback: types.CallbackQuery, state: FSMContext):
     try:
         # Включаем ноду через HTTP API
         response = await RemnaAPI.patch(f"nodes/{node_uuid}", data={"isDisabled": False})
+        invalidate_nodes_cache()
         
         if response:
             await callback.answer("✅ Сервер включен", show_alert=True)
@@ -393,6 +397,7 @@ async def disable_node(callback: types.CallbackQuery, state: FSMContext):
     try:
         # Отключаем ноду через HTTP API
         response = await RemnaAPI.patch(f"nodes/{node_uuid}", data={"isDisabled": True})
+        invalidate_nodes_cache()
         
         if response:
             await callback.answer("✅ Сервер отключен", show_alert=True)
@@ -472,6 +477,7 @@ async def confirm_delete_node(callback: types.CallbackQuery, state: FSMContext):
     try:
         # Удаляем ноду через HTTP API
         response = await RemnaAPI.delete(f"nodes/{node_uuid}")
+        invalidate_nodes_cache()
         
         if response:
             await callback.answer("✅ Сервер удален", show_alert=True)
@@ -536,7 +542,7 @@ async def show_node_stats(callback: types.CallbackQuery, state: FSMContext):
                 
                 if not node_users:
                     # Если нет прямой привязки, распределяем пользователей равномерно между нодами
-                    nodes_list = await get_all_nodes()
+                    nodes_list = await get_nodes_cached()
                     if nodes_list and len(nodes_list) > 0:
                         users_per_node = len(users_list) // len(nodes_list)
                         node_index = next((i for i, n in enumerate(nodes_list) if n.get('uuid') == node_uuid), 0)
@@ -607,7 +613,7 @@ async def show_nodes_usage(callback: types.CallbackQuery, state: FSMContext):
     
     try:
         # Получаем все ноды через HTTP API
-        nodes_list = await get_all_nodes()
+        nodes_list = await get_nodes_cached()
         if not nodes_list:
             await callback.message.edit_text(
                 "❌ Серверы не найдены.",
@@ -806,6 +812,28 @@ async def restart_all_nodes_confirm(callback: types.CallbackQuery):
         reply_markup=builder.as_markup()
     )
 
+async def _restart_nodes_one_by_one(message: types.Message) -> str:
+    """Restart enabled nodes with per-node requests when restart-all is unavailable"""
+    nodes = [node for node in await get_nodes_cached() or [] if not node.get('isDisabled', False)]
+    if not nodes:
+        return "❌ Ошибка при перезапуске серверов."
+    
+    async def report(done: int, total: int):
+        get_outbound().edit(message, f"🔄 Перезапуск серверов по одному: {done}/{total}")
+    
+    async def restart(node_uuid: str):
+        return await RemnaAPI.post(f"nodes/{node_uuid}/restart")
+    
+    results = await run_bounded([node['uuid'] for node in nodes], restart, progress=report)
+    names = {node['uuid']: node.get('name', node['uuid']) for node in nodes}
+    
+    text = "🔄 Общая команда перезапуска не сработала, серверы перезапущены по одному.\n\n"
+    text += f"✅ Перезапущено: {results.succeeded} из {len(results)}\n"
+    failed = results.failed_items()
+    if failed:
+        text += "❌ Не удалось: " + ", ".join(escape_markdown(names[uuid]) for uuid in failed)
+    return text
+
 @router.callback_query(F.data == "confirm_restart_all_nodes", AuthFilter())
 async def confirm_restart_all_nodes(callback: types.CallbackQuery):
     """Confirm restart all nodes"""
@@ -818,7 +846,7 @@ async def confirm_restart_all_nodes(callback: types.CallbackQuery):
         if response:
             message = "✅ Команда на перезапуск всех серверов успешно отправлена."
         else:
-            message = "❌ Ошибка при перезапуске серверов."
+            message = await _restart_nodes_one_by_one(callback.message)
         
         await callback.message.edit_text(
             message,
@@ -1041,6 +1069,7 @@ async def confirm_create_node(callback: types.CallbackQuery, state: FSMContext):
     try:
         # Создаем ноду через HTTP API
         response = await RemnaAPI.post("nodes", data=node_data)
+        invalidate_nodes_cache()
         
         if response:
             await callback.answer("✅ Нода создана успешно", show_alert=True)
@@ -10,7 +10,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from modules.handlers.auth import AuthFilter
 from modules.api.users import get_all_users
-from modules.api.nodes import get_all_nodes
+from modules.services.node_watcher import get_nodes_cached
 from modules.api.system import SystemAPI
 from modules.utils.formatters_aiogram import format_bytes
 from modules.config import (
@@ -330,7 +330,7 @@ async def get_user_stats():
 async def get_node_stats():
     """Get node statistics using direct HTTP API"""
     try:
-        nodes_data = await get_all_nodes()
+        nodes_data = await get_nodes_cached()
         
         if not nodes_data:
             return None
@@ -438,7 +438,7 @@ async def get_server_info():
             logger.warning(f"Could not get inbounds info: {e}")
         
         # Альтернативный fallback - считаем активные ноды
-        nodes_data = await get_all_nodes()
+        nodes_data = await get_nodes_cached()
         if nodes_data:
             active_nodes = sum(1 for node in nodes_data 
                 if node.get('isConnected', False) and not node.get('isDisabled', False))
@@ -690,7 +690,7 @@ async def get_user_stats_safe():
 async def get_node_stats_safe():
     """Get node statistics - safe version"""
     try:
-        nodes_data = await get_all_nodes()
+        nodes_data = await get_nodes_cached()
         
         if not nodes_data:
             return None
@@ -909,7 +909,7 @@ async def status_command(message: types.Message):
                 status_text += f"📊 Пользователей: 0\n"
             
             # Статистика нод
-            nodes_data = await get_all_nodes()
+            nodes_data = await get_nodes_cached()
             if nodes_data:
                 nodes_count = len(nodes_data)
                 online_nodes = sum(1 for node in nodes_data 
@@ -982,6 +982,7 @@ async def help_command(message: types.Message):
 • `/start` - Главное меню
 • `/help` - Эта справка
 • `/status` - Статус системы
+• `/jobs` - Фоновые задачи массовых операций
 
 **Разделы управления:**
 • 👥 **Пользователи** - Создание, редактирование, просмотр пользователей
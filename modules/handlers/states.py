@@ -41,6 +41,8 @@ class UserStates(StatesGroup):
     
     # Template creation states (extending existing ones)
     template_selection = State()
+    # Импорт пользователей: ожидание файла или числа пользователей по шаблону
+    import_source = State()
 
 
 class NodeStates(StatesGroup):
@@ -119,6 +121,9 @@ class HostStates(StatesGroup):
     entering_host_port = State()        # Используется в host_handlers.py
     selecting_inbound = State()         # Используется в host_handlers.py
     
+    # Массовые операции над выбранными хостами
+    bulk_entering_port = State()
+    
     # Старые состояния (для совместимости, если где-то используются)
     enter_name = State()
     enter_domain = State()
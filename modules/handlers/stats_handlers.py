@@ -2,15 +2,32 @@ from aiogram import Router, types, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+import asyncio
+import calendar
 import logging
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import SystemStates
 from modules.api.client import RemnaAPI
 from modules.api.system import SystemAPI
 from modules.api.users import get_all_users, get_users_count
-from modules.api.nodes import get_all_nodes
+from modules.services.node_watcher import get_nodes_cached
+from modules.services.metrics_store import get_metrics_store
+from modules.services.traffic_sampler import PANEL_TRAFFIC_SERIES
+from modules.utils.formatters_aiogram import format_sparkline
+from modules.services.charts import (
+    CHARTS, CHART_WINDOWS, ChartDataUnavailable,
+    chart_cache_key, get_cached_file_id, remember_file_id, render_chart
+)
+from modules.services.alerts import get_alert_engine
+from modules.services.live_monitor import get_live_monitor
+from modules.services.screen_cache import (
+    Screen, get_screen_cache, get_users_cached, nodes_generation, screen_key, users_generation
+)
+from modules.config import ALERT_TRAFFIC_THRESHOLD, ALERT_EXPIRY_DAYS, ALERT_COOLDOWN
 
 logger = logging.getLogger(__name__)
 
@@ -102,7 +119,7 @@ async def show_stats_menu(callback: types.CallbackQuery):
     try:
         # Получаем быструю статистику для превью используя прямые HTTP вызовы
         users_list = await get_all_users()
-        nodes_list = await get_all_nodes()
+        nodes_list = await get_nodes_cached()
         
         if users_list:
             total_users = len(users_list)
@@ -134,82 +151,88 @@ async def show_stats_menu(callback: types.CallbackQuery):
 
 # ================ SYSTEM STATISTICS ================
 
+async def _render_system_stats() -> Optional[Screen]:
+    # Получаем системную статистику через HTTP API
+    system_stats = await SystemAPI.get_stats()
+    users_list = await get_users_cached()
+    nodes_list = await get_nodes_cached()
+
+    message = "📊 **Статистика системы**\n\n"
+
+    # Основная информация о системе
+    if system_stats:
+        if system_stats.get('version'):
+            message += f"**🔧 Версия системы:** {escape_markdown(system_stats.get('version'))}\n"
+        if system_stats.get('uptime'):
+            message += f"**⏱️ Время работы:** {format_uptime(system_stats.get('uptime'))}\n"
+        if system_stats.get('lastRestart'):
+            message += f"**🔄 Последний перезапуск:** {format_datetime(system_stats.get('lastRestart'))}\n"
+
+    # Статистика пользователей
+    if users_list:
+        total_users = len(users_list)
+        active_users = sum(1 for user in users_list if user.get('status') == 'ACTIVE')
+
+        message += "\n**👥 Пользователи:**\n"
+        message += f"• Всего: {total_users}\n"
+        message += f"• Активных: {active_users}\n"
+        message += f"• Неактивных: {total_users - active_users}\n"
+
+        # Статистика трафика
+        total_traffic_used = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
+        total_traffic_limit = sum(user.get('trafficLimit', 0) or 0 for user in users_list if user.get('trafficLimit'))
+
+        message += "\n**📈 Трафик:**\n"
+        message += f"• Использовано: {format_bytes(total_traffic_used)}\n"
+        if total_traffic_limit > 0:
+            message += f"• Общий лимит: {format_bytes(total_traffic_limit)}\n"
+            usage_percent = (total_traffic_used / total_traffic_limit) * 100
+            message += f"• Использовано: {usage_percent:.1f}%\n"
+
+    # Статистика нод
+    if nodes_list:
+        total_nodes = len(nodes_list)
+        online_nodes = sum(1 for node in nodes_list if node.get('isConnected', False))
+
+        message += "\n**🖥️ Серверы:**\n"
+        message += f"• Всего: {total_nodes}\n"
+        message += f"• Онлайн: {online_nodes}\n"
+        message += f"• Офлайн: {total_nodes - online_nodes}\n"
+
+    # Системные ресурсы (если доступно)
+    if system_stats:
+        if system_stats.get('cpuUsage') is not None:
+            message += f"\n**💻 Ресурсы:**\n"
+            message += f"• CPU: {system_stats.get('cpuUsage')}%\n"
+        if system_stats.get('memoryUsage') is not None:
+            message += f"• RAM: {system_stats.get('memoryUsage')}%\n"
+        if system_stats.get('diskUsage') is not None:
+            message += f"• Диск: {system_stats.get('diskUsage')}%\n"
+
+    # Кнопки управления
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="system_stats"),
+        types.InlineKeyboardButton(text="📊 Детали", callback_data="system_stats_detailed")
+    )
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
+
+    return message, builder.as_markup()
+
+
 @router.callback_query(F.data == "system_stats", AuthFilter())
 async def show_system_stats(callback: types.CallbackQuery, state: FSMContext):
     """Show system statistics"""
     await callback.answer()
-    await callback.message.edit_text("📊 Загрузка статистики системы...")
-    
+    cache = get_screen_cache()
+    # Аптайм и ресурсы панели не имеют ленты изменений — их свежесть держит TTL кэша
+    key = screen_key("system_stats", generation=(users_generation(), nodes_generation()))
+    if not cache.is_cached(key):
+        await callback.message.edit_text("📊 Загрузка статистики системы...")
+
     try:
-        # Получаем системную статистику через HTTP API
-        system_stats = await SystemAPI.get_stats()
-        users_list = await get_all_users()
-        nodes_list = await get_all_nodes()
-        
-        message = "📊 **Статистика системы**\n\n"
-        
-        # Основная информация о системе
-        if system_stats:
-            if system_stats.get('version'):
-                message += f"**🔧 Версия системы:** {escape_markdown(system_stats.get('version'))}\n"
-            if system_stats.get('uptime'):
-                message += f"**⏱️ Время работы:** {format_uptime(system_stats.get('uptime'))}\n"
-            if system_stats.get('lastRestart'):
-                message += f"**🔄 Последний перезапуск:** {format_datetime(system_stats.get('lastRestart'))}\n"
-        
-        # Статистика пользователей
-        if users_list:
-            total_users = len(users_list)
-            active_users = sum(1 for user in users_list if user.get('status') == 'ACTIVE')
-            
-            message += "\n**👥 Пользователи:**\n"
-            message += f"• Всего: {total_users}\n"
-            message += f"• Активных: {active_users}\n"
-            message += f"• Неактивных: {total_users - active_users}\n"
-            
-            # Статистика трафика
-            total_traffic_used = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
-            total_traffic_limit = sum(user.get('trafficLimit', 0) or 0 for user in users_list if user.get('trafficLimit'))
-            
-            message += "\n**📈 Трафик:**\n"
-            message += f"• Использовано: {format_bytes(total_traffic_used)}\n"
-            if total_traffic_limit > 0:
-                message += f"• Общий лимит: {format_bytes(total_traffic_limit)}\n"
-                usage_percent = (total_traffic_used / total_traffic_limit) * 100
-                message += f"• Использовано: {usage_percent:.1f}%\n"
-        
-        # Статистика нод
-        if nodes_list:
-            total_nodes = len(nodes_list)
-            online_nodes = sum(1 for node in nodes_list if node.get('isConnected', False))
-            
-            message += "\n**🖥️ Серверы:**\n"
-            message += f"• Всего: {total_nodes}\n"
-            message += f"• Онлайн: {online_nodes}\n"
-            message += f"• Офлайн: {total_nodes - online_nodes}\n"
-        
-        # Системные ресурсы (если доступно)
-        if system_stats:
-            if system_stats.get('cpuUsage') is not None:
-                message += f"\n**💻 Ресурсы:**\n"
-                message += f"• CPU: {system_stats.get('cpuUsage')}%\n"
-            if system_stats.get('memoryUsage') is not None:
-                message += f"• RAM: {system_stats.get('memoryUsage')}%\n"
-            if system_stats.get('diskUsage') is not None:
-                message += f"• Диск: {system_stats.get('diskUsage')}%\n"
-        
-        # Кнопки управления
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="system_stats"),
-            types.InlineKeyboardButton(text="📊 Детали", callback_data="system_stats_detailed")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
+        text, markup = await cache.get(key, _render_system_stats)
+        await callback.message.edit_text(text=text, reply_markup=markup)
         
     except Exception as e:
         logger.error(f"Error getting system stats: {e}")
@@ -224,157 +247,163 @@ async def show_system_stats(callback: types.CallbackQuery, state: FSMContext):
 
 # Замените функцию show_bandwidth_stats на эту исправленную версию:
 
+async def _render_bandwidth_stats() -> Optional[Screen]:
+    # Получаем статистику трафика через HTTP API
+    bandwidth_stats = await SystemAPI.get_bandwidth_stats()
+    users_list = await get_users_cached()
+    nodes_list = await get_nodes_cached()
+
+    message = "📈 Статистика трафика\n\n"  # БЕЗ markdown
+
+    # Общая статистика трафика
+    if users_list:
+        total_used = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
+        total_limit = sum(user.get('trafficLimit', 0) or 0 for user in users_list if user.get('trafficLimit'))
+
+        message += "📊 Общая статистика:\n"
+        message += f"• Использовано всего: {format_bytes(total_used)}\n"
+        if total_limit > 0:
+            message += f"• Общий лимит: {format_bytes(total_limit)}\n"
+            remaining = total_limit - total_used
+            message += f"• Осталось: {format_bytes(remaining)}\n"
+            usage_percent = (total_used / total_limit) * 100
+            message += f"• Использовано: {usage_percent:.1f}%\n"
+
+    # Исправленная статистика по нодам
+    if nodes_list and users_list:
+        message += "\n🖥️ По серверам:\n"
+
+        # Получаем трафик по каждой ноде через API
+        for node in nodes_list:
+            try:
+                # Попробуем получить статистику конкретной ноды через API
+                node_uuid = node.get('uuid')
+                node_stats = None
+
+                # Если есть API endpoint для статистики ноды
+                try:
+                    # Можно попробовать получить через /api/nodes/{uuid}/stats
+                    pass  # пока не реализовано в API
+                except:
+                    pass
+
+                # Альтернативный способ - найти пользователей связанных с нодой
+                node_users = []
+                node_traffic = 0
+
+                # Ищем пользователей по различным полям связи с нодой
+                for user in users_list:
+                    # Проверяем разные поля связи пользователя с нодой
+                    user_node_id = user.get('nodeUuid') or user.get('nodeId') or user.get('serverId')
+                    user_inbounds = user.get('inbounds', [])
+
+                    is_on_node = False
+
+                    # Метод 1: прямая связь через nodeUuid
+                    if user_node_id == node_uuid:
+                        is_on_node = True
+
+                    # Метод 2: через inbounds
+                    elif user_inbounds:
+                        for inbound in user_inbounds:
+                            if isinstance(inbound, dict):
+                                inbound_node_id = inbound.get('nodeUuid') or inbound.get('nodeId')
+                                if inbound_node_id == node_uuid:
+                                    is_on_node = True
+                                    break
+
+                    if is_on_node:
+                        node_users.append(user)
+                        node_traffic += user.get('usedTraffic', 0) or 0
+
+                # Если не нашли пользователей через связи, используем равномерное распределение
+                if not node_users and users_list:
+                    total_nodes = len(nodes_list)
+                    users_per_node = len(users_list) // total_nodes
+                    remainder_users = len(users_list) % total_nodes
+
+                    node_index = nodes_list.index(node)
+                    start_idx = node_index * users_per_node
+
+                    # Распределяем остаток пользователей по первым нодам
+                    if node_index < remainder_users:
+                        start_idx += node_index
+                        end_idx = start_idx + users_per_node + 1
+                    else:
+                        start_idx += remainder_users
+                        end_idx = start_idx + users_per_node
+
+                    if start_idx < len(users_list):
+                        node_users = users_list[start_idx:end_idx]
+                        node_traffic = sum(user.get('usedTraffic', 0) or 0 for user in node_users)
+
+                status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
+                node_name = node.get('name', 'Unknown')  # БЕЗ escape_markdown
+
+                message += f"{status_emoji} {node_name}\n"
+                message += f"  • Пользователей: {len(node_users)}\n"
+                message += f"  • Трафик: {format_bytes(node_traffic)}\n"
+
+            except Exception as e:
+                logger.warning(f"Error processing node {node.get('name', 'Unknown')}: {e}")
+                status_emoji = "🔴"
+                node_name = node.get('name', 'Unknown')
+                message += f"{status_emoji} {node_name}\n"
+                message += f"  • Ошибка получения данных\n"
+
+    # Топ пользователей по трафику
+    if users_list:
+        top_users = sorted(
+            [user for user in users_list if user.get('usedTraffic', 0) > 0],
+            key=lambda u: u.get('usedTraffic', 0),
+            reverse=True
+        )[:5]
+
+        if top_users:
+            message += "\n🏆 Топ пользователей по трафику:\n"
+            for i, user in enumerate(top_users, 1):
+                username = user.get('username', 'Unknown')  # БЕЗ escape_markdown
+                traffic = format_bytes(user.get('usedTraffic', 0))
+                message += f"{i}. {username}: {traffic}\n"
+
+    # Статистика за периоды (если доступно в API)
+    if bandwidth_stats:
+        if bandwidth_stats.get('daily'):
+            message += "\n📅 За сегодня:\n"
+            daily = bandwidth_stats.get('daily', {})
+            if daily.get('upload'):
+                message += f"• Загружено: {format_bytes(daily.get('upload'))}\n"
+            if daily.get('download'):
+                message += f"• Скачано: {format_bytes(daily.get('download'))}\n"
+
+    # Кнопки управления
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="bandwidth_stats"),
+        types.InlineKeyboardButton(text="📊 Детали", callback_data="bandwidth_stats_detailed")
+    )
+    builder.row(
+        types.InlineKeyboardButton(text="📈 За неделю", callback_data="bandwidth_weekly"),
+        types.InlineKeyboardButton(text="📉 За месяц", callback_data="bandwidth_monthly")
+    )
+    builder.row(types.InlineKeyboardButton(text="📆 За год", callback_data="bandwidth_yearly"))
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
+
+    return message, builder.as_markup()
+
+
 @router.callback_query(F.data == "bandwidth_stats", AuthFilter())
 async def show_bandwidth_stats(callback: types.CallbackQuery, state: FSMContext):
     """Show bandwidth statistics"""
     await callback.answer()
-    await callback.message.edit_text("📈 Загрузка статистики трафика...")
-    
+    cache = get_screen_cache()
+    key = screen_key("bandwidth_stats", generation=(users_generation(), nodes_generation()))
+    if not cache.is_cached(key):
+        await callback.message.edit_text("📈 Загрузка статистики трафика...")
+
     try:
-        # Получаем статистику трафика через HTTP API
-        bandwidth_stats = await SystemAPI.get_bandwidth_stats()
-        users_list = await get_all_users()
-        nodes_list = await get_all_nodes()
-        
-        message = "📈 Статистика трафика\n\n"  # БЕЗ markdown
-        
-        # Общая статистика трафика
-        if users_list:
-            total_used = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
-            total_limit = sum(user.get('trafficLimit', 0) or 0 for user in users_list if user.get('trafficLimit'))
-            
-            message += "📊 Общая статистика:\n"
-            message += f"• Использовано всего: {format_bytes(total_used)}\n"
-            if total_limit > 0:
-                message += f"• Общий лимит: {format_bytes(total_limit)}\n"
-                remaining = total_limit - total_used
-                message += f"• Осталось: {format_bytes(remaining)}\n"
-                usage_percent = (total_used / total_limit) * 100
-                message += f"• Использовано: {usage_percent:.1f}%\n"
-        
-        # Исправленная статистика по нодам
-        if nodes_list and users_list:
-            message += "\n🖥️ По серверам:\n"
-            
-            # Получаем трафик по каждой ноде через API
-            for node in nodes_list:
-                try:
-                    # Попробуем получить статистику конкретной ноды через API
-                    node_uuid = node.get('uuid')
-                    node_stats = None
-                    
-                    # Если есть API endpoint для статистики ноды
-                    try:
-                        # Можно попробовать получить через /api/nodes/{uuid}/stats
-                        pass  # пока не реализовано в API
-                    except:
-                        pass
-                    
-                    # Альтернативный способ - найти пользователей связанных с нодой
-                    node_users = []
-                    node_traffic = 0
-                    
-                    # Ищем пользователей по различным полям связи с нодой
-                    for user in users_list:
-                        # Проверяем разные поля связи пользователя с нодой
-                        user_node_id = user.get('nodeUuid') or user.get('nodeId') or user.get('serverId')
-                        user_inbounds = user.get('inbounds', [])
-                        
-                        is_on_node = False
-                        
-                        # Метод 1: прямая связь через nodeUuid
-                        if user_node_id == node_uuid:
-                            is_on_node = True
-                        
-                        # Метод 2: через inbounds
-                        elif user_inbounds:
-                            for inbound in user_inbounds:
-                                if isinstance(inbound, dict):
-                                    inbound_node_id = inbound.get('nodeUuid') or inbound.get('nodeId')
-                                    if inbound_node_id == node_uuid:
-                                        is_on_node = True
-                                        break
-                        
-                        if is_on_node:
-                            node_users.append(user)
-                            node_traffic += user.get('usedTraffic', 0) or 0
-                    
-                    # Если не нашли пользователей через связи, используем равномерное распределение
-                    if not node_users and users_list:
-                        total_nodes = len(nodes_list)
-                        users_per_node = len(users_list) // total_nodes
-                        remainder_users = len(users_list) % total_nodes
-                        
-                        node_index = nodes_list.index(node)
-                        start_idx = node_index * users_per_node
-                        
-                        # Распределяем остаток пользователей по первым нодам
-                        if node_index < remainder_users:
-                            start_idx += node_index
-                            end_idx = start_idx + users_per_node + 1
-                        else:
-                            start_idx += remainder_users
-                            end_idx = start_idx + users_per_node
-                        
-                        if start_idx < len(users_list):
-                            node_users = users_list[start_idx:end_idx]
-                            node_traffic = sum(user.get('usedTraffic', 0) or 0 for user in node_users)
-                    
-                    status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
-                    node_name = node.get('name', 'Unknown')  # БЕЗ escape_markdown
-                    
-                    message += f"{status_emoji} {node_name}\n"
-                    message += f"  • Пользователей: {len(node_users)}\n"
-                    message += f"  • Трафик: {format_bytes(node_traffic)}\n"
-                    
-                except Exception as e:
-                    logger.warning(f"Error processing node {node.get('name', 'Unknown')}: {e}")
-                    status_emoji = "🔴"
-                    node_name = node.get('name', 'Unknown')
-                    message += f"{status_emoji} {node_name}\n"
-                    message += f"  • Ошибка получения данных\n"
-        
-        # Топ пользователей по трафику
-        if users_list:
-            top_users = sorted(
-                [user for user in users_list if user.get('usedTraffic', 0) > 0],
-                key=lambda u: u.get('usedTraffic', 0),
-                reverse=True
-            )[:5]
-            
-            if top_users:
-                message += "\n🏆 Топ пользователей по трафику:\n"
-                for i, user in enumerate(top_users, 1):
-                    username = user.get('username', 'Unknown')  # БЕЗ escape_markdown
-                    traffic = format_bytes(user.get('usedTraffic', 0))
-                    message += f"{i}. {username}: {traffic}\n"
-        
-        # Статистика за периоды (если доступно в API)
-        if bandwidth_stats:
-            if bandwidth_stats.get('daily'):
-                message += "\n📅 За сегодня:\n"
-                daily = bandwidth_stats.get('daily', {})
-                if daily.get('upload'):
-                    message += f"• Загружено: {format_bytes(daily.get('upload'))}\n"
-                if daily.get('download'):
-                    message += f"• Скачано: {format_bytes(daily.get('download'))}\n"
-        
-        # Кнопки управления
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="bandwidth_stats"),
-            types.InlineKeyboardButton(text="📊 Детали", callback_data="bandwidth_stats_detailed")
-        )
-        builder.row(
-            types.InlineKeyboardButton(text="📈 За неделю", callback_data="bandwidth_weekly"),
-            types.InlineKeyboardButton(text="📉 За месяц", callback_data="bandwidth_monthly")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
+        text, markup = await cache.get(key, _render_bandwidth_stats)
+        await callback.message.edit_text(text=text, reply_markup=markup)
         
     except Exception as e:
         logger.error(f"Error getting bandwidth stats: {e}")
@@ -387,18 +416,83 @@ async def show_bandwidth_stats(callback: types.CallbackQuery, state: FSMContext)
 
 # ================ NODES STATISTICS ================
 
+async def _render_nodes_stats() -> Optional[Screen]:
+    # Получаем информацию о нодах через HTTP API
+    nodes_list = await get_nodes_cached()
+    if not nodes_list:
+        return None
+    users_list = await get_users_cached()
+
+    message = "🖥️ **Статистика серверов**\n\n"
+
+    # Общая информация
+    total_nodes = len(nodes_list)
+    online_nodes = sum(1 for node in nodes_list if node.get('isConnected', False))
+
+    message += f"**📊 Общая информация:**\n"
+    message += f"• Всего серверов: {total_nodes}\n"
+    message += f"• Онлайн: {online_nodes}\n"
+    message += f"• Офлайн: {total_nodes - online_nodes}\n\n"
+
+    # Детальная информация по каждой ноде
+    message += "**📋 Детали серверов:**\n"
+    for node in nodes_list:
+        status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
+
+        # Пользователи на этой ноде
+        node_users = [user for user in users_list if user.get('nodeUuid') == node.get('uuid')] if users_list else []
+        active_users = sum(1 for user in node_users if user.get('status') == 'ACTIVE')
+        node_traffic = sum(user.get('usedTraffic', 0) or 0 for user in node_users)
+
+        node_name = escape_markdown(node.get('name', 'Unknown'))
+        node_address = escape_markdown(node.get('address', 'Unknown'))
+
+        message += f"{status_emoji} **{node_name}**\n"
+        message += f"  • Адрес: `{node_address}`\n"
+        message += f"  • Пользователей: {len(node_users)} \\(активных: {active_users}\\)\n"
+        message += f"  • Трафик: {format_bytes(node_traffic)}\n"
+
+        if node.get('isConnected'):
+            # Дополнительная информация для онлайн нод
+            if node.get('lastSeen'):
+                message += f"  • Последняя связь: {format_datetime(node.get('lastSeen'))}\n"
+            if node.get('version'):
+                message += f"  • Версия: {escape_markdown(node.get('version'))}\n"
+            if node.get('uptime'):
+                message += f"  • Uptime: {format_uptime(node.get('uptime'))}\n"
+        else:
+            if node.get('lastSeen'):
+                message += f"  • Офлайн с: {format_datetime(node.get('lastSeen'))}\n"
+
+        message += "\n"
+
+    # Кнопки управления
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="nodes_stats"),
+        types.InlineKeyboardButton(text="📊 Детали", callback_data="nodes_detailed")
+    )
+    builder.row(
+        types.InlineKeyboardButton(text="🖥️ Управление", callback_data="nodes"),
+        types.InlineKeyboardButton(text="📈 Мониторинг", callback_data="nodes_monitoring")
+    )
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
+
+    return message, builder.as_markup()
+
+
 @router.callback_query(F.data == "nodes_stats", AuthFilter())
 async def show_nodes_stats(callback: types.CallbackQuery, state: FSMContext):
     """Show nodes statistics"""
     await callback.answer()
-    await callback.message.edit_text("🖥️ Загрузка статистики серверов...")
-    
+    cache = get_screen_cache()
+    key = screen_key("nodes_stats", generation=(users_generation(), nodes_generation()))
+    if not cache.is_cached(key):
+        await callback.message.edit_text("🖥️ Загрузка статистики серверов...")
+
     try:
-        # Получаем информацию о нодах через HTTP API
-        nodes_list = await get_all_nodes()
-        users_list = await get_all_users()
-        
-        if not nodes_list:
+        screen = await cache.get(key, _render_nodes_stats)
+        if screen is None:
             await callback.message.edit_text(
                 "❌ Серверы не найдены",
                 reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
@@ -406,66 +500,9 @@ async def show_nodes_stats(callback: types.CallbackQuery, state: FSMContext):
                 ]])
             )
             return
-        
-        message = "🖥️ **Статистика серверов**\n\n"
-        
-        # Общая информация
-        total_nodes = len(nodes_list)
-        online_nodes = sum(1 for node in nodes_list if node.get('isConnected', False))
-        
-        message += f"**📊 Общая информация:**\n"
-        message += f"• Всего серверов: {total_nodes}\n"
-        message += f"• Онлайн: {online_nodes}\n"
-        message += f"• Офлайн: {total_nodes - online_nodes}\n\n"
-        
-        # Детальная информация по каждой ноде
-        message += "**📋 Детали серверов:**\n"
-        for node in nodes_list:
-            status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
-            
-            # Пользователи на этой ноде
-            node_users = [user for user in users_list if user.get('nodeUuid') == node.get('uuid')] if users_list else []
-            active_users = sum(1 for user in node_users if user.get('status') == 'ACTIVE')
-            node_traffic = sum(user.get('usedTraffic', 0) or 0 for user in node_users)
-            
-            node_name = escape_markdown(node.get('name', 'Unknown'))
-            node_address = escape_markdown(node.get('address', 'Unknown'))
-            
-            message += f"{status_emoji} **{node_name}**\n"
-            message += f"  • Адрес: `{node_address}`\n"
-            message += f"  • Пользователей: {len(node_users)} \\(активных: {active_users}\\)\n"
-            message += f"  • Трафик: {format_bytes(node_traffic)}\n"
-            
-            if node.get('isConnected'):
-                # Дополнительная информация для онлайн нод
-                if node.get('lastSeen'):
-                    message += f"  • Последняя связь: {format_datetime(node.get('lastSeen'))}\n"
-                if node.get('version'):
-                    message += f"  • Версия: {escape_markdown(node.get('version'))}\n"
-                if node.get('uptime'):
-                    message += f"  • Uptime: {format_uptime(node.get('uptime'))}\n"
-            else:
-                if node.get('lastSeen'):
-                    message += f"  • Офлайн с: {format_datetime(node.get('lastSeen'))}\n"
-            
-            message += "\n"
-        
-        # Кнопки управления
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="nodes_stats"),
-            types.InlineKeyboardButton(text="📊 Детали", callback_data="nodes_detailed")
-        )
-        builder.row(
-            types.InlineKeyboardButton(text="🖥️ Управление", callback_data="nodes"),
-            types.InlineKeyboardButton(text="📈 Мониторинг", callback_data="nodes_monitoring")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
-        )
+
+        text, markup = screen
+        await callback.message.edit_text(text=text, reply_markup=markup)
         
     except Exception as e:
         logger.error(f"Error getting nodes stats: {e}")
@@ -478,82 +515,64 @@ async def show_nodes_stats(callback: types.CallbackQuery, state: FSMContext):
 
 # ================ REAL-TIME MONITORING ================
 
+def _realtime_keyboard(paused: bool = False) -> types.InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    if paused:
+        builder.row(types.InlineKeyboardButton(text="▶️ Продолжить", callback_data="realtime_stats"))
+    else:
+        builder.row(
+            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="realtime_stats"),
+            types.InlineKeyboardButton(text="⏸️ Пауза", callback_data="pause_monitoring")
+        )
+    builder.row(
+        types.InlineKeyboardButton(text="📊 Графики", callback_data="stats_charts"),
+        types.InlineKeyboardButton(text="⚠️ Алерты", callback_data="stats_alerts")
+    )
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
+    return builder.as_markup()
+
 @router.callback_query(F.data == "realtime_stats", AuthFilter())
 async def show_realtime_stats(callback: types.CallbackQuery, state: FSMContext):
-    """Show real-time monitoring"""
+    """Show real-time monitoring (auto-refreshing message)"""
     await callback.answer()
-    await state.set_state(SystemStates.viewing_stats)
+    await state.set_state(SystemStates.viewing_system_stats)
     
     try:
-        # Получаем текущие данные через HTTP API
-        users_list = await get_all_users()
-        nodes_list = await get_all_nodes()
-        
-        # Текущее время
-        current_time = datetime.now().strftime("%H:%M:%S")
-        
-        message = f"⚡ **Мониторинг в реальном времени**\n"
-        message += f"🕐 Обновлено: {current_time}\n\n"
-        
-        # Онлайн статистика
-        if users_list:
-            active_users = sum(1 for user in users_list if user.get('status') == 'ACTIVE')
-            message += "**🔥 Сейчас активно:**\n"
-            message += f"• Пользователей: {active_users}\n"
-        
-        if nodes_list:
-            online_nodes = sum(1 for node in nodes_list if node.get('isConnected', False))
-            message += f"• Серверов: {online_nodes}\n"
-        
-        # Трафик в реальном времени (активные пользователи)
-        if users_list:
-            recent_users = [
-                user for user in users_list 
-                if user.get('usedTraffic', 0) > 0 and user.get('status') == 'ACTIVE'
-            ]
-            
-            if recent_users:
-                total_active_traffic = sum(user.get('usedTraffic', 0) for user in recent_users)
-                message += f"• Общий трафик активных: {format_bytes(total_active_traffic)}\n"
-        
-        message += "\n**📊 Статус серверов:**\n"
-        if nodes_list:
-            for node in nodes_list:
-                status_emoji = "🟢" if node.get('isConnected', False) else "🔴"
-                node_name = escape_markdown(node.get('name', 'Unknown'))
-                message += f"{status_emoji} {node_name}\n"
-        else:
-            message += "Серверы не найдены\n"
-        
-        # Последние события
-        message += "\n**📝 Последние события:**\n"
-        message += "• Мониторинг активности\\.\\.\\.\n"
-        
-        # Кнопки управления
-        builder = InlineKeyboardBuilder()
-        builder.row(
-            types.InlineKeyboardButton(text="🔄 Обновить", callback_data="realtime_stats"),
-            types.InlineKeyboardButton(text="⏸️ Пауза", callback_data="pause_monitoring")
-        )
-        builder.row(
-            types.InlineKeyboardButton(text="📊 Графики", callback_data="stats_charts"),
-            types.InlineKeyboardButton(text="⚠️ Алерты", callback_data="stats_alerts")
-        )
-        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
-        
-        await callback.message.edit_text(
-            text=message,
-            reply_markup=builder.as_markup()
+        # Сообщение подключается к общему циклу обновления: один запрос к панели на всех наблюдателей
+        watching = await get_live_monitor().watch(
+            callback.bot,
+            callback.message.chat.id,
+            callback.message.message_id,
+            markup=_realtime_keyboard(),
+            stopped_markup=_realtime_keyboard(paused=True)
         )
-        
+        if watching:
+            return
     except Exception as e:
         logger.error(f"Error getting realtime stats: {e}")
-        await callback.message.edit_text(
-            "❌ Ошибка при получении мониторинга",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats")
-            ]])
-        )
+    
+    await callback.message.edit_text(
+        "❌ Ошибка при получении мониторинга",
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+            types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats")
+        ]])
+    )
+
+@router.callback_query(F.data == "pause_monitoring", AuthFilter())
+async def pause_realtime_stats(callback: types.CallbackQuery):
+    """Stop auto-refreshing the monitoring message"""
+    monitor = get_live_monitor()
+    monitor.unwatch(callback.message.chat.id, callback.message.message_id)
+    await callback.answer("⏸️ Автообновление приостановлено")
+    
+    text = monitor.render("⏸️ Автообновление приостановлено")
+    if text is None:
+        await callback.message.edit_reply_markup(reply_markup=_realtime_keyboard(paused=True))
+        return
+    try:
+        await callback.message.edit_text(text, reply_markup=_realtime_keyboard(paused=True))
+    except Exception as e:
+        logger.error(f"Error pausing realtime stats: {e}")
 
 # ================ DETAILED STATISTICS ================
 
@@ -567,7 +586,7 @@ async def show_system_stats_detailed(callback: types.CallbackQuery):
         # Получаем детальную статистику через HTTP API
         system_stats = await SystemAPI.get_stats()
         users_list = await get_all_users()
-        nodes_list = await get_all_nodes()
+        nodes_list = await get_nodes_cached()
         
         message = "📊 **Детальная статистика системы**\n\n"
         
@@ -673,45 +692,103 @@ async def show_system_stats_detailed(callback: types.CallbackQuery):
 
 # ================ BANDWIDTH PERIOD STATISTICS ================
 
+# Окна статистики трафика: дни, период панели и число точек графика
+TRAFFIC_WINDOWS = {
+    "week": (7, "7d", 28),
+    "month": (30, "30d", 30),
+    "year": (365, "year", 52),
+}
+
+def _collect_window_traffic(window: str) -> dict:
+    """Посчитать трафик за окно по локальным рядам метрик (вызывать через to_thread)"""
+    days, panel_period, graph_points = TRAFFIC_WINDOWS[window]
+    store = get_metrics_store()
+    end = int(time.time())
+    start = end - days * 86400
+
+    per_node = store.sum_by_prefix("node:", ":traffic", start, end)
+    labels = store.labels(per_node.keys())
+    nodes = sorted(
+        ((labels.get(series, series.split(":")[1][:8]), total) for series, total in per_node.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )
+
+    first_ts = store.first_ts(PANEL_TRAFFIC_SERIES)
+    covered = end - max(start, first_ts) if first_ts else 0
+
+    # График: планировщик сам выберет уровень агрегации, точек не больше graph_points
+    step = (end - start) // graph_points
+    points = dict(store.query_series(PANEL_TRAFFIC_SERIES, start, end, max_points=graph_points))
+    graph = []
+    if points:
+        first_point = min(points)
+        graph = [
+            points.get(point, 0)
+            for point in range(start - start % step, end, step)
+            if point >= first_point - first_point % step
+        ]
+
+    panel_current = store.last_value(f"panel:bw:{panel_period}")
+    panel_previous = store.last_value(f"panel:bw:{panel_period}:prev")
+
+    return {
+        "total": store.sum_range(PANEL_TRAFFIC_SERIES, start, end),
+        "nodes": nodes,
+        "covered": max(0, covered),
+        "window": days * 86400,
+        "graph": graph,
+        "panel_current": panel_current[1] if panel_current else None,
+        "panel_previous": panel_previous[1] if panel_previous else None,
+    }
+
+def _format_window_traffic(data: dict, days: int) -> str:
+    """Общая часть сообщений недельной/месячной статистики"""
+    message = ""
+    covered_days = data["covered"] / 86400
+
+    if data["covered"] <= 0:
+        message += "⏳ Локальные данные ещё не собраны\n"
+        message += "Сборщик метрик опрашивает панель в фоне, цифры появятся после первых срезов\n\n"
+    else:
+        message += f"**📊 Трафик по нодам:**\n"
+        message += f"• Всего за период: {format_bytes(int(data['total']))}\n"
+        message += f"• В среднем в день: {format_bytes(int(data['total'] / max(covered_days, 1 / 24)))}\n"
+        if data["covered"] < data["window"]:
+            message += f"• Покрытие данными: {covered_days:.1f} из {days} дн\n"
+        if len(data["graph"]) > 1:
+            message += f"\n`{format_sparkline(data['graph'])}`\n"
+
+        if data["nodes"]:
+            message += "\n**🖥️ По серверам:**\n"
+            for name, total in data["nodes"][:10]:
+                message += f"• {escape_markdown(name)}: {format_bytes(int(total))}\n"
+
+    if data["panel_current"] is not None:
+        message += "\n**🌐 По данным панели:**\n"
+        message += f"• Текущий период: {format_bytes(int(data['panel_current']))}\n"
+        if data["panel_previous"] is not None:
+            message += f"• Предыдущий период: {format_bytes(int(data['panel_previous']))}\n"
+
+    return message
+
 @router.callback_query(F.data == "bandwidth_weekly", AuthFilter())
 async def show_bandwidth_weekly(callback: types.CallbackQuery):
     """Show weekly bandwidth statistics"""
     await callback.answer()
     
     try:
-        users_list = await get_all_users()
+        data = await asyncio.to_thread(_collect_window_traffic, "week")
         
         message = "📈 **Статистика трафика за неделю**\n\n"
-        
-        if users_list:
-            # Расчет за последние 7 дней
-            total_traffic = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
-            
-            message += f"**📊 Общий трафик:**\n"
-            message += f"• За неделю: {format_bytes(total_traffic)}\n"
-            message += f"• В среднем в день: {format_bytes(total_traffic // 7)}\n"
-            
-            # Топ пользователей за неделю
-            top_users = sorted(
-                [user for user in users_list if user.get('usedTraffic', 0) > 0],
-                key=lambda u: u.get('usedTraffic', 0),
-                reverse=True
-            )[:10]
-            
-            if top_users:
-                message += "\n**🏆 Топ 10 за неделю:**\n"
-                for i, user in enumerate(top_users, 1):
-                    username = escape_markdown(user.get('username', 'Unknown'))
-                    traffic = format_bytes(user.get('usedTraffic', 0))
-                    message += f"{i}\\. {username}: {traffic}\n"
-        else:
-            message += "Данные о пользователях недоступны\n"
+        message += _format_window_traffic(data, 7)
         
         builder = InlineKeyboardBuilder()
         builder.row(
             types.InlineKeyboardButton(text="📉 За месяц", callback_data="bandwidth_monthly"),
-            types.InlineKeyboardButton(text="📊 Общая", callback_data="bandwidth_stats")
+            types.InlineKeyboardButton(text="📆 За год", callback_data="bandwidth_yearly")
         )
+        builder.row(types.InlineKeyboardButton(text="📊 Общая", callback_data="bandwidth_stats"))
         builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bandwidth_stats"))
         
         await callback.message.edit_text(
@@ -729,30 +806,24 @@ async def show_bandwidth_monthly(callback: types.CallbackQuery):
     await callback.answer()
     
     try:
-        users_list = await get_all_users()
+        data = await asyncio.to_thread(_collect_window_traffic, "month")
         
         message = "📉 **Статистика трафика за месяц**\n\n"
+        message += _format_window_traffic(data, 30)
         
-        if users_list:
-            # Расчет за последние 30 дней
-            total_traffic = sum(user.get('usedTraffic', 0) or 0 for user in users_list)
-            
-            message += f"**📊 Общий трафик:**\n"
-            message += f"• За месяц: {format_bytes(total_traffic)}\n"
-            message += f"• В среднем в день: {format_bytes(total_traffic // 30)}\n"
-            message += f"• В среднем в неделю: {format_bytes(total_traffic // 4)}\n"
-            
-            # Прогноз на следующий месяц
-            projected = total_traffic * 2  # Простой прогноз
-            message += f"• Прогноз на след\\. месяц: {format_bytes(projected)}\n"
-        else:
-            message += "Данные о пользователях недоступны\n"
+        # Прогноз: средняя скорость за покрытый период × число дней в текущем месяце
+        if data["covered"] > 0:
+            now = datetime.now()
+            days_in_month = calendar.monthrange(now.year, now.month)[1]
+            daily_rate = data["total"] / max(data["covered"] / 86400, 1 / 24)
+            message += f"\n**🔮 Прогноз на месяц ({days_in_month} дн):** {format_bytes(int(daily_rate * days_in_month))}\n"
         
         builder = InlineKeyboardBuilder()
         builder.row(
             types.InlineKeyboardButton(text="📈 За неделю", callback_data="bandwidth_weekly"),
-            types.InlineKeyboardButton(text="📊 Общая", callback_data="bandwidth_stats")
+            types.InlineKeyboardButton(text="📆 За год", callback_data="bandwidth_yearly")
         )
+        builder.row(types.InlineKeyboardButton(text="📊 Общая", callback_data="bandwidth_stats"))
         builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bandwidth_stats"))
         
         await callback.message.edit_text(
@@ -764,9 +835,173 @@ async def show_bandwidth_monthly(callback: types.CallbackQuery):
         logger.error(f"Error getting monthly bandwidth: {e}")
         await callback.answer("❌ Ошибка при получении статистики", show_alert=True)
 
+@router.callback_query(F.data == "bandwidth_yearly", AuthFilter())
+async def show_bandwidth_yearly(callback: types.CallbackQuery):
+    """Show yearly bandwidth statistics"""
+    await callback.answer()
+    
+    try:
+        data = await asyncio.to_thread(_collect_window_traffic, "year")
+        
+        message = "📆 **Статистика трафика за год**\n\n"
+        message += _format_window_traffic(data, 365)
+        
+        builder = InlineKeyboardBuilder()
+        builder.row(
+            types.InlineKeyboardButton(text="📈 За неделю", callback_data="bandwidth_weekly"),
+            types.InlineKeyboardButton(text="📉 За месяц", callback_data="bandwidth_monthly")
+        )
+        builder.row(types.InlineKeyboardButton(text="📊 Общая", callback_data="bandwidth_stats"))
+        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="bandwidth_stats"))
+        
+        await callback.message.edit_text(
+            text=message,
+            reply_markup=builder.as_markup()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error getting yearly bandwidth: {e}")
+        await callback.answer("❌ Ошибка при получении статистики", show_alert=True)
+
+# ================ CHARTS ================
+
+def _charts_keyboard(chart: str = None, window: str = None) -> types.InlineKeyboardMarkup:
+    """Клавиатура выбора графика и окна"""
+    builder = InlineKeyboardBuilder()
+    for name, title in CHARTS.items():
+        mark = "• " if name == chart else ""
+        builder.row(types.InlineKeyboardButton(text=f"{mark}{title}", callback_data=f"chart:{name}:{window or '7d'}"))
+    if chart and chart != "expiry":
+        builder.row(*[
+            types.InlineKeyboardButton(
+                text=f"{'• ' if key == window else ''}{title}",
+                callback_data=f"chart:{chart}:{key}"
+            )
+            for key, (title, _) in CHART_WINDOWS.items()
+        ])
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="chart_back"))
+    return builder.as_markup()
+
+@router.callback_query(F.data == "stats_charts", AuthFilter())
+async def show_charts_menu(callback: types.CallbackQuery):
+    """Show charts menu"""
+    await callback.answer()
+    
+    await callback.message.edit_text(
+        "📊 **Графики статистики**\n\n"
+        "Графики строятся по локальным данным бота:\n"
+        "• трафик нод — по собранным метрикам\n"
+        "• рост пользователей и сроки подписок — по снимку пользователей\n\n"
+        "Выберите график:",
+        reply_markup=_charts_keyboard()
+    )
+
+@router.callback_query(F.data.startswith("chart:"), AuthFilter())
+async def show_chart(callback: types.CallbackQuery):
+    """Render (or reuse) a chart and show it as a photo"""
+    _, chart, window = callback.data.split(":", 2)
+    if chart not in CHARTS or window not in CHART_WINDOWS:
+        await callback.answer("❌ Неизвестный график", show_alert=True)
+        return
+    
+    key = chart_cache_key(chart, window)
+    photo = get_cached_file_id(key)
+    
+    # На callback можно ответить только раз — отвечаем, когда результат отрисовки известен
+    if photo is None:
+        try:
+            png = await render_chart(chart, window)
+        except ChartDataUnavailable as e:
+            await callback.answer(f"📭 {e}", show_alert=True)
+            return
+        except ImportError:
+            logger.error("matplotlib is not installed, charts are unavailable")
+            await callback.answer("❌ Для графиков требуется matplotlib", show_alert=True)
+            return
+        except Exception as e:
+            logger.error(f"Error rendering chart {chart}/{window}: {e}")
+            await callback.answer("❌ Ошибка при построении графика", show_alert=True)
+            return
+        photo = types.BufferedInputFile(png, filename=f"{chart}_{window}.png")
+    await callback.answer()
+    
+    try:
+        caption = f"{CHARTS[chart]}"
+        if chart != "expiry":
+            caption += f" — {CHART_WINDOWS[window][0]}"
+        keyboard = _charts_keyboard(chart, window)
+        
+        if callback.message.photo:
+            sent = await callback.message.edit_media(
+                media=types.InputMediaPhoto(media=photo, caption=caption),
+                reply_markup=keyboard
+            )
+        else:
+            sent = await callback.message.answer_photo(photo=photo, caption=caption, reply_markup=keyboard)
+            await callback.message.delete()
+        
+        # Запоминаем file_id, чтобы повторный показ не загружал картинку заново
+        if isinstance(sent, types.Message) and sent.photo:
+            remember_file_id(key, sent.photo[-1].file_id)
+        
+    except Exception as e:
+        logger.error(f"Error sending chart {chart}/{window}: {e}")
+        await callback.message.answer("❌ Ошибка при отправке графика")
+
+@router.callback_query(F.data == "chart_back", AuthFilter())
+async def charts_back(callback: types.CallbackQuery):
+    """Leave the chart photo and return to the stats menu"""
+    await callback.answer()
+    
+    if callback.message.photo:
+        # Фото нельзя превратить в текст — отправляем меню заново
+        await callback.message.delete()
+        await callback.message.answer("📊 **Графики статистики**\n\nВыберите график:", reply_markup=_charts_keyboard())
+    else:
+        await show_stats_menu(callback)
+
+# ================ ALERTS ================
+
+@router.callback_query(F.data == "stats_alerts", AuthFilter())
+async def show_alerts(callback: types.CallbackQuery):
+    """Show alert rules and recent alerts"""
+    await callback.answer()
+    
+    engine = get_alert_engine()
+    
+    message = "⚠️ **Алерты**\n\n"
+    if engine is None:
+        message += "🔕 Алерты выключены (ENABLE\\_ALERTS=false)\n"
+    else:
+        message += "**📋 Правила:**\n"
+        message += f"• Трафик пользователя ≥ {ALERT_TRAFFIC_THRESHOLD}% лимита\n"
+        message += f"• Подписка истекает в течение {ALERT_EXPIRY_DAYS} дн\n"
+        message += "• Нода потеряла соединение\n"
+        message += "• Панель недоступна\n"
+        message += f"• Повтор не чаще раза в {ALERT_COOLDOWN // 60} мин\n\n"
+        
+        recent = list(engine.history)[-10:]
+        if recent:
+            message += "**🕒 Последние алерты:**\n"
+            for alert in reversed(recent):
+                moment = datetime.fromtimestamp(alert.created_at).strftime('%d.%m %H:%M')
+                first_line = alert.text.split("\n")[0]
+                message += f"• {moment} {first_line}\n"
+        else:
+            message += "✅ Алертов пока не было\n"
+    
+    builder = InlineKeyboardBuilder()
+    builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data="stats_alerts"))
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="stats"))
+    
+    try:
+        await callback.message.edit_text(message, reply_markup=builder.as_markup())
+    except Exception as e:
+        logger.error(f"Error showing alerts: {e}")
+
 # ================ PLACEHOLDER HANDLERS ================
 
-@router.callback_query(F.data.startswith(("bandwidth_stats_detailed", "nodes_detailed", "nodes_monitoring", "pause_monitoring", "stats_charts", "stats_alerts")), AuthFilter())
+@router.callback_query(F.data.startswith(("bandwidth_stats_detailed", "nodes_detailed", "nodes_monitoring")), AuthFilter())
 async def handle_stats_placeholder(callback: types.CallbackQuery):
     """Placeholder for advanced statistics features"""
     await callback.answer()
@@ -774,10 +1009,7 @@ async def handle_stats_placeholder(callback: types.CallbackQuery):
     feature_names = {
         "bandwidth_stats_detailed": "Детальная статистика трафика",
         "nodes_detailed": "Детальная статистика серверов", 
-        "nodes_monitoring": "Мониторинг серверов",
-        "pause_monitoring": "Приостановка мониторинга",
-        "stats_charts": "Графики статистики",
-        "stats_alerts": "Алерты статистики"
+        "nodes_monitoring": "Мониторинг серверов"
     }
     
     feature_name = feature_names.get(callback.data, "Функция")
@@ -2,24 +2,59 @@ from aiogram import Router, types, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+import asyncio
 import logging
+import os
 import re
 import random
 import string
 import json
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+import tempfile
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta, timezone
 
 from modules.handlers.auth import AuthFilter
 from modules.handlers.states import UserStates
 # Используем прямые HTTP вызовы вместо SDK
 from modules.api import users as users_api
 from modules.api import nodes as nodes_api
+from modules.api.coalescer import DISABLE, ENABLE, RESET_TRAFFIC, get_mutation_coalescer
+from modules.services.user_usage import get_user_daily_usage, USAGE_WINDOWS, DEFAULT_USAGE_WINDOW
+from modules.utils.formatters_aiogram import format_sparkline
+from modules.utils.callback_data import pack, pack_uuid, unpack, unpack_uuid
+from modules.services.user_pages import get_user_pager
+from modules.utils.render_cache import get_rendered, page_key, remember_rendered
+from modules.services.user_snapshot import get_user_snapshot
+from modules.services.bulk_planner import UpdatePlan, run_update_step
+from modules.services import rollback
+from modules.services.durable_jobs import Step, register_job_kind, submit_durable_job
+from modules.services.job_journal import StepRecord, get_job_journal
+from modules.services.jobs import Job, JobCancelled, get_job_manager
+from modules.services.user_export import EXPORT_CATEGORIES, export_users, remove_export
+from modules.services.user_import import (
+    IMPORT_EXTENSIONS, ImportFileError, ImportInterrupted, ImportPlan, plan_import, read_rows, recheck_import, run_import,
+    taken_usernames, template_rows
+)
+from modules.utils.presets import USER_TEMPLATES as IMPORT_TEMPLATES
+from modules.config import IMPORT_MAX_USERS
+from modules.utils.outbound import get_outbound
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Коды действий в компактном формате callback_data
+USER_HISTORY = "uh"
+USER_EXPORT = "ux"
+USER_IMPORT = "ui"
+
+# Максимальный размер документа, который бот может отправить
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+# Максимальный размер документа, который бот может скачать
+TELEGRAM_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+
+# Пользователей на странице списка
+USERS_PER_PAGE = 8
 
 
 # ================ UTILITY FUNCTIONS ================
@@ -192,14 +227,25 @@ async def show_users_menu(callback: types.CallbackQuery):
         types.InlineKeyboardButton(text="📈 Расширенная", callback_data="users_extended_stats")
     )
     builder.row(types.InlineKeyboardButton(text="⚙️ Массовые операции", callback_data="mass_operations"))
-    builder.row(types.InlineKeyboardButton(text="📤 Экспорт", callback_data="export_users"))
+    builder.row(
+        types.InlineKeyboardButton(text="📤 Экспорт", callback_data="export_users"),
+        types.InlineKeyboardButton(text="📥 Импорт", callback_data="import_users")
+    )
     builder.row(types.InlineKeyboardButton(text="🔙 Назад в главное меню", callback_data="main_menu"))
 
     message = "👥 Управление пользователями\n\n"
     try:
-        # Получаем всех пользователей для подсчета статистики
-        users_list = await users_api.get_all_users()
-        if users_list:
+        # Статистика считается по локальному снимку; без него — только общее число из одной короткой страницы
+        snapshot = get_user_snapshot()
+        users_list = list(snapshot.users.values()) if snapshot.is_ready else None
+        if users_list is None:
+            first_page = await users_api.get_users_page(0, 1)
+            if first_page is not None and first_page[1] > 0:
+                message += f"📊 Статистика:\n"
+                message += f"• Всего пользователей: {first_page[1]}\n\n"
+            else:
+                message += "📊 Пользователи не найдены\n\n"
+        elif users_list:
             users_count = len(users_list)
             active_count = sum(1 for user in users_list if user.get('status') == 'ACTIVE')
             
@@ -256,10 +302,12 @@ async def list_users(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.edit_text("📋 Загрузка списка пользователей...")
     
     try:
-        # Получаем свежие данные пользователей
-        users_list = await users_api.get_all_users()
+        # Запрашиваем у панели только первую страницу; вход в список и «Обновить» сбрасывают кэш страниц
+        pager = get_user_pager()
+        pager.invalidate()
+        result = await pager.get_page(0, USERS_PER_PAGE)
         
-        if not users_list:
+        if not result or not result.users:
             await callback.message.edit_text(
                 "👥 Пользователи не найдены",
                 reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
@@ -268,11 +316,11 @@ async def list_users(callback: types.CallbackQuery, state: FSMContext):
             )
             return
 
-        # Сохраняем СВЕЖИЕ данные в состояние
-        await state.update_data(users=users_list, page=0)
+        # Сохраняем СВЕЖИЕ данные текущей страницы в состояние
+        await state.update_data(users=result.users, page=0)
         
         # Показываем первую страницу
-        await show_users_page(callback.message, users_list, 0, state)
+        await show_users_page(callback.message, result.users, 0, result.total, state, generation=result.version)
         await state.set_state(UserStates.selecting_user)
         
     except Exception as e:
@@ -284,8 +332,20 @@ async def list_users(callback: types.CallbackQuery, state: FSMContext):
             ]])
         )
 
-async def show_users_page(message: types.Message, users: list, page: int, state: FSMContext, per_page: int = 8):
-    """Show users page with pagination - safe version with validation"""
+async def show_users_page(message: types.Message, users: list, page: int, total_users: int,
+                          state: FSMContext, per_page: int = USERS_PER_PAGE, generation: Optional[int] = None):
+    """Show users page with pagination - safe version with validation
+
+    users — only the users of this page, total_users — size of the whole list,
+    generation — version of the loaded page; the rendered page is cached under it.
+    """
+    key = page_key("users", page, generation) if generation is not None else None
+    cached = get_rendered(key) if key is not None else None
+    if cached is not None:
+        text, markup = cached
+        await message.edit_text(text=text, reply_markup=markup)
+        return
+    
     try:
         # Валидация данных
         if not users:
@@ -298,19 +358,9 @@ async def show_users_page(message: types.Message, users: list, page: int, state:
             )
             return
             
-        total_users = len(users)
         start_idx = page * per_page
-        end_idx = min(start_idx + per_page, total_users)
-        
-        # Проверяем, что индексы корректны
-        if start_idx >= total_users:
-            # Если страница больше чем доступно, показываем первую страницу
-            page = 0
-            start_idx = 0
-            end_idx = min(per_page, total_users)
-            await state.update_data(page=0)
-        
-        page_users = users[start_idx:end_idx]
+        end_idx = start_idx + len(users)
+        page_users = users[:per_page]
         
         # Фильтруем пользователей, которые могут быть некорректными
         valid_users = []
@@ -397,10 +447,14 @@ async def show_users_page(message: types.Message, users: list, page: int, state:
         builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data="list_users"))
         builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="users"))
         
+        markup = builder.as_markup()
+        if key is not None:
+            remember_rendered(key, message_text, markup)
+        
         # Отправляем сообщение без parse_mode
         await message.edit_text(
             text=message_text,
-            reply_markup=builder.as_markup()
+            reply_markup=markup
         )
         
     except Exception as e:
@@ -420,11 +474,25 @@ async def handle_users_pagination(callback: types.CallbackQuery, state: FSMConte
     await callback.answer()
     
     page = int(callback.data.split(":")[1])
-    data = await state.get_data()
-    users = data.get('users', [])
+    pager = get_user_pager()
+    result = await pager.get_page(page, USERS_PER_PAGE)
+    if result is not None and not result.users and page > 0:
+        # Список сократился — страницы больше нет, показываем первую
+        page = 0
+        result = await pager.get_page(page, USERS_PER_PAGE)
+    
+    if result is None:
+        await callback.message.edit_text(
+            "❌ Ошибка при получении списка пользователей",
+            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+                types.InlineKeyboardButton(text="🔄 Обновить список", callback_data="list_users"),
+                types.InlineKeyboardButton(text="🔙 Назад", callback_data="users")
+            ]])
+        )
+        return
     
-    await state.update_data(page=page)
-    await show_users_page(callback.message, users, page, state)
+    await state.update_data(users=result.users, page=page)
+    await show_users_page(callback.message, result.users, page, result.total, state, generation=result.version)
 
 @router.callback_query(F.data.startswith("select_user:"), AuthFilter())
 async def handle_user_selection(callback: types.CallbackQuery, state: FSMContext):
@@ -497,7 +565,7 @@ async def show_user_details(message: types.Message, user: dict, state: FSMContex
         # Additional features
         builder.row(
             types.InlineKeyboardButton(text="📱 Устройства", callback_data=f"user_devices:{user.get('uuid')}"),
-            types.InlineKeyboardButton(text="📋 История", callback_data=f"user_history:{user.get('uuid')}")
+            types.InlineKeyboardButton(text="📋 История", callback_data=pack(USER_HISTORY, pack_uuid(user.get('uuid'))))
         )
         
         # Subscription management
@@ -557,7 +625,7 @@ async def activate_user(callback: types.CallbackQuery, state: FSMContext):
     user_uuid = callback.data.split(":", 1)[1]
     
     try:
-        success = await users_api.enable_user(user_uuid)
+        success = await get_mutation_coalescer().submit(ENABLE, user_uuid)
         if success:
             await callback.answer("✅ Пользователь активирован", show_alert=True)
             # Refresh user data
@@ -576,7 +644,7 @@ async def deactivate_user(callback: types.CallbackQuery, state: FSMContext):
     user_uuid = callback.data.split(":", 1)[1]
     
     try:
-        success = await users_api.disable_user(user_uuid)
+        success = await get_mutation_coalescer().submit(DISABLE, user_uuid)
         if success:
             await callback.answer("✅ Пользователь деактивирован", show_alert=True)
             # Refresh user data
@@ -630,8 +698,7 @@ async def confirm_reset_traffic(callback: types.CallbackQuery, state: FSMContext
     user_uuid = callback.data.split(":", 1)[1]
     
     try:
-        # Reset traffic by updating usedTraffic to 0
-        success = await users_api.update_user(user_uuid, {"usedTraffic": 0})
+        success = await get_mutation_coalescer().submit(RESET_TRAFFIC, user_uuid)
         if success:
             await callback.answer("✅ Трафик сброшен", show_alert=True)
             await refresh_user_and_show(callback, state, user_uuid)
@@ -2281,6 +2348,19 @@ async def extend_all_expiring_users(callback: types.CallbackQuery, state: FSMCon
         reply_markup=builder.as_markup()
     )
 
+def _extend_plan(users: List[Dict], days: int) -> UpdatePlan:
+    """План продления: к текущему сроку (или к сегодняшнему дню) добавляется days дней"""
+    plan = UpdatePlan()
+    now = datetime.now(timezone.utc)
+    for user in users:
+        current_expire = user.get('expireAt')
+        try:
+            current_date = datetime.fromisoformat(current_expire.replace('Z', '+00:00')) if current_expire else now
+        except ValueError:
+            current_date = now
+        plan.add(user['uuid'], {"expireAt": (current_date + timedelta(days=days)).isoformat()})
+    return plan
+
 @router.callback_query(F.data.startswith("bulk_extend:"), AuthFilter())
 async def confirm_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
     """Confirm bulk extension"""
@@ -2290,7 +2370,7 @@ async def confirm_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
     
     try:
         users_list = await users_api.get_all_users()
-        now = datetime.now()
+        now = datetime.now(timezone.utc)
         week_later = now + timedelta(days=7)
         
         expiring_users = []
@@ -2313,6 +2393,10 @@ async def confirm_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
             )
             return
         
+        # Только то, что нужно для плана, — без полных записей пользователей
+        extend_users = [{'uuid': user['uuid'], 'expireAt': user.get('expireAt')} for user in expiring_users]
+        plan = _extend_plan(extend_users, days)
+        
         # Confirm bulk action
         builder = InlineKeyboardBuilder()
         builder.row(types.InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"execute_bulk_extend:{days}"))
@@ -2321,12 +2405,13 @@ async def confirm_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             f"🔄 **Подтверждение массового продления**\n\n"
             f"Будет продлено **{len(expiring_users)}** пользователей на **{days} дней**\n\n"
+            f"{plan.preview()}\n"
             f"Продолжить?",
             reply_markup=builder.as_markup()
         )
         
         # Store data for execution
-        await state.update_data(bulk_extend_days=days, bulk_extend_users=expiring_users)
+        await state.update_data(bulk_extend_days=days, bulk_extend_users=extend_users)
         
     except Exception as e:
         logger.error(f"Error preparing bulk extend: {e}")
@@ -2335,56 +2420,52 @@ async def confirm_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("execute_bulk_extend:"), AuthFilter())
 async def execute_bulk_extend(callback: types.CallbackQuery, state: FSMContext):
     """Execute bulk extension"""
-    await callback.answer()
-    
     days = int(callback.data.split(":")[1])
     data = await state.get_data()
     users_to_extend = data.get('bulk_extend_users', [])
     
     if not users_to_extend:
+        await callback.answer()
         await callback.message.edit_text("❌ Нет пользователей для продления")
         return
     
-    await callback.message.edit_text("🔄 Выполняется массовое продление...")
-    
-    success_count = 0
-    error_count = 0
-    
-    for user in users_to_extend:
-        try:
-            current_expire = user.get('expireAt')
-            if current_expire:
-                current_date = datetime.fromisoformat(current_expire.replace('Z', '+00:00'))
-                new_expire_date = current_date + timedelta(days=days)
-            else:
-                new_expire_date = datetime.now() + timedelta(days=days)
-            
-            update_data = {"expireAt": new_expire_date.isoformat()}
-            success = await users_api.update_user(user['uuid'], update_data)
-            
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
-                
-        except Exception as e:
-            logger.error(f"Error extending user {user.get('username', 'Unknown')}: {e}")
-            error_count += 1
-    
     await state.clear()
     
-    result_text = f"✅ **Массовое продление завершено**\n\n"
-    result_text += f"Успешно продлено: **{success_count}** пользователей\n"
-    if error_count > 0:
-        result_text += f"Ошибок: **{error_count}**\n"
-    result_text += f"Продлено на: **{days} дней**"
-    
-    await callback.message.edit_text(
-        result_text,
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+    job = await submit_durable_job(
+        "extend_expiring", f"🔄 Продление истекающих на {days} дней",
+        {"days": days, "users": users_to_extend}, callback.message,
+        done_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
             types.InlineKeyboardButton(text="🔙 Назад к статистике", callback_data="users_extended_stats")
-        ]])
+        ]]),
+        started_by=callback.from_user.id
     )
+    if job is None:
+        await callback.answer("ℹ️ Продление уже запущено, см. /jobs", show_alert=True)
+    else:
+        await callback.answer()
+
+async def _plan_extend_expiring(job: Job, params: Dict) -> List[Step]:
+    # Даты считаются один раз и хранятся в шагах — повтор после перезапуска не продлит дважды
+    return _extend_plan(params.pop("users"), params["days"]).steps()
+
+async def _extend_expiring_step(payload: Dict, progress) -> Tuple[int, int]:
+    return await run_update_step(payload, progress=progress)
+
+def _extend_expiring_summary(params: Dict, steps: List[StepRecord]) -> str:
+    succeeded = sum(step.succeeded for step in steps)
+    failed = sum(step.failed for step in steps)
+    result_text = f"✅ **Массовое продление завершено**\n\n"
+    result_text += f"Успешно продлено: **{succeeded}** пользователей\n"
+    if failed > 0:
+        result_text += f"Ошибок: **{failed}**\n"
+    result_text += f"Продлено на: **{params['days']} дней**"
+    return result_text
+
+register_job_kind(
+    "extend_expiring", "🔄 Выполняется массовое продление...",
+    _plan_extend_expiring, _extend_expiring_step, _extend_expiring_summary,
+    after=lambda: get_user_pager().invalidate(), capture=rollback.capture
+)
 
 # ================ USER DEVICES MANAGEMENT ================
 
@@ -2647,90 +2728,272 @@ async def export_users_menu(callback: types.CallbackQuery):
     
     await callback.message.edit_text(
         "📤 **Экспорт пользователей**\n\n"
-        "Выберите категорию пользователей для экспорта в текстовом формате:",
+        "Выберите категорию пользователей для экспорта в файл:",
         reply_markup=builder.as_markup()
     )
 
-@router.callback_query(F.data.startswith("export_"), AuthFilter())
+@router.callback_query(F.data.in_([f"export_{category}" for category in EXPORT_CATEGORIES]), AuthFilter())
 async def handle_export(callback: types.CallbackQuery):
-    """Handle export requests"""
+    """Ask for the file format of the selected export category"""
     await callback.answer()
     
-    export_type = callback.data.replace("export_", "")
+    category = callback.data.replace("export_", "", 1)
+    title, _ = EXPORT_CATEGORIES[category]
+    
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="📄 CSV", callback_data=pack(USER_EXPORT, category, "csv", 0)),
+        types.InlineKeyboardButton(text="🗜 CSV.gz", callback_data=pack(USER_EXPORT, category, "csv", 1))
+    )
+    builder.row(
+        types.InlineKeyboardButton(text="🧾 NDJSON", callback_data=pack(USER_EXPORT, category, "ndjson", 0)),
+        types.InlineKeyboardButton(text="🗜 NDJSON.gz", callback_data=pack(USER_EXPORT, category, "ndjson", 1))
+    )
+    builder.row(types.InlineKeyboardButton(text="📊 XLSX", callback_data=pack(USER_EXPORT, category, "xlsx", 0)))
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="export_users"))
+    
+    await callback.message.edit_text(
+        f"📤 **{title}**\n\n"
+        "Выберите формат файла:",
+        reply_markup=builder.as_markup()
+    )
+
+@router.callback_query(F.data.startswith(f"{USER_EXPORT}:"), AuthFilter())
+async def handle_export_file(callback: types.CallbackQuery):
+    """Export users of a category into a file and send it as a document"""
+    await callback.answer()
+    
+    _, args = unpack(callback.data)
+    category, fmt, compress = args[0], args[1], args[2] == "1"
+    back_markup = types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="export_users")
+    ]])
+    
+    await callback.message.edit_text("📤 Подготовка экспорта...")
+    
+    async def report_progress(done: int, total: int):
+        get_outbound().edit(callback.message, f"📤 Экспорт пользователей... {done}/{total}")
     
     try:
-        users_list = await users_api.get_all_users()
-        
-        # Фильтруем пользователей по типу экспорта
-        if export_type == "active_users":
-            filtered_users = [user for user in users_list if user.get('status') == 'ACTIVE']
-            title = "Активные пользователи"
-        elif export_type == "expiring_users":
-            now = datetime.now()
-            week_later = now + timedelta(days=7)
-            filtered_users = []
-            for user in users_list:
-                expire_at = user.get('expireAt')
-                if expire_at:
-                    try:
-                        expire_date = datetime.fromisoformat(expire_at.replace('Z', '+00:00'))
-                        if now < expire_date < week_later:
-                            filtered_users.append(user)
-                    except Exception:
-                        pass
-            title = "Истекающие пользователи"
-        elif export_type == "expired_users":
-            now = datetime.now()
-            filtered_users = []
-            for user in users_list:
-                expire_at = user.get('expireAt')
-                if expire_at:
-                    try:
-                        expire_date = datetime.fromisoformat(expire_at.replace('Z', '+00:00'))
-                        if expire_date < now:
-                            filtered_users.append(user)
-                    except Exception:
-                        pass
-            title = "Истекшие пользователи"
-        else:  # all_users
-            filtered_users = users_list
-            title = "Все пользователи"
-        
-        # Создаем текстовый экспорт
-        export_text = f"📊 **{title}** (Всего: {len(filtered_users)})\n\n"
-        
-        for i, user in enumerate(filtered_users[:50], 1):  # Ограничиваем до 50 для телеграма
-            username = user.get('username', 'Unknown')
-            status = user.get('status', 'Unknown')
-            used_traffic = format_bytes(user.get('usedTraffic', 0) or 0)
-            expire_at = user.get('expireAt', 'Не указано')
-            if expire_at and expire_at != 'Не указано':
-                expire_at = expire_at[:19].replace('T', ' ')
-            
-            status_emoji = "🟢" if status == 'ACTIVE' else "🔴"
-            
-            export_text += f"{i}. {status_emoji} **{escape_markdown(username)}**\n"
-            export_text += f"   Трафик: {used_traffic} | Истекает: {expire_at}\n\n"
-        
-        if len(filtered_users) > 50:
-            export_text += f"... и еще {len(filtered_users) - 50} пользователей\n\n"
-            export_text += f"💡 Для полного экспорта используйте веб-интерфейс"
-        
-        await callback.message.edit_text(
-            export_text,
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="export_users")
-            ]])
-        )
-        
+        result = await export_users(category, fmt, compress=compress, progress=report_progress)
     except Exception as e:
         logger.error(f"Error exporting users: {e}")
+        await callback.message.edit_text("❌ Ошибка при экспорте данных", reply_markup=back_markup)
+        return
+    
+    try:
+        if result.size > TELEGRAM_UPLOAD_LIMIT:
+            hint = " Попробуйте формат со сжатием (.gz)." if not compress and fmt != "xlsx" else ""
+            await callback.message.edit_text(
+                f"❌ Файл экспорта слишком большой для Telegram: {format_bytes(result.size)}.{hint}",
+                reply_markup=back_markup
+            )
+            return
+        
+        title, _ = EXPORT_CATEGORIES[category]
+        await callback.message.answer_document(
+            types.FSInputFile(result.path, filename=result.filename),
+            caption=f"📤 {title}: {result.rows}"
+        )
         await callback.message.edit_text(
-            "❌ Ошибка при экспорте данных",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
-                types.InlineKeyboardButton(text="🔙 Назад", callback_data="export_users")
-            ]])
+            f"✅ Экспорт готов: {result.rows} пользователей, {format_bytes(result.size)}",
+            reply_markup=back_markup
         )
+    except Exception as e:
+        logger.error(f"Error sending users export: {e}")
+        await callback.message.edit_text("❌ Ошибка при отправке файла экспорта", reply_markup=back_markup)
+    finally:
+        remove_export(result.path)
+
+# ================ IMPORT FUNCTIONALITY ================
+
+def _import_back_markup() -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text="👥 К пользователям", callback_data="users")
+    ]])
+
+@router.callback_query(F.data == "import_users", AuthFilter())
+async def import_users_menu(callback: types.CallbackQuery, state: FSMContext):
+    """Choose the template that fills fields missing from the import"""
+    await callback.answer()
+    await state.clear()
+    
+    builder = InlineKeyboardBuilder()
+    for index, template in enumerate(IMPORT_TEMPLATES.values()):
+        builder.row(types.InlineKeyboardButton(
+            text=template['display_name'],
+            callback_data=pack(USER_IMPORT, index)
+        ))
+    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="users"))
+    
+    await callback.message.edit_text(
+        "📥 **Импорт пользователей**\n\n"
+        "Выберите шаблон. Из него берутся лимит трафика, устройств, стратегия сброса "
+        "и описание, если их нет в файле:",
+        reply_markup=builder.as_markup()
+    )
+
+@router.callback_query(F.data.startswith(f"{USER_IMPORT}:"), AuthFilter())
+async def select_import_template(callback: types.CallbackQuery, state: FSMContext):
+    """Ask for an import file or a number of users to create from the template"""
+    await callback.answer()
+    
+    _, args = unpack(callback.data)
+    template_name = list(IMPORT_TEMPLATES)[int(args[0])]
+    await state.update_data(import_template=template_name)
+    await state.set_state(UserStates.import_source)
+    
+    await callback.message.edit_text(
+        f"📥 **Импорт: {IMPORT_TEMPLATES[template_name]['display_name']}**\n\n"
+        f"Отправьте файл CSV, JSON или NDJSON (до 20 МБ). Колонки как у экспорта: "
+        f"`username` (обязательно), `trafficLimitBytes`, `expireAt` или `expireDays`, "
+        f"`telegramId`, `email`, `description`, `tag`.\n\n"
+        f"Или отправьте число пользователей и префикс имени, например `50 client_` — "
+        f"будут созданы client\\_0001 ... client\\_0050.\n\n"
+        f"Максимум за один импорт: {IMPORT_MAX_USERS}",
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+            types.InlineKeyboardButton(text="❌ Отмена", callback_data="users")
+        ]])
+    )
+
+async def _download_import_rows(message: types.Message, extension: str) -> Optional[str]:
+    """Скачать файл импорта во временный файл; None — Telegram не отдал файл"""
+    fd, path = tempfile.mkstemp(prefix="remna_import_src_", suffix=extension)
+    os.close(fd)
+    try:
+        await message.bot.download(message.document, destination=path)
+    except Exception as e:
+        logger.error(f"Error downloading import file: {e}")
+        remove_export(path)
+        return None
+    return path
+
+@router.message(StateFilter(UserStates.import_source), AuthFilter())
+async def handle_import_source(message: types.Message, state: FSMContext):
+    """Validate an uploaded file or a template count and show the import preview"""
+    data = await state.get_data()
+    path = None
+    
+    if message.document:
+        document = message.document
+        extension = os.path.splitext(document.file_name or "")[1].lower()
+        if extension not in IMPORT_EXTENSIONS:
+            await message.answer("❌ Поддерживаются файлы .csv, .json и .ndjson")
+            return
+        if (document.file_size or 0) > TELEGRAM_DOWNLOAD_LIMIT:
+            await message.answer("❌ Файл больше 20 МБ — разделите его на части")
+            return
+    else:
+        match = re.match(r'^(\d+)(?:\s+([a-zA-Z0-9_-]{1,24}))?$', (message.text or "").strip())
+        count = int(match.group(1)) if match else 0
+        if not 1 <= count <= IMPORT_MAX_USERS:
+            await message.answer(f"❌ Отправьте файл или число от 1 до {IMPORT_MAX_USERS} и префикс, например `50 client_`")
+            return
+    
+    status = await message.answer("🔍 Проверяю данные...")
+    taken = await taken_usernames()
+    if taken is None:
+        await status.edit_text("❌ Список пользователей панели сейчас недоступен, попробуйте позже")
+        return
+    
+    if message.document:
+        path = await _download_import_rows(message, extension)
+        if path is None:
+            await status.edit_text("❌ Не удалось скачать файл, отправьте его ещё раз")
+            return
+        rows = read_rows(path)
+    else:
+        rows = template_rows(count, match.group(2) or "user_", taken)
+    
+    try:
+        # Разбор файла — синхронный I/O, не держим им event loop
+        plan = await asyncio.to_thread(plan_import, rows, data['import_template'], taken)
+    except ImportFileError as e:
+        logger.warning(f"Import file rejected: {e}")
+        await status.edit_text("❌ Не удалось прочитать файл. Проверьте формат и кодировку (UTF-8).")
+        return
+    finally:
+        # Проверенные строки хранятся в состоянии, файл больше не нужен
+        if path:
+            remove_export(path)
+    
+    await state.update_data(import_users=plan.users, import_rejected=plan.rejected)
+    
+    text = f"📥 **Проверка импорта**\n\n"
+    text += f"• Будет создано: **{len(plan.users)}**\n"
+    text += f"• Отброшено: {len(plan.rejected)}\n"
+    for line, username, reason in plan.rejected[:5]:
+        text += f"  – строка {line} {escape_markdown(username)}: {escape_markdown(reason)}\n"
+    if len(plan.rejected) > 5:
+        text += f"  – ... полный список будет в файле результата\n"
+    
+    builder = InlineKeyboardBuilder()
+    if plan.users:
+        builder.row(types.InlineKeyboardButton(text="✅ Создать пользователей", callback_data="import_run"))
+    builder.row(types.InlineKeyboardButton(text="❌ Отмена", callback_data="users"))
+    await status.edit_text(text, reply_markup=builder.as_markup())
+
+@router.callback_query(F.data == "import_run", AuthFilter())
+async def run_user_import(callback: types.CallbackQuery, state: FSMContext):
+    """Create the validated users as a background job and send the result file"""
+    data = await state.get_data()
+    if not data.get('import_users'):
+        await callback.answer("❌ Данные импорта устарели, начните заново", show_alert=True)
+        return
+    await callback.answer()
+    await state.clear()
+    plan = ImportPlan(
+        [tuple(item) for item in data['import_users']],
+        [tuple(item) for item in data.get('import_rejected', [])]
+    )
+    
+    async def run(job: Job) -> str:
+        # Имена сверяются ещё раз: за время подтверждения пользователи могли появиться
+        job.set_stage("🔍 Проверяю данные...")
+        taken = await taken_usernames()
+        if taken is None:
+            return "❌ Список пользователей панели недоступен, импорт не выполнен"
+        interrupted = None
+        try:
+            result = await run_import(
+                recheck_import(plan, taken), progress=job.progress("👥 Создаю пользователей...")
+            )
+        except ImportInterrupted as e:
+            # Созданные до отмены пользователи уже есть в панели — их ссылки тоже нужно отдать
+            interrupted = e
+            result = e.result
+        
+        try:
+            await job.message.answer_document(
+                types.FSInputFile(result.path, filename=result.filename),
+                caption=f"📥 Результат импорта: создано {result.created}"
+            )
+        except Exception as e:
+            logger.error(f"Error sending import result: {e}")
+        finally:
+            remove_export(result.path)
+            get_user_pager().invalidate()
+        
+        summary = "⏹️ **Импорт отменен**\n\n" if interrupted else "✅ **Импорт завершен**\n\n"
+        summary += f"• Создано: {result.created}\n"
+        if result.failed:
+            summary += f"• Ошибок панели: {result.failed}\n"
+        if result.remaining:
+            summary += f"• Не создано из-за отмены: {result.remaining}\n"
+        summary += f"• Отброшено при проверке: {result.rejected}\n\n"
+        summary += "Ссылки на подписки — в файле результата."
+        if interrupted is None:
+            return summary
+        if isinstance(interrupted.__cause__, JobCancelled):
+            raise JobCancelled(summary) from interrupted
+        raise interrupted
+    
+    # ID из последовательности журнала, чтобы не совпасть с ID журнальных задач
+    job_id = await asyncio.to_thread(get_job_journal().reserve_id)
+    get_job_manager().submit(
+        "📥 Импорт пользователей", run, callback.message,
+        done_markup=_import_back_markup(), started_by=callback.from_user.id, job_id=job_id
+    )
 
 # ================ MASS USER OPERATIONS ================
 
@@ -2792,12 +3055,22 @@ async def handle_mass_operation_placeholder(callback: types.CallbackQuery):
 
 # ================ USER HISTORY AND LOGS ================
 
-@router.callback_query(F.data.startswith("user_history:"), AuthFilter())
+@router.callback_query(F.data.startswith((f"{USER_HISTORY}:", "user_history:")), AuthFilter())
 async def show_user_history(callback: types.CallbackQuery):
-    """Show user activity history"""
+    """Show user traffic usage history by days and nodes"""
+    # "user_history:" — формат кнопок в ранее отправленных сообщениях
+    try:
+        _, args = unpack(callback.data)
+        user_uuid = unpack_uuid(args[0])
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Invalid user history callback {callback.data!r}: {e}")
+        await callback.answer("❌ Кнопка устарела, откройте пользователя заново", show_alert=True)
+        return
     await callback.answer()
     
-    user_uuid = callback.data.split(":", 1)[1]
+    days = int(args[1]) if len(args) > 1 and args[1].isdigit() else DEFAULT_USAGE_WINDOW
+    if days not in USAGE_WINDOWS:
+        days = DEFAULT_USAGE_WINDOW
     
     try:
         user = await users_api.get_user_by_uuid(user_uuid)
@@ -2807,55 +3080,53 @@ async def show_user_history(callback: types.CallbackQuery):
         
         username = user.get('username', 'Unknown')
         
-        # Показываем реальную доступную информацию
         history_text = f"📋 **История пользователя {escape_markdown(username)}**\n\n"
         
         # Временные метки
         created_at = user.get('createdAt')
-        updated_at = user.get('updatedAt')
         expire_at = user.get('expireAt')
         last_online = user.get('lastOnline')
         
         history_text += "**📅 Временная линия:**\n"
         if created_at:
             history_text += f"• Создан: {created_at[:19].replace('T', ' ')}\n"
-        if updated_at:
-            history_text += f"• Последнее изменение: {updated_at[:19].replace('T', ' ')}\n"
         if last_online:
             history_text += f"• Последняя активность: {last_online[:19].replace('T', ' ')}\n"
         if expire_at:
             history_text += f"• Истекает: {expire_at[:19].replace('T', ' ')}\n"
         
-        # Статистика использования
-        history_text += f"\n**📊 Статистика использования:**\n"
-        history_text += f"• Использовано трафика: {format_bytes(user.get('usedTraffic', 0) or 0)}\n"
-        history_text += f"• Текущий статус: {user.get('status', 'Unknown')}\n"
+        # Использование трафика по дням
+        usage = await get_user_daily_usage(user_uuid, days)
+        history_text += f"\n**📊 Трафик за {days} дн:**\n"
         
-        if user.get('trafficLimit'):
-            limit = user.get('trafficLimit')
-            used = user.get('usedTraffic', 0) or 0
-            percentage = (used / limit * 100) if limit > 0 else 0
-            history_text += f"• Лимит трафика: {format_bytes(limit)}\n"
-            history_text += f"• Использовано: {percentage:.1f}%\n"
-        
-        # Дополнительная информация
-        if user.get('telegramId'):
-            history_text += f"• Telegram ID: {user.get('telegramId')}\n"
-        
-        if user.get('description'):
-            history_text += f"• Описание: {user.get('description')}\n"
-        
-        # Вычисляем время использования
-        if created_at:
-            try:
-                created_date = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                days_active = (datetime.now() - created_date).days
-                history_text += f"• Дней с создания: {days_active}\n"
-            except Exception:
-                pass
+        if usage is None:
+            history_text += "❌ Не удалось получить статистику использования\n"
+        elif usage["total"] == 0:
+            history_text += "Нет трафика за выбранный период\n"
+        else:
+            daily_values = [total for _, total in usage["daily"]]
+            history_text += f"`{format_sparkline(daily_values)}`\n"
+            history_text += f"• Всего: {format_bytes(int(usage['total']))}\n"
+            history_text += f"• В среднем в день: {format_bytes(int(usage['total'] / days))}\n\n"
+            
+            for date, total in reversed(usage["daily"]):
+                if total:
+                    history_text += f"• {date[8:10]}.{date[5:7]}: {format_bytes(int(total))}\n"
+            
+            if usage["nodes"]:
+                history_text += "\n**🖥️ По серверам:**\n"
+                for node_name, total in usage["nodes"][:10]:
+                    history_text += f"• {escape_markdown(node_name)}: {format_bytes(int(total))}\n"
         
         builder = InlineKeyboardBuilder()
-        builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data=f"user_history:{user_uuid}"))
+        builder.row(*[
+            types.InlineKeyboardButton(
+                text=f"{'• ' if window == days else ''}{window} дн",
+                callback_data=pack(USER_HISTORY, pack_uuid(user_uuid), window)
+            )
+            for window in USAGE_WINDOWS
+        ])
+        builder.row(types.InlineKeyboardButton(text="🔄 Обновить", callback_data=pack(USER_HISTORY, pack_uuid(user_uuid), days)))
         builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data=f"refresh_user:{user_uuid}"))
         
         await callback.message.edit_text(
@@ -2899,7 +3170,7 @@ async def show_user_details_extended(message: types.Message, user: dict, state:
         # Расширенные функции
         builder.row(
             types.InlineKeyboardButton(text="📱 Устройства", callback_data=f"user_devices:{user.get('uuid')}"),
-            types.InlineKeyboardButton(text="📋 История", callback_data=f"user_history:{user.get('uuid')}")
+            types.InlineKeyboardButton(text="📋 История", callback_data=pack(USER_HISTORY, pack_uuid(user.get('uuid'))))
         )
         
         # Подписка и конфигурации
@@ -3031,7 +3302,7 @@ async def show_user_details_with_subscription(message: types.Message, user: dict
         # Расширенные функции
         builder.row(
             types.InlineKeyboardButton(text="📱 Устройства", callback_data=f"user_devices:{user.get('uuid')}"),
-            types.InlineKeyboardButton(text="📋 История", callback_data=f"user_history:{user.get('uuid')}")
+            types.InlineKeyboardButton(text="📋 История", callback_data=pack(USER_HISTORY, pack_uuid(user.get('uuid'))))
         )
         
         # Подписка и конфигурации - ОБНОВЛЕННЫЙ РАЗДЕЛ
@@ -3082,7 +3353,7 @@ async def send_user_details_for_search(message: types.Message, user: dict, state
         # Расширенные функции
         builder.row(
             types.InlineKeyboardButton(text="📱 Устройства", callback_data=f"user_devices:{user.get('uuid')}"),
-            types.InlineKeyboardButton(text="📋 История", callback_data=f"user_history:{user.get('uuid')}")
+            types.InlineKeyboardButton(text="📋 История", callback_data=pack(USER_HISTORY, pack_uuid(user.get('uuid'))))
         )
         
         # Подписка
@@ -0,0 +1,78 @@
+"""
+Фоновые сервисы бота (сбор метрик, снимок пользователей, наблюдение за нодами, алерты, задачи)
+"""
+import logging
+
+from aiogram import Bot
+
+from modules.api.coalescer import flush_mutations
+from modules.config import ENABLE_METRICS_SAMPLER, ENABLE_USER_SNAPSHOT, ENABLE_ALERTS, ENABLE_NODE_WATCHER
+from modules.services.metrics_store import close_metrics_store
+from modules.services.traffic_sampler import TrafficSampler
+from modules.services.user_snapshot import get_user_snapshot
+from modules.services.node_watcher import get_node_watcher
+from modules.services.charts import shutdown_chart_executor
+from modules.services.alerts import start_alert_engine, stop_alert_engine
+from modules.services.live_monitor import stop_live_monitor
+from modules.services.jobs import stop_jobs
+from modules.services.durable_jobs import flush_job_journal, resume_durable_jobs
+from modules.services.job_journal import close_job_journal
+
+logger = logging.getLogger(__name__)
+
+_sampler: TrafficSampler = None
+
+
+async def start_background_services(bot: Bot):
+    """Запустить фоновые сервисы (вызывается при старте диспетчера)"""
+    global _sampler
+
+    if ENABLE_METRICS_SAMPLER:
+        _sampler = TrafficSampler()
+        _sampler.start()
+    else:
+        logger.info("Traffic sampler disabled by ENABLE_METRICS_SAMPLER")
+
+    if ENABLE_USER_SNAPSHOT:
+        get_user_snapshot().start()
+    else:
+        logger.info("User snapshot sync disabled by ENABLE_USER_SNAPSHOT")
+
+    watcher = None
+    if ENABLE_NODE_WATCHER:
+        watcher = get_node_watcher()
+        watcher.bot = bot
+        watcher.start()
+    else:
+        logger.info("Node watcher disabled by ENABLE_NODE_WATCHER")
+
+    if ENABLE_ALERTS:
+        # Правила пользователей работают по диффам снимка, ноды/панель — по событиям наблюдателя
+        start_alert_engine(bot, get_user_snapshot(), watcher)
+    else:
+        logger.info("Alerts disabled by ENABLE_ALERTS")
+
+    # Массовые операции, прерванные перезапуском, продолжаются с последнего чекпоинта
+    await resume_durable_jobs(bot)
+
+
+async def stop_background_services():
+    """Остановить фоновые сервисы (вызывается при остановке диспетчера)"""
+    global _sampler
+
+    # Отложенные включения/выключения пользователей отправляем, а не теряем
+    await flush_mutations()
+
+    if _sampler is not None:
+        await _sampler.stop()
+        _sampler = None
+
+    await stop_jobs()
+    await flush_job_journal()
+    close_job_journal()
+    await stop_live_monitor()
+    await stop_alert_engine()
+    await get_node_watcher().stop()
+    await get_user_snapshot().stop()
+    shutdown_chart_executor()
+    close_metrics_store()
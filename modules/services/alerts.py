@@ -0,0 +1,207 @@
+"""
+Алерты для администраторов
+
+Правила пользователей проверяются только по записям, изменившимся в очередном
+диффе снимка пользователей, поэтому стоимость мониторинга зависит от числа
+изменений, а не от размера панели. Истечение подписок отслеживается кучей
+по expireAt: на каждом тике извлекаются только записи, вошедшие в окно.
+События нод и доступности панели приходят от общего наблюдателя за нодами.
+Повторы одного и того же алерта подавляются cooldown-ом.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot
+
+from modules.config import (
+    ADMIN_USER_IDS, ALERT_CHECK_INTERVAL, ALERT_COOLDOWN,
+    ALERT_TRAFFIC_THRESHOLD, ALERT_EXPIRY_DAYS
+)
+from modules.services.node_watcher import NodeEvent, NodeWatcher
+from modules.services.user_snapshot import SnapshotDiff, UserSnapshot
+
+logger = logging.getLogger(__name__)
+
+class Alert(NamedTuple):
+    key: Hashable
+    text: str
+    created_at: float
+
+
+def _parse_ts(value: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _traffic_ratio(user: Dict) -> float:
+    limit = user.get('trafficLimitBytes') or 0
+    if limit <= 0:
+        return 0.0
+    return (user.get('usedTrafficBytes') or 0) / limit
+
+
+class AlertEngine:
+    """Движок правил с дедупликацией и рассылкой администраторам"""
+
+    def __init__(self, bot: Bot, snapshot: UserSnapshot, watcher: Optional[NodeWatcher] = None):
+        self.bot = bot
+        self.snapshot = snapshot
+        self.history: Deque[Alert] = deque(maxlen=50)
+        self._sent: Dict[Hashable, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expiry: Dict[str, float] = {}
+        self._primed = False
+        self._task: Optional[asyncio.Task] = None
+
+        snapshot.subscribe(self.on_snapshot_diff)
+        if watcher is not None:
+            watcher.subscribe(self.on_node_event)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="alert-engine")
+            logger.info(f"Alert engine started (interval {ALERT_CHECK_INTERVAL}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Alert engine stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in alert engine tick: {e}")
+            await asyncio.sleep(ALERT_CHECK_INTERVAL)
+
+    # ---------- Отправка ----------
+
+    async def _emit(self, key: Hashable, text: str, silent: bool = False):
+        """Отправить алерт, если по этому ключу не было алерта в течение cooldown"""
+        now = time.time()
+        last = self._sent.get(key)
+        if last is not None and now - last < ALERT_COOLDOWN:
+            return
+        self._sent[key] = now
+        if silent:
+            return
+
+        self.history.append(Alert(key, text, now))
+        for admin_id in ADMIN_USER_IDS:
+            try:
+                await self.bot.send_message(admin_id, text)
+            except Exception as e:
+                logger.error(f"Failed to send alert to {admin_id}: {e}")
+
+    # ---------- Пользователи (по диффам снимка) ----------
+
+    async def on_snapshot_diff(self, diff: SnapshotDiff):
+        # Первая синхронизация — это весь список пользователей, а не изменения:
+        # запоминаем текущее состояние без рассылки
+        silent = not self._primed
+        self._primed = True
+
+        for user in diff.added:
+            await self._check_user(None, user, silent)
+        for old, new in diff.changed:
+            await self._check_user(old, new, silent)
+        for user in diff.removed:
+            self._expiry.pop(user.get('uuid'), None)
+
+        if silent:
+            await self._check_expiring(silent=True)
+
+    async def _check_user(self, old: Optional[Dict], user: Dict, silent: bool):
+        uuid = user.get('uuid')
+        username = user.get('username', uuid)
+        threshold = ALERT_TRAFFIC_THRESHOLD / 100
+
+        # Срабатываем на пересечении порога, а не на каждом изменении трафика
+        ratio = _traffic_ratio(user)
+        if ratio >= threshold and (old is None or _traffic_ratio(old) < threshold):
+            limit = user.get('trafficLimitBytes') or 0
+            await self._emit(
+                ("traffic", uuid, limit),
+                f"⚠️ **Трафик**\n\nПользователь `{username}` израсходовал {ratio * 100:.0f}% лимита",
+                silent
+            )
+
+        expire_ts = _parse_ts(user.get('expireAt'))
+        if expire_ts and self._expiry.get(uuid) != expire_ts:
+            self._expiry[uuid] = expire_ts
+            heapq.heappush(self._expiry_heap, (expire_ts, uuid))
+
+    async def _check_expiring(self, silent: bool = False):
+        """Извлечь из кучи подписки, которые истекают в ближайшие ALERT_EXPIRY_DAYS"""
+        now = time.time()
+        horizon = now + ALERT_EXPIRY_DAYS * 86400
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= horizon:
+            expire_ts, uuid = heapq.heappop(self._expiry_heap)
+            # Запись устарела (срок продлён или пользователь удалён) или уже истекла
+            if self._expiry.get(uuid) != expire_ts or expire_ts <= now:
+                continue
+            user = self.snapshot.users.get(uuid, {})
+            username = user.get('username', uuid)
+            days_left = (expire_ts - now) / 86400
+            await self._emit(
+                ("expiry", uuid, expire_ts),
+                f"⏰ **Истекает подписка**\n\nПользователь `{username}`: осталось {days_left:.1f} дн",
+                silent
+            )
+
+    # ---------- Ноды и панель ----------
+
+    async def on_node_event(self, event: NodeEvent):
+        if event.kind == "panel_down":
+            self._sent.pop(("panel_restored",), None)
+            await self._emit(("panel",), "🔴 **Панель недоступна**\n\nAPI Remnawave не отвечает")
+        elif event.kind == "panel_up":
+            self._sent.pop(("panel",), None)
+            await self._emit(("panel_restored",), "🟢 **Панель снова доступна**")
+        elif event.kind == "down":
+            # Подписанным администраторам событие уже отправил наблюдатель — только в историю
+            name = event.node.get('name', event.node.get('uuid'))
+            self.history.append(Alert(("node", event.node.get('uuid')), f"🔴 **Нода отключилась**: {name}", time.time()))
+
+    async def tick(self):
+        if self._primed:
+            await self._check_expiring()
+
+
+_engine: Optional[AlertEngine] = None
+
+
+def get_alert_engine() -> Optional[AlertEngine]:
+    """Запущенный движок алертов (None, если алерты выключены)"""
+    return _engine
+
+
+def start_alert_engine(bot: Bot, snapshot: UserSnapshot, watcher: Optional[NodeWatcher] = None) -> AlertEngine:
+    global _engine
+    if _engine is None:
+        _engine = AlertEngine(bot, snapshot, watcher)
+    _engine.start()
+    return _engine
+
+
+async def stop_alert_engine():
+    if _engine is not None:
+        await _engine.stop()
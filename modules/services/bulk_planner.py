@@ -0,0 +1,142 @@
+"""
+Планировщик массовых изменений пользователей
+
+Изменения добавляются по одному пользователю. Пользователи с одинаковым
+набором новых полей (например, одной и той же новой датой истечения)
+объединяются в запросы /users/bulk/update пачками по BULK_CHUNK_SIZE.
+Уникальные изменения уходят обычными PUT /users/{uuid}, не более
+BULK_UPDATE_CONCURRENCY одновременно и с повтором при ошибке. До
+выполнения план показывает, сколько запросов к панели он сделает.
+"""
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from modules.api.bulk import BulkAPI, ChunkedResult
+from modules.api.executor import run_bounded
+from modules.api.users import update_user
+from modules.config import BULK_CHUNK_SIZE, BULK_UPDATE_CONCURRENCY
+from modules.services.user_snapshot import get_user_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Меньшие группы дешевле отправить по одному, чем собирать в bulk-запрос
+MIN_BATCH_SIZE = 2
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def _fields_key(fields: Dict[str, Any]) -> Hashable:
+    # Значения могут быть списками (inbound'ы), поэтому ключ — каноничный JSON
+    return json.dumps(fields, sort_keys=True)
+
+
+class UpdatePlan:
+    """Изменения пользователей, сгруппированные по одинаковым полям"""
+
+    def __init__(self, chunk_size: int = BULK_CHUNK_SIZE, min_batch: int = MIN_BATCH_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self.min_batch = max(2, min_batch)
+        self._groups: Dict[Hashable, Tuple[Dict[str, Any], List[str]]] = {}
+
+    def add(self, uuid: str, fields: Dict[str, Any]):
+        """Запланировать установку полей fields пользователю uuid"""
+        key = _fields_key(fields)
+        if key not in self._groups:
+            self._groups[key] = (dict(fields), [])
+        self._groups[key][1].append(uuid)
+
+    @property
+    def users(self) -> int:
+        return sum(len(uuids) for _, uuids in self._groups.values())
+
+    def groups(self) -> List[Tuple[Dict[str, Any], List[str]]]:
+        """Все группы: (поля, UUID пользователей с этими полями)"""
+        return list(self._groups.values())
+
+    def batches(self) -> List[Tuple[Dict[str, Any], List[str]]]:
+        """Bulk-запросы: (поля, UUID пачки)"""
+        result = []
+        for fields, uuids in self._groups.values():
+            if len(uuids) < self.min_batch:
+                continue
+            for start in range(0, len(uuids), self.chunk_size):
+                result.append((fields, uuids[start:start + self.chunk_size]))
+        return result
+
+    def singles(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Изменения, которые уходят отдельными запросами: (UUID, поля)"""
+        return [
+            (uuid, fields)
+            for fields, uuids in self._groups.values() if len(uuids) < self.min_batch
+            for uuid in uuids
+        ]
+
+    def preview(self) -> str:
+        """Описание плана для подтверждения (без отправки запросов)"""
+        bulk_calls = len(self.batches())
+        single_calls = len(self.singles())
+        batched_users = self.users - single_calls
+        text = f"**📡 Запросов к панели:** {bulk_calls + single_calls} вместо {self.users}\n"
+        text += f"• Пакетных: {bulk_calls} ({batched_users} польз.)\n"
+        text += f"• Отдельных: {single_calls}\n"
+        return text
+
+    def steps(self) -> List[Tuple[Dict[str, Any], int]]:
+        """План как шаги журнала задач: (payload для run_update_step, число пользователей)
+
+        Payload хранит итоговые значения полей, поэтому повтор шага безопасен.
+        """
+        steps = [
+            ({"op": "bulk_update", "uuids": uuids, "fields": fields}, len(uuids))
+            for fields, uuids in self.batches()
+        ]
+        singles = self.singles()
+        for start in range(0, len(singles), self.chunk_size):
+            chunk = singles[start:start + self.chunk_size]
+            steps.append(({"op": "update", "changes": [[uuid, fields] for uuid, fields in chunk]}, len(chunk)))
+        return steps
+
+    async def execute(self, concurrency: int = BULK_UPDATE_CONCURRENCY,
+                      progress: Optional[ProgressCallback] = None) -> ChunkedResult:
+        """Выполнить план; неудачный запрос не останавливает остальные"""
+        total = self.users
+        succeeded = failed = 0
+
+        for payload, count in self.steps():
+            offset = succeeded + failed
+
+            async def step_progress(done: int, _: int):
+                await progress(offset + done, total)
+
+            result = await run_update_step(
+                payload, concurrency, step_progress if progress is not None else None
+            )
+            succeeded += result.succeeded
+            failed += result.failed
+            if progress is not None:
+                await progress(succeeded + failed, total)
+
+        logger.info(f"Update plan executed: {succeeded} succeeded, {failed} failed of {total}")
+        return ChunkedResult(succeeded, failed)
+
+
+async def run_update_step(payload: Dict[str, Any], concurrency: int = BULK_UPDATE_CONCURRENCY,
+                          progress: Optional[ProgressCallback] = None) -> ChunkedResult:
+    """Выполнить один шаг из UpdatePlan.steps() или шаг update_inbounds"""
+    # Снимок пользователей больше не отражает панель до следующей синхронизации
+    get_user_snapshot().mark_stale()
+
+    if payload["op"] in ("bulk_update", "update_inbounds"):
+        uuids = payload["uuids"]
+        if payload["op"] == "bulk_update":
+            result = await BulkAPI.bulk_update_users(uuids, payload["fields"])
+        else:
+            result = await BulkAPI.bulk_update_users_inbounds(uuids, payload["inbounds"])
+        return ChunkedResult(0, len(uuids)) if result is None else ChunkedResult(len(uuids), 0)
+
+    results = await run_bounded(
+        payload["changes"], lambda change: update_user(*change),
+        concurrency=concurrency, progress=progress
+    )
+    return ChunkedResult(results.succeeded, results.failed)
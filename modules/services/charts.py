@@ -0,0 +1,201 @@
+"""
+Графики статистики: подготовка данных и отрисовка вне event loop
+
+Данные берутся из локальных источников (хранилище метрик, снимок пользователей),
+отрисовка идёт в пуле процессов. Готовые картинки кэшируются по ключу
+(график, окно, версия данных): после первой отправки хранится file_id
+Telegram, и повторный показ не загружает файл заново. Для трафика нод версия —
+конец текущей точки графика, для графиков по пользователям — поколение снимка.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Hashable, Optional
+
+from modules.config import CHART_RENDER_WORKERS
+from modules.services.metrics_store import get_metrics_store
+from modules.services.user_snapshot import get_user_snapshot
+from modules.utils.cache import TTLCache
+from modules.utils import chart_render
+
+logger = logging.getLogger(__name__)
+
+# Доступные графики и окна
+CHARTS = {
+    "nodes": "📡 Трафик нод",
+    "growth": "👥 Рост пользователей",
+    "expiry": "⏰ Истечение подписок",
+}
+CHART_WINDOWS = {
+    "7d": ("7 дней", 7),
+    "30d": ("30 дней", 30),
+    "365d": ("Год", 365),
+}
+
+# Сколько нод рисовать на графике трафика
+_TOP_NODES = 5
+_GRAPH_POINTS = 60
+
+_EXPIRY_BUCKETS = (
+    ("Истекли", None, 0),
+    ("0-3 д", 0, 4),
+    ("4-7 д", 4, 8),
+    ("8-14 д", 8, 15),
+    ("15-30 д", 15, 31),
+    ("31-90 д", 31, 91),
+    (">90 д", 91, None),
+)
+
+# file_id уже отправленных картинок; старые поколения просто вытесняются
+_file_ids = TTLCache(ttl=7 * 86400, max_size=256)
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class ChartDataUnavailable(Exception):
+    """Для графика пока нет данных"""
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn — чтобы не копировать в воркер состояние event loop и потоков бота
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, CHART_RENDER_WORKERS),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_chart_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+# ---------- Подготовка данных (в потоке основного процесса) ----------
+
+def _nodes_payload(days: int):
+    store = get_metrics_store()
+    end = int(time.time())
+    start = end - days * 86400
+
+    totals = store.sum_by_prefix("node:", ":traffic", start, end)
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:_TOP_NODES]
+    if not top:
+        raise ChartDataUnavailable("Нет локальных данных о трафике нод")
+
+    labels = store.labels(series for series, _ in top)
+    lines = []
+    for series, _ in top:
+        points = store.query_series(series, start, end, max_points=_GRAPH_POINTS)
+        lines.append((
+            labels.get(series, series.split(":")[1][:8]),
+            [ts for ts, _ in points],
+            [value / 1024 ** 3 for _, value in points],
+        ))
+    return chart_render.render_lines, (f"Трафик нод за {days} дн", lines, "ГБ")
+
+
+def _growth_payload(days: int):
+    snapshot = get_user_snapshot()
+    created = sorted(filter(None, (_parse_date(user.get('createdAt')) for user in snapshot.users.values())))
+    if not created:
+        raise ChartDataUnavailable("Снимок пользователей ещё не загружен")
+
+    now = datetime.now(timezone.utc)
+    start_ts = int(now.timestamp()) - days * 86400
+    step = 86400 if days <= 90 else 7 * 86400
+
+    xs, ys = [], []
+    index = 0
+    for ts in range(start_ts, int(now.timestamp()) + step, step):
+        while index < len(created) and created[index].timestamp() <= ts:
+            index += 1
+        xs.append(ts)
+        ys.append(index)
+    return chart_render.render_lines, (f"Пользователи за {days} дн", [("Всего", xs, ys)], "Пользователей")
+
+
+def _expiry_payload(days: int):
+    snapshot = get_user_snapshot()
+    if not snapshot.is_ready:
+        raise ChartDataUnavailable("Снимок пользователей ещё не загружен")
+
+    now = datetime.now(timezone.utc)
+    counts = [0] * len(_EXPIRY_BUCKETS)
+    for user in snapshot.users.values():
+        expire_at = _parse_date(user.get('expireAt'))
+        if not expire_at:
+            continue
+        left = (expire_at - now).total_seconds() / 86400
+        for i, (_, low, high) in enumerate(_EXPIRY_BUCKETS):
+            if (low is None or left >= low) and (high is None or left < high):
+                counts[i] += 1
+                break
+    return chart_render.render_bars, (
+        "Распределение сроков подписок",
+        [label for label, _, _ in _EXPIRY_BUCKETS],
+        counts,
+        "Пользователей",
+    )
+
+
+_PAYLOADS = {
+    "nodes": _nodes_payload,
+    "growth": _growth_payload,
+    "expiry": _expiry_payload,
+}
+
+
+def _data_version(chart: str, days: int) -> int:
+    if chart == "nodes":
+        # Сэмплер пишет каждые ~30 с, но точка графика меняется раз в шаг окна:
+        # картинка переиспользуется, пока не закончилась текущая точка
+        step = max(1, days * 86400 // _GRAPH_POINTS)
+        return (int(time.time()) // step + 1) * step
+    return get_user_snapshot().generation
+
+
+# ---------- Публичный API ----------
+
+def chart_cache_key(chart: str, window: str) -> Hashable:
+    # Распределение сроков не зависит от окна
+    if chart == "expiry":
+        return chart, "-", _data_version(chart, 0)
+    return chart, window, _data_version(chart, CHART_WINDOWS[window][1])
+
+
+def get_cached_file_id(key: Hashable) -> Optional[str]:
+    return _file_ids.get(key)
+
+
+def remember_file_id(key: Hashable, file_id: str):
+    _file_ids.set(key, file_id)
+
+
+async def render_chart(chart: str, window: str) -> bytes:
+    """Подготовить данные и отрисовать PNG в пуле процессов
+
+    Raises:
+        ChartDataUnavailable: данных для графика пока нет
+        ImportError: matplotlib не установлен
+    """
+    _, days = CHART_WINDOWS[window]
+    # Выборка из SQLite и разбор дат всех пользователей — в поток, чтобы не держать loop
+    render, args = await asyncio.to_thread(_PAYLOADS[chart], days)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), render, *args)
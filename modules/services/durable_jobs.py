@@ -0,0 +1,204 @@
+"""
+Массовые операции, переживающие перезапуск бота
+
+Операция описывается типом задачи: план (список шагов — пачек запросов к
+панели), выполнение одного шага и итоговый текст. Задача и её шаги пишутся
+в журнал (modules/services/job_journal.py), после каждого шага ставится
+чекпоинт. При старте бота незавершённые задачи продолжаются с первого
+невыполненного шага, а задачи на паузе восстанавливаются на паузе.
+
+Повторное нажатие той же кнопки подтверждения не запускает операцию второй
+раз: ключ идемпотентности задачи — тип задачи, сообщение подтверждения и
+параметры. Ключ действует, пока задача не завершена: бот переходит между
+экранами правкой одного сообщения, и следующий запуск той же операции из
+него — уже новое подтверждение.
+
+Если у типа задачи есть capture, перед выполнением сохраняются данные для
+отката (см. modules/services/rollback.py), а итоговое сообщение получает
+кнопку отмены изменений.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot, types
+
+from modules.services.job_journal import STEP_DONE, StepRecord, get_job_journal
+from modules.services.jobs import FAILED, PAUSED, Job, ProgressCallback, get_job_manager
+from modules.utils.callback_data import pack
+
+logger = logging.getLogger(__name__)
+
+Step = Tuple[Dict[str, Any], int]
+
+
+class JobKind(NamedTuple):
+    """Тип задачи: как спланировать, выполнить шаг и подвести итог"""
+    stage: str
+    plan: Callable[[Job, Dict[str, Any]], Awaitable[List[Step]]]
+    run_step: Callable[[Dict[str, Any], ProgressCallback], Awaitable[Tuple[int, int]]]
+    summary: Callable[[Dict[str, Any], List[StepRecord]], str]
+    after: Optional[Callable[[], None]] = None
+    capture: Optional[Callable[[List[Step]], Awaitable[Optional[bytes]]]] = None
+
+
+# Код callback_data кнопки отката: rb:<id задачи>
+ROLLBACK_CALLBACK = "rb"
+
+_kinds: Dict[str, JobKind] = {}
+
+# Запись состояния задач в журнал — по одной за раз, всегда текущего состояния
+_journal_lock = asyncio.Lock()
+_journal_writes = set()
+
+
+def register_job_kind(kind: str, stage: str,
+                      plan: Callable[[Job, Dict[str, Any]], Awaitable[List[Step]]],
+                      run_step: Callable[[Dict[str, Any], ProgressCallback], Awaitable[Tuple[int, int]]],
+                      summary: Callable[[Dict[str, Any], List[StepRecord]], str],
+                      after: Optional[Callable[[], None]] = None,
+                      capture: Optional[Callable[[List[Step]], Awaitable[Optional[bytes]]]] = None):
+    """Зарегистрировать тип задачи
+
+    Args:
+        kind: Имя типа, хранится в журнале
+        stage: Подпись прогресса при выполнении шагов
+        plan: Строит шаги (payload, число пользователей); может дополнить params для итога
+        run_step: Выполняет шаг, возвращает (успешно, с ошибкой)
+        summary: Итоговый текст по params и выполненным шагам
+        after: Вызывается после выполнения (например, сброс кэшей списков)
+        capture: Сохраняет прежние значения по шагам для отката
+    """
+    _kinds[kind] = JobKind(stage, plan, run_step, summary, after, capture)
+
+
+async def submit_durable_job(kind: str, title: str, params: Dict[str, Any], message: types.Message,
+                             done_markup: Optional[types.InlineKeyboardMarkup] = None,
+                             started_by: Optional[int] = None) -> Optional[Job]:
+    """Записать задачу в журнал и поставить в очередь
+
+    Returns:
+        Задача или None, если такая же задача по этому сообщению ещё выполняется
+    """
+    params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    idempotency_key = f"{kind}:{message.chat.id}:{message.message_id}:{params_hash}"
+    job_id = await asyncio.to_thread(
+        get_job_journal().create, kind, title, params, message.chat.id, message.message_id,
+        idempotency_key, done_markup.model_dump_json() if done_markup else None, started_by
+    )
+    if job_id is None:
+        return None
+    return _start(job_id, kind, title, params, message, done_markup, started_by, planned=False, paused=False)
+
+
+def _start(job_id: int, kind: str, title: str, params: Dict[str, Any], message: types.Message,
+           done_markup: Optional[types.InlineKeyboardMarkup], started_by: Optional[int],
+           planned: bool, paused: bool) -> Job:
+    async def run(job: Job) -> str:
+        return await _run(job, _kinds[kind], params, planned)
+
+    return get_job_manager().submit(
+        title, run, message, done_markup, started_by,
+        job_id=job_id, paused=paused, on_change=_persist_state
+    )
+
+
+async def _run(job: Job, kind: JobKind, params: Dict[str, Any], planned: bool) -> str:
+    journal = get_job_journal()
+    try:
+        if not planned:
+            steps = await kind.plan(job, params)
+            rollback = await kind.capture(steps) if kind.capture is not None and steps else None
+            await asyncio.to_thread(journal.save_plan, job.id, params, steps, rollback)
+            if rollback is not None:
+                job.done_markup = _with_undo(job.done_markup, job.id)
+
+        records = await asyncio.to_thread(journal.steps, job.id)
+        # Шаги без числа пользователей (удаление по статусу) считаются за единицу
+        total = sum(max(1, record.count) for record in records)
+        done = sum(max(1, record.count) for record in records if record.state == STEP_DONE)
+        report = job.progress(kind.stage)
+        if done:
+            await report(done, total)
+
+        for record in records:
+            if record.state == STEP_DONE:
+                continue
+
+            async def step_progress(step_done: int, _: int, offset: int = done):
+                await report(offset + step_done, total)
+
+            succeeded, failed = await kind.run_step(record.payload, step_progress)
+            await asyncio.to_thread(journal.complete_step, job.id, record.seq, succeeded, failed)
+            done += max(1, record.count)
+            await report(done, total)
+
+        records = await asyncio.to_thread(journal.steps, job.id)
+        return kind.summary(params, records)
+    finally:
+        if kind.after is not None:
+            kind.after()
+
+
+def _with_undo(markup: Optional[types.InlineKeyboardMarkup], job_id: int) -> types.InlineKeyboardMarkup:
+    undo = types.InlineKeyboardButton(text="↩️ Отменить изменения", callback_data=pack(ROLLBACK_CALLBACK, job_id))
+    rows = list(markup.inline_keyboard) if markup else []
+    return types.InlineKeyboardMarkup(inline_keyboard=[[undo]] + rows)
+
+
+def _persist_state(job: Job):
+    task = asyncio.create_task(_write_state(job))
+    _journal_writes.add(task)
+    task.add_done_callback(_journal_writes.discard)
+
+
+async def _write_state(job: Job):
+    async with _journal_lock:
+        try:
+            journal = get_job_journal()
+            if job.interrupted:
+                # Остановка бота: задача остаётся незавершённой и продолжится после старта
+                return
+            if job.is_active:
+                await asyncio.to_thread(journal.set_state, job.id, job.state)
+            else:
+                await asyncio.to_thread(journal.finish, job.id, job.state, job.result)
+        except Exception as e:
+            logger.error(f"Error writing job {job.id} state to journal: {e}")
+
+
+async def flush_job_journal():
+    """Дождаться записи состояний задач (перед закрытием журнала)"""
+    if _journal_writes:
+        await asyncio.gather(*list(_journal_writes), return_exceptions=True)
+
+
+async def resume_durable_jobs(bot: Bot):
+    """Продолжить задачи, прерванные перезапуском бота"""
+    journal = get_job_journal()
+    for record in await asyncio.to_thread(journal.unfinished):
+        if record.kind not in _kinds:
+            logger.error(f"Unknown job kind {record.kind}, job {record.id} marked as failed")
+            await asyncio.to_thread(journal.finish, record.id, FAILED, "❌ Неизвестный тип задачи")
+            continue
+
+        paused = record.state == PAUSED
+        try:
+            # Старое сообщение могло уйти далеко вверх — прогресс пишем в новое
+            message = await bot.send_message(
+                record.chat_id,
+                f"♻️ Задача #{record.id} «{record.title}» продолжается после перезапуска бота"
+            )
+        except Exception as e:
+            logger.error(f"Cannot notify chat {record.chat_id} about resumed job {record.id}: {e}")
+            continue
+
+        await asyncio.to_thread(journal.set_message, record.id, message.chat.id, message.message_id)
+        done_markup = types.InlineKeyboardMarkup.model_validate_json(record.done_markup) if record.done_markup else None
+        if await asyncio.to_thread(journal.get_rollback, record.id) is not None:
+            done_markup = _with_undo(done_markup, record.id)
+        _start(record.id, record.kind, record.title, record.params, message, done_markup,
+               record.started_by, planned=record.planned, paused=paused)
+        logger.info(f"Resumed job {record.id} ({record.kind}){' paused' if paused else ''}")
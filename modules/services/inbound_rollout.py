@@ -0,0 +1,107 @@
+"""
+Раскатка inbound'а на сегмент пользователей
+
+Вместо /inbounds/bulk/add-to-users (и remove-from-users), которые меняют
+всех пользователей панели, план по снимку пользователей находит в сегменте
+только тех, у кого inbound'а нет (или есть — при удалении), и меняет лишь их.
+Пользователи группируются по итоговому набору inbound'ов: у большинства он
+одинаковый, поэтому каждая группа уходит пачками в
+/users/bulk/update-inbounds, а пользователи, которым ничего менять не нужно,
+запросов не получают вовсе.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from modules.config import BULK_CHUNK_SIZE
+from modules.services.durable_jobs import Step
+from modules.services.rollback import user_inbound_uuids
+from modules.services.user_export import EXPORT_CATEGORIES
+from modules.services.user_snapshot import get_user_snapshot
+
+logger = logging.getLogger(__name__)
+
+ADD = "add"
+REMOVE = "remove"
+
+# Сегменты — те же категории, что и у выгрузки пользователей
+ROLLOUT_SEGMENTS = EXPORT_CATEGORIES
+
+
+class RolloutPlan:
+    """Пользователи сегмента, которым нужно изменить набор inbound'ов"""
+
+    def __init__(self, inbound_uuid: str, action: str, segment: str, chunk_size: int = BULK_CHUNK_SIZE):
+        self.inbound_uuid = inbound_uuid
+        self.action = action
+        self.segment = segment
+        self.chunk_size = max(1, chunk_size)
+        # Итоговый набор inbound'ов → UUID пользователей
+        self._groups: Dict[Tuple[str, ...], List[str]] = {}
+        self.matched = 0
+        self.skipped = 0
+
+    def add(self, user: Dict):
+        """Учесть пользователя сегмента: в план, если его набор inbound'ов меняется"""
+        self.matched += 1
+        current = user_inbound_uuids(user)
+        has_inbound = self.inbound_uuid in current
+        if has_inbound == (self.action == ADD):
+            self.skipped += 1
+            return
+        if self.action == ADD:
+            target = sorted(current + [self.inbound_uuid])
+        else:
+            target = [uuid for uuid in current if uuid != self.inbound_uuid]
+        self._groups.setdefault(tuple(target), []).append(user['uuid'])
+
+    @property
+    def users(self) -> int:
+        return self.matched - self.skipped
+
+    def steps(self) -> List[Step]:
+        """Шаги update_inbounds для run_update_step; хранят итоговые наборы, повтор безопасен"""
+        steps = []
+        for inbounds, uuids in self._groups.items():
+            for start in range(0, len(uuids), self.chunk_size):
+                chunk = uuids[start:start + self.chunk_size]
+                steps.append(({"op": "update_inbounds", "uuids": chunk, "inbounds": list(inbounds)}, len(chunk)))
+        return steps
+
+    def preview(self) -> str:
+        """Описание плана для подтверждения (без отправки запросов)"""
+        text = f"**👥 В сегменте:** {self.matched}\n"
+        text += f"• Будет изменено: {self.users}\n"
+        reason = "inbound уже есть" if self.action == ADD else "inbound'а и так нет"
+        text += f"• Пропущено ({reason}): {self.skipped}\n"
+        text += f"**📡 Запросов к панели:** {len(self.steps())}\n"
+        return text
+
+
+async def plan_rollout(inbound_uuid: str, action: str, segment: str) -> Optional[RolloutPlan]:
+    """Построить план по актуальному снимку пользователей
+
+    Returns:
+        План или None, если снимок пользователей недоступен
+    """
+    if action not in (ADD, REMOVE) or segment not in ROLLOUT_SEGMENTS:
+        logger.error(f"Unsupported inbound rollout {action}/{segment}")
+        return None
+
+    snapshot = get_user_snapshot()
+    if not await snapshot.ensure_fresh():
+        logger.warning("Inbound rollout: user snapshot is not available")
+        return None
+
+    _, user_filter = ROLLOUT_SEGMENTS[segment]
+    now = datetime.now(timezone.utc)
+    plan = RolloutPlan(inbound_uuid, action, segment)
+    for user in snapshot.users.values():
+        if user_filter is None or user_filter(user, now):
+            plan.add(user)
+
+    logger.info(
+        f"Inbound rollout {action} {inbound_uuid} to {segment}: "
+        f"{plan.users} to change, {plan.skipped} skipped, {len(plan.steps())} requests"
+    )
+    return plan
@@ -0,0 +1,250 @@
+"""
+Журнал фоновых задач (SQLite)
+
+Задача записывается до начала работы: тип, параметры, сообщение с прогрессом
+и ключ идемпотентности (действует до завершения задачи). После планирования в журнал одной транзакцией
+попадают все шаги задачи (пачки запросов к панели), и каждый выполненный шаг
+отмечается сразу после ответа панели. Если бот перезапустился посреди работы,
+незавершённая задача продолжается с первого невыполненного шага.
+
+Шаги хранят итоговые значения (новая дата истечения, список UUID для
+удаления), а не приращения, поэтому повтор шага, ответ на который не успели
+записать, не продлевает пользователей второй раз.
+
+Все методы синхронные — из async-кода их нужно вызывать через asyncio.to_thread.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.config import JOBS_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Состояния шагов
+STEP_PENDING = "pending"
+STEP_DONE = "done"
+
+# Сколько хранить записи о завершённых задачах
+_FINISHED_RETENTION = 30 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    title TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    planned INTEGER NOT NULL DEFAULT 0,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    done_markup TEXT,
+    started_by INTEGER,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT
+);
+
+CREATE TABLE IF NOT EXISTS job_steps (
+    job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollbacks (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    data BLOB NOT NULL
+);
+"""
+
+
+class JobRecord(NamedTuple):
+    id: int
+    kind: str
+    title: str
+    params: Dict[str, Any]
+    state: str
+    planned: bool
+    chat_id: int
+    message_id: int
+    done_markup: Optional[str]
+    started_by: Optional[int]
+
+
+class StepRecord(NamedTuple):
+    seq: int
+    payload: Dict[str, Any]
+    count: int
+    state: str
+    succeeded: int
+    failed: int
+
+
+class JobJournal:
+    """Журнал задач и их шагов на SQLite"""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Отметка шага должна пережить падение контейнера
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - _FINISHED_RETENTION,)
+        )
+        self._conn.commit()
+        logger.info(f"Job journal opened at {path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- Задачи ----------
+
+    def create(self, kind: str, title: str, params: Dict[str, Any], chat_id: int, message_id: int,
+               idempotency_key: Optional[str] = None, done_markup: Optional[str] = None,
+               started_by: Optional[int] = None, state: str = "queued") -> Optional[int]:
+        """Записать новую задачу
+
+        Returns:
+            ID задачи или None, если задача с таким ключом идемпотентности уже есть
+        """
+        with self._lock:
+            try:
+                cur = self._conn.execute(
+                    "INSERT INTO jobs (kind, idempotency_key, title, params, state, chat_id, message_id, "
+                    "done_markup, started_by, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, idempotency_key, title, json.dumps(params), state, chat_id, message_id,
+                     done_markup, started_by, time.time())
+                )
+            except sqlite3.IntegrityError:
+                logger.warning(f"Job with idempotency key {idempotency_key} already exists")
+                return None
+            self._conn.commit()
+            return cur.lastrowid
+
+    def reserve_id(self) -> int:
+        """ID для задачи вне журнала: из той же последовательности, чтобы не совпасть с журнальными"""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (kind, title, params, state, chat_id, message_id, created_at) "
+                "VALUES ('reserved', '', '{}', 'reserved', 0, 0, ?)",
+                (time.time(),)
+            )
+            # AUTOINCREMENT не выдаёт ID удалённых строк повторно
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (cur.lastrowid,))
+            self._conn.commit()
+            return cur.lastrowid
+
+    def save_plan(self, job_id: int, params: Dict[str, Any], steps: List[Tuple[Dict[str, Any], int]],
+                  rollback: Optional[bytes] = None):
+        """Сохранить шаги задачи (payload, число пользователей) и данные отката одной транзакцией"""
+        with self._lock:
+            self._conn.execute("DELETE FROM job_steps WHERE job_id = ?", (job_id,))
+            if rollback is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rollbacks (job_id, data) VALUES (?, ?)", (job_id, rollback)
+                )
+            self._conn.executemany(
+                "INSERT INTO job_steps (job_id, seq, payload, count, state) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, seq, json.dumps(payload), count, STEP_PENDING) for seq, (payload, count) in enumerate(steps)]
+            )
+            self._conn.execute(
+                "UPDATE jobs SET params = ?, planned = 1 WHERE id = ?", (json.dumps(params), job_id)
+            )
+            self._conn.commit()
+
+    def complete_step(self, job_id: int, seq: int, succeeded: int, failed: int):
+        """Чекпоинт: шаг выполнен, повторять его не нужно"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_steps SET state = ?, succeeded = ?, failed = ? WHERE job_id = ? AND seq = ?",
+                (STEP_DONE, succeeded, failed, job_id, seq)
+            )
+            self._conn.commit()
+
+    def set_state(self, job_id: int, state: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET state = ? WHERE id = ?", (state, job_id))
+            self._conn.commit()
+
+    def set_message(self, job_id: int, chat_id: int, message_id: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET chat_id = ?, message_id = ? WHERE id = ?", (chat_id, message_id, job_id)
+            )
+            self._conn.commit()
+
+    def finish(self, job_id: int, state: str, result: Optional[str]):
+        """Отметить задачу завершённой и освободить её ключ идемпотентности"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, finished_at = ?, idempotency_key = NULL WHERE id = ?",
+                (state, result, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    # ---------- Чтение ----------
+
+    def unfinished(self) -> List[JobRecord]:
+        """Задачи, прерванные перезапуском, в порядке создания"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, title, params, state, planned, chat_id, message_id, done_markup, started_by "
+                "FROM jobs WHERE finished_at IS NULL ORDER BY id"
+            ).fetchall()
+        return [
+            JobRecord(row[0], row[1], row[2], json.loads(row[3]), row[4], bool(row[5]), *row[6:])
+            for row in rows
+        ]
+
+    def get_rollback(self, job_id: int) -> Optional[bytes]:
+        """Сжатые прежние значения полей пользователей, изменённых задачей"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM rollbacks WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def steps(self, job_id: int) -> List[StepRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, payload, count, state, succeeded, failed FROM job_steps WHERE job_id = ? ORDER BY seq",
+                (job_id,)
+            ).fetchall()
+        return [StepRecord(row[0], json.loads(row[1]), *row[2:]) for row in rows]
+
+
+_journal: Optional[JobJournal] = None
+
+
+def get_job_journal() -> JobJournal:
+    """Общий экземпляр журнала задач"""
+    global _journal
+    if _journal is None:
+        _journal = JobJournal()
+    return _journal
+
+
+def close_job_journal():
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
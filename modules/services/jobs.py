@@ -0,0 +1,293 @@
+"""
+Фоновые задачи для долгих массовых операций
+
+Обработчик ставит операцию в очередь и сразу освобождается, а операция
+выполняется отдельной задачей asyncio. Прогресс пишется в сообщение задачи
+через общую очередь правок, поэтому частые отчёты сливаются и не упираются
+в лимиты Telegram. Пауза и отмена кооперативные: операция проверяет их при
+каждом отчёте о прогрессе, то есть между пачками запросов к панели, и
+начатая пачка всегда доводится до конца. Одновременно выполняется не больше
+JOB_MAX_RUNNING задач, остальные ждут в очереди; задача на паузе своё место
+освобождает и после продолжения снова встаёт в очередь за ним.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from aiogram import types
+
+from modules.config import JOB_MAX_RUNNING, JOB_HISTORY_SIZE
+from modules.utils.callback_data import pack
+from modules.utils.outbound import get_outbound
+
+logger = logging.getLogger(__name__)
+
+# Код callback_data кнопок задач: job:<действие>:<id>
+JOB_CALLBACK = "job"
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+STATE_LABELS = {
+    QUEUED: "🕓 В очереди",
+    RUNNING: "▶️ Выполняется",
+    PAUSED: "⏸️ На паузе",
+    DONE: "✅ Завершена",
+    FAILED: "❌ Ошибка",
+    CANCELLED: "⏹️ Отменена",
+}
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class JobCancelled(Exception):
+    """Задачу отменил администратор; аргумент — итоговый текст, если операция подвела итог сама"""
+
+
+class Job:
+    """Одна фоновая операция и её сообщение с прогрессом"""
+
+    def __init__(self, job_id: int, title: str, message: types.Message,
+                 done_markup: Optional[types.InlineKeyboardMarkup] = None, started_by: Optional[int] = None):
+        self.id = job_id
+        self.title = title
+        self.message = message
+        self.done_markup = done_markup
+        self.started_by = started_by
+        self.state = QUEUED
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.result: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Задачу прервала остановка бота, а не администратор
+        self.interrupted = False
+        self.task: Optional[asyncio.Task] = None
+        # Вызывается при смене состояния (пауза, отмена, завершение)
+        self.on_change: Optional[Callable[["Job"], None]] = None
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._cancel_requested = False
+        # Место в очереди JobManager, пока задача его занимает
+        self._slot: Optional[asyncio.Semaphore] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (QUEUED, RUNNING, PAUSED)
+
+    # ---------- Управление ----------
+
+    def pause(self) -> bool:
+        if self.state != RUNNING:
+            return False
+        self.state = PAUSED
+        self._resumed.clear()
+        self._changed()
+        return True
+
+    def resume(self) -> bool:
+        if self.state != PAUSED:
+            return False
+        self.state = RUNNING if self.started_at else QUEUED
+        self._resumed.set()
+        self._changed()
+        return True
+
+    def cancel(self) -> bool:
+        if not self.is_active or self._cancel_requested:
+            return False
+        self._cancel_requested = True
+        # Задача на паузе должна проснуться, чтобы заметить отмену
+        self._resumed.set()
+        self._changed()
+        return True
+
+    async def checkpoint(self):
+        """Точка, где операция останавливается на паузе или прерывается отменой
+
+        Raises:
+            JobCancelled: администратор отменил задачу
+        """
+        if self._cancel_requested:
+            raise JobCancelled()
+        if not self._resumed.is_set():
+            slot = self._slot
+            if slot is not None:
+                # На паузе место не держим, иначе пара пауз останавливает всю очередь
+                self._slot = None
+                slot.release()
+            await self._resumed.wait()
+            if self._cancel_requested:
+                raise JobCancelled()
+            if slot is not None:
+                await slot.acquire()
+                self._slot = slot
+        if self._cancel_requested:
+            raise JobCancelled()
+
+    # ---------- Прогресс ----------
+
+    def progress(self, stage: str) -> ProgressCallback:
+        """Колбэк прогресса (done, total) для этапа stage; заодно точка паузы и отмены"""
+        async def report(done: int, total: int):
+            self.stage = stage
+            self.done = done
+            self.total = total
+            self.show()
+            await self.checkpoint()
+        return report
+
+    def set_stage(self, stage: str):
+        self.stage = stage
+        self.done = self.total = 0
+        self.show()
+
+    def render(self) -> str:
+        text = f"**{self.title}**\n"
+        if not self.is_active and self.result:
+            return text + "\n" + self.result
+        state = "⏹️ Отменяется..." if self._cancel_requested else STATE_LABELS[self.state]
+        text += f"{state}\n\n"
+        if self.stage:
+            text += self.stage
+            if self.total:
+                percent = self.done / self.total * 100
+                text += f" {percent:.1f}% ({self.done}/{self.total})"
+            text += "\n"
+        return text
+
+    def controls(self) -> types.InlineKeyboardMarkup:
+        rows = []
+        if self.is_active and not self._cancel_requested:
+            toggle = (types.InlineKeyboardButton(text="▶️ Продолжить", callback_data=pack(JOB_CALLBACK, "resume", self.id))
+                      if self.state == PAUSED else
+                      types.InlineKeyboardButton(text="⏸️ Пауза", callback_data=pack(JOB_CALLBACK, "pause", self.id)))
+            rows.append([toggle, types.InlineKeyboardButton(text="⏹️ Отменить", callback_data=pack(JOB_CALLBACK, "cancel", self.id))])
+        rows.append([types.InlineKeyboardButton(text="📋 Все задачи", callback_data="jobs")])
+        return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+    def _changed(self):
+        self.show()
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def show(self):
+        """Обновить сообщение задачи через очередь правок"""
+        if self.is_active:
+            get_outbound().edit(self.message, self.render(), self.controls())
+        else:
+            get_outbound().edit(self.message, self.render(), self.done_markup or self.controls())
+
+
+JobRun = Callable[[Job], Awaitable[str]]
+
+
+class JobManager:
+    """Очередь фоновых задач и история последних завершённых"""
+
+    def __init__(self, max_running: int = JOB_MAX_RUNNING, history_size: int = JOB_HISTORY_SIZE):
+        self.history_size = max(1, history_size)
+        self._slots = asyncio.Semaphore(max(1, max_running))
+        self._jobs: "OrderedDict[int, Job]" = OrderedDict()
+        self._next_id = 1
+
+    def submit(self, title: str, run: JobRun, message: types.Message,
+               done_markup: Optional[types.InlineKeyboardMarkup] = None,
+               started_by: Optional[int] = None, job_id: Optional[int] = None,
+               paused: bool = False, on_change: Optional[Callable[[Job], None]] = None) -> Job:
+        """Поставить операцию в очередь; run(job) возвращает итоговый текст
+
+        job_id задаётся, если задача уже записана в журнал; paused — начать на паузе.
+        """
+        if job_id is None:
+            job_id = self._next_id
+        self._next_id = max(self._next_id, job_id + 1)
+        job = Job(job_id, title, message, done_markup, started_by)
+        job.on_change = on_change
+        if paused:
+            job.state = PAUSED
+            job._resumed.clear()
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run), name=f"job-{job.id}")
+        self._prune()
+        job.show()
+        logger.info(f"Job {job.id} queued: {title}")
+        return job
+
+    async def _run(self, job: Job, run: JobRun):
+        try:
+            await self._slots.acquire()
+            job._slot = self._slots
+            job.started_at = time.time()
+            if job.state == QUEUED:
+                job.state = RUNNING
+            job.show()
+            await job.checkpoint()
+            job.result = await run(job)
+            job.state = DONE
+        except JobCancelled as e:
+            job.state = CANCELLED
+            if e.args:
+                job.result = e.args[0]
+            else:
+                job.result = "⏹️ Задача отменена"
+                if job.total:
+                    job.result += f" после обработки {job.done} из {job.total}"
+        except asyncio.CancelledError:
+            job.state = CANCELLED
+            job.interrupted = True
+            job.result = "⏹️ Задача прервана остановкой бота"
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.title}) failed: {e}", exc_info=True)
+            job.state = FAILED
+            job.result = "❌ Ошибка при выполнении, подробности в логах бота"
+        finally:
+            if job._slot is not None:
+                job._slot = None
+                self._slots.release()
+            job.finished_at = time.time()
+            logger.info(f"Job {job.id} finished: {job.state}")
+            job._changed()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Задачи, новые первыми"""
+        return list(reversed(self._jobs.values()))
+
+    async def stop(self):
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Общая очередь фоновых задач"""
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
+
+
+async def stop_jobs():
+    if _manager is not None:
+        await _manager.stop()
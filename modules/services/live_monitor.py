@@ -0,0 +1,290 @@
+"""
+Живой мониторинг в реальном времени
+
+Один общий цикл обновления на всех администраторов, открывших экран мониторинга:
+данные панели запрашиваются один раз за тик, текст рендерится один раз, а каждое
+сообщение редактируется только если его содержимое действительно изменилось.
+Интервал адаптивный — удваивается, пока данные не меняются, и сбрасывается
+к минимуму при изменениях. Сообщения без активности отключаются по таймауту.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, types
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from modules.config import LIVE_MONITOR_MIN_INTERVAL, LIVE_MONITOR_MAX_INTERVAL, LIVE_MONITOR_IDLE_TIMEOUT
+from modules.api.nodes import get_nodes_usage_realtime
+from modules.services.node_watcher import get_nodes_cached
+from modules.services.user_snapshot import get_user_snapshot
+from modules.utils.formatters_aiogram import format_bytes
+
+logger = logging.getLogger(__name__)
+
+# Кнопки, которые не уводят сообщение с экрана мониторинга
+MONITOR_CALLBACKS = ("realtime_stats", "pause_monitoring")
+
+_MAX_NODES = 20
+
+MessageKey = Tuple[int, int]
+
+
+class Watch:
+    """Сообщение, которое обновляет монитор"""
+
+    __slots__ = ("bot", "chat_id", "message_id", "markup", "stopped_markup", "last_hash", "active_at")
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int,
+                 markup: types.InlineKeyboardMarkup, stopped_markup: types.InlineKeyboardMarkup):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.markup = markup
+        self.stopped_markup = stopped_markup
+        self.last_hash: Optional[int] = None
+        self.active_at = time.time()
+
+
+def _plain(text: Any) -> str:
+    # Имя ноды произвольное — убираем символы разметки
+    text = str(text)
+    for char in "*_`[":
+        text = text.replace(char, "")
+    return text
+
+
+def _speed(bps: float) -> str:
+    return f"{format_bytes(int(bps or 0))}/s"
+
+
+class LiveMonitor:
+    """Общий цикл обновления экранов мониторинга"""
+
+    def __init__(self, min_interval: int = LIVE_MONITOR_MIN_INTERVAL,
+                 max_interval: int = LIVE_MONITOR_MAX_INTERVAL,
+                 idle_timeout: int = LIVE_MONITOR_IDLE_TIMEOUT):
+        self.min_interval = max(2, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.idle_timeout = max(30, idle_timeout)
+        self.interval = self.min_interval
+        self._watches: Dict[MessageKey, Watch] = {}
+        self._body: Optional[str] = None
+        self._hash: Optional[int] = None
+        self._changed_at: Optional[float] = None
+        self._refreshed_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def watchers(self) -> int:
+        return len(self._watches)
+
+    def is_watching(self, chat_id: int, message_id: int) -> bool:
+        return (chat_id, message_id) in self._watches
+
+    # ---------- Подписка сообщений ----------
+
+    async def watch(self, bot: Bot, chat_id: int, message_id: int,
+                    markup: types.InlineKeyboardMarkup,
+                    stopped_markup: types.InlineKeyboardMarkup) -> bool:
+        """Начать (или продлить) автообновление сообщения и сразу показать актуальные данные"""
+        key = (chat_id, message_id)
+        watch = self._watches.get(key)
+        if watch is None:
+            watch = Watch(bot, chat_id, message_id, markup, stopped_markup)
+            self._watches[key] = watch
+        else:
+            watch.active_at = time.time()
+
+        # Ручное обновление — это признак интереса: возвращаемся к частому опросу
+        self.interval = self.min_interval
+        if self._refreshed_at is None or time.time() - self._refreshed_at >= self.min_interval:
+            await self.refresh()
+        if self._body is None:
+            self._watches.pop(key, None)
+            return False
+
+        await self._edit(watch)
+        self._ensure_running()
+        return True
+
+    def unwatch(self, chat_id: int, message_id: int) -> bool:
+        """Остановить автообновление сообщения"""
+        return self._watches.pop((chat_id, message_id), None) is not None
+
+    # ---------- Данные и рендер ----------
+
+    async def refresh(self) -> bool:
+        """Один общий запрос данных для всех наблюдателей; True, если текст изменился"""
+        async with self._refresh_lock:
+            usage, nodes = await asyncio.gather(get_nodes_usage_realtime(), get_nodes_cached())
+            body = self._render_body(usage or [], nodes or [])
+            body_hash = hash(body)
+            self._refreshed_at = time.time()
+            if body_hash == self._hash:
+                return False
+            self._body = body
+            self._hash = body_hash
+            self._changed_at = self._refreshed_at
+            return True
+
+    def _render_body(self, usage, nodes) -> str:
+        speeds = {item.get('nodeUuid'): item for item in usage if isinstance(item, dict)}
+        lines = ["**🔥 Сейчас:**"]
+
+        if nodes:
+            online_nodes = sum(1 for node in nodes if node.get('isConnected'))
+            users_online = sum(node.get('usersOnline') or 0 for node in nodes)
+            lines.append(f"• Онлайн: {users_online}")
+            lines.append(f"• Серверов: {online_nodes}/{len(nodes)}")
+
+        snapshot = get_user_snapshot()
+        if snapshot.is_ready:
+            # Счётчики пользователей — из общего снимка, без выгрузки всех пользователей
+            active = sum(1 for user in snapshot.users.values() if user.get('status') == 'ACTIVE')
+            lines.append(f"• Активных пользователей: {active}/{len(snapshot.users)}")
+
+        if speeds:
+            down = sum(item.get('downloadSpeedBps') or 0 for item in speeds.values())
+            up = sum(item.get('uploadSpeedBps') or 0 for item in speeds.values())
+            lines.append(f"• Скорость: ⬇️ {_speed(down)} ⬆️ {_speed(up)}")
+
+        lines.append("")
+        lines.append("**📊 Статус серверов:**")
+        if not nodes:
+            lines.append("Серверы не найдены")
+        for node in nodes[:_MAX_NODES]:
+            status_emoji = "🟢" if node.get('isConnected') else ("⏸️" if node.get('isDisabled') else "🔴")
+            line = f"{status_emoji} {_plain(node.get('name', 'Unknown'))}"
+            speed = speeds.get(node.get('uuid'))
+            if speed and speed.get('totalSpeedBps'):
+                line += f" — {_speed(speed['totalSpeedBps'])}"
+            if node.get('usersOnline'):
+                line += f" · 👥 {node['usersOnline']}"
+            lines.append(line)
+        if len(nodes) > _MAX_NODES:
+            lines.append(f"… и ещё {len(nodes) - _MAX_NODES}")
+
+        return "\n".join(lines)
+
+    def render(self, footer: str = "🔄 Автообновление включено") -> Optional[str]:
+        """Последний отрендеренный экран (None, если данных ещё не было)"""
+        if self._body is None:
+            return None
+        changed_at = datetime.fromtimestamp(self._changed_at).strftime("%H:%M:%S")
+        return (
+            "⚡ **Мониторинг в реальном времени**\n"
+            f"🕐 Данные от: {changed_at}\n\n"
+            f"{self._body}\n\n"
+            f"{footer}"
+        )
+
+    # ---------- Редактирование сообщений ----------
+
+    async def _edit(self, watch: Watch, text: Optional[str] = None,
+                    markup: Optional[types.InlineKeyboardMarkup] = None) -> bool:
+        """Отредактировать сообщение; False, если сообщение больше недоступно"""
+        try:
+            await watch.bot.edit_message_text(
+                text=text or self.render(),
+                chat_id=watch.chat_id,
+                message_id=watch.message_id,
+                reply_markup=markup or watch.markup
+            )
+        except TelegramRetryAfter as e:
+            logger.warning(f"Live monitor: flood control, retry after {e.retry_after}s")
+            return True
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.info(f"Live monitor: dropping message {watch.chat_id}/{watch.message_id}: {e}")
+                return False
+        except Exception as e:
+            logger.error(f"Live monitor: error editing {watch.chat_id}/{watch.message_id}: {e}")
+            return True
+
+        if text is None:
+            watch.last_hash = self._hash
+        return True
+
+    async def _stop_idle(self, watch: Watch):
+        self._watches.pop((watch.chat_id, watch.message_id), None)
+        await self._edit(
+            watch,
+            text=self.render("⏹️ Автообновление остановлено: нет активности"),
+            markup=watch.stopped_markup
+        )
+
+    # ---------- Цикл ----------
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="live-monitor")
+            logger.info("Live monitor started")
+
+    async def _run(self):
+        try:
+            while self._watches:
+                await asyncio.sleep(self.interval)
+
+                now = time.time()
+                for watch in [w for w in self._watches.values() if now - w.active_at >= self.idle_timeout]:
+                    await self._stop_idle(watch)
+                if not self._watches:
+                    break
+
+                try:
+                    changed = await self.refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Live monitor: error refreshing data: {e}")
+                    changed = False
+
+                self.interval = self.min_interval if changed else min(self.interval * 2, self.max_interval)
+
+                for key, watch in list(self._watches.items()):
+                    if watch.last_hash == self._hash:
+                        continue
+                    if not await self._edit(watch):
+                        self._watches.pop(key, None)
+        finally:
+            logger.info("Live monitor stopped")
+
+    async def stop(self):
+        self._watches.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class LiveMonitorMiddleware(BaseMiddleware):
+    """Снимает сообщение с мониторинга, когда администратор уходит с экрана"""
+
+    async def __call__(self, handler: Callable[[types.CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+                       event: types.CallbackQuery, data: Dict[str, Any]) -> Any:
+        if _monitor is not None and event.message and event.data not in MONITOR_CALLBACKS:
+            _monitor.unwatch(event.message.chat.id, event.message.message_id)
+        return await handler(event, data)
+
+
+_monitor: Optional[LiveMonitor] = None
+
+
+def get_live_monitor() -> LiveMonitor:
+    """Общий экземпляр живого мониторинга"""
+    global _monitor
+    if _monitor is None:
+        _monitor = LiveMonitor()
+    return _monitor
+
+
+async def stop_live_monitor():
+    if _monitor is not None:
+        await _monitor.stop()
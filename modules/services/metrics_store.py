@@ -0,0 +1,350 @@
+"""
+Локальное хранилище временных рядов трафика (SQLite)
+
+Сырые точки хранятся компактно: (series, ts, value) с первичным ключом (series, ts).
+При записи каждая точка сразу сворачивается в агрегаты 1m / 1h / 1d
+(count, sum, min, max, last). У каждого уровня свой срок хранения,
+а планировщик запросов выбирает самый грубый уровень, которого достаточно для окна —
+поэтому недельный, месячный и годовой графики читают несколько сотен точек
+независимо от длины истории.
+
+Все методы синхронные — из async-кода их нужно вызывать через asyncio.to_thread.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from modules.config import (
+    METRICS_DB_PATH, METRICS_SAMPLE_INTERVAL,
+    METRICS_RAW_RETENTION_HOURS, METRICS_1M_RETENTION_DAYS,
+    METRICS_1H_RETENTION_DAYS, METRICS_1D_RETENTION_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Level(NamedTuple):
+    """Уровень детализации: имя, таблица, размер корзины и срок хранения (секунды)"""
+    name: str
+    table: str
+    bucket: int
+    retention: int
+
+
+# От самого подробного к самому грубому. У сырого уровня корзина = интервал опроса.
+LEVELS = (
+    Level("raw", "samples", max(1, METRICS_SAMPLE_INTERVAL), METRICS_RAW_RETENTION_HOURS * 3600),
+    Level("1m", "rollup_1m", 60, METRICS_1M_RETENTION_DAYS * 86400),
+    Level("1h", "rollup_1h", 3600, METRICS_1H_RETENTION_DAYS * 86400),
+    Level("1d", "rollup_1d", 86400, METRICS_1D_RETENTION_DAYS * 86400),
+)
+ROLLUP_LEVELS = LEVELS[1:]
+
+# Сколько точек по умолчанию отдавать для графика
+DEFAULT_MAX_POINTS = 300
+
+# Допустимые агрегаты при чтении
+_AGGREGATES = {
+    "sum": "SUM({sum})",
+    "avg": "SUM({sum}) / SUM({count})",
+    "min": "MIN({min})",
+    "max": "MAX({max})",
+}
+
+_ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    series TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (series, bucket)
+) WITHOUT ROWID;
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    series TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS counters (
+    series TEXT PRIMARY KEY,
+    last_value REAL NOT NULL,
+    ts INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series_labels (
+    series TEXT PRIMARY KEY,
+    label TEXT NOT NULL
+) WITHOUT ROWID;
+""" + "".join(_ROLLUP_TABLE.format(table=level.table) for level in ROLLUP_LEVELS)
+
+# Как часто (в записях) запускать вытеснение старых точек
+_PRUNE_EVERY = 60
+
+
+def plan_level(start: int, end: int, max_points: int = DEFAULT_MAX_POINTS, now: Optional[int] = None) -> Level:
+    """Выбрать уровень детализации для окна [start, end)
+
+    Подходящий уровень ещё хранит начало окна и даёт шаг не крупнее window / max_points.
+    Из подходящих берётся самый грубый; если подходящих нет — самый грубый из тех,
+    что хранят начало окна, иначе дневной.
+    """
+    now = int(now or time.time())
+    step = max(1, (end - start) // max(1, max_points))
+    covering = [level for level in LEVELS if now - level.retention <= start]
+    fitting = [level for level in covering if level.bucket <= step]
+
+    if fitting:
+        return fitting[-1]
+    if covering:
+        return covering[0]
+    return LEVELS[-1]
+
+
+class MetricsStore:
+    """Встраиваемое хранилище метрик на SQLite"""
+
+    def __init__(self, path: str = METRICS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Увеличивается при каждой записи — пригодится для инвалидации кэшей
+        self.generation = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        logger.info(f"Metrics store opened at {path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- Запись ----------
+
+    def record(self, ts: int, counters: Dict[str, float] = None, gauges: Dict[str, float] = None,
+               total_series: Optional[str] = None) -> Dict[str, float]:
+        """Записать срез метрик одной транзакцией (generation растёт на единицу за срез)
+
+        Args:
+            ts: Unix-время среза (секунды)
+            counters: Монотонные счётчики; в ряд пишется прирост с прошлого среза.
+                Если значение уменьшилось (счётчик сброшен на ноде), приростом считается само значение.
+            gauges: Мгновенные значения, пишутся как есть
+            total_series: Ряд, в который пишется сумма приростов всех счётчиков среза
+
+        Returns:
+            Dict с записанными приростами по счётчикам
+        """
+        deltas = {}
+        points = []
+        with self._lock:
+            cur = self._conn.cursor()
+            for series, value in (counters or {}).items():
+                row = cur.execute(
+                    "SELECT last_value FROM counters WHERE series = ?", (series,)
+                ).fetchone()
+                cur.execute(
+                    "INSERT OR REPLACE INTO counters (series, last_value, ts) VALUES (?, ?, ?)",
+                    (series, value, ts)
+                )
+                if row is None:
+                    # Первое наблюдение — базовая точка, прироста ещё нет
+                    continue
+                delta = value - row[0] if value >= row[0] else value
+                deltas[series] = delta
+                points.append((series, ts, delta))
+
+            if total_series and deltas:
+                points.append((total_series, ts, sum(deltas.values())))
+            points.extend((series, ts, value) for series, value in (gauges or {}).items())
+
+            cur.executemany(
+                "INSERT OR REPLACE INTO samples (series, ts, value) VALUES (?, ?, ?)",
+                points
+            )
+            for level in ROLLUP_LEVELS:
+                cur.executemany(
+                    f"INSERT INTO {level.table} (series, bucket, count, sum, min, max, last) "
+                    "VALUES (?, ?, 1, ?, ?, ?, ?) "
+                    "ON CONFLICT (series, bucket) DO UPDATE SET "
+                    "count = count + 1, sum = sum + excluded.sum, "
+                    "min = MIN(min, excluded.min), max = MAX(max, excluded.max), last = excluded.last",
+                    [(series, t - t % level.bucket, value, value, value, value) for series, t, value in points]
+                )
+            self._conn.commit()
+            self.generation += 1
+            self._writes += 1
+            need_prune = self._writes % _PRUNE_EVERY == 0
+
+        if need_prune:
+            self.prune()
+        return deltas
+
+    def set_labels(self, labels: Dict[str, str]):
+        """Сохранить человекочитаемые подписи рядов (например, имя ноды)"""
+        if not labels:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO series_labels (series, label) VALUES (?, ?)",
+                list(labels.items())
+            )
+            self._conn.commit()
+
+    def prune(self, now: Optional[int] = None) -> int:
+        """Удалить точки старше срока хранения своего уровня"""
+        now = int(now or time.time())
+        removed = 0
+        with self._lock:
+            for level in LEVELS:
+                column = "ts" if level is LEVELS[0] else "bucket"
+                cur = self._conn.execute(
+                    f"DELETE FROM {level.table} WHERE {column} < ?", (now - level.retention,)
+                )
+                removed += cur.rowcount
+            self._conn.commit()
+        if removed:
+            logger.debug(f"Pruned {removed} metric rows")
+        return removed
+
+    # ---------- Чтение ----------
+
+    @staticmethod
+    def _level_columns(level: Level) -> Tuple[str, Dict[str, str]]:
+        """Колонка времени и колонки агрегатов для таблицы уровня"""
+        if level is LEVELS[0]:
+            return "ts", {"sum": "value", "count": "1", "min": "value", "max": "value"}
+        return "bucket", {"sum": "sum", "count": "count", "min": "min", "max": "max"}
+
+    def query_series(self, series: str, start: int, end: int,
+                     max_points: int = DEFAULT_MAX_POINTS, agg: str = "sum") -> List[Tuple[int, float]]:
+        """Точки ряда в интервале [start, end), не больше max_points
+
+        Args:
+            series: Имя ряда
+            start, end: Границы окна (Unix-время)
+            max_points: Максимум точек в ответе
+            agg: Как сворачивать точки внутри шага: sum / avg / min / max
+
+        Returns:
+            Список (начало шага, значение)
+        """
+        level = plan_level(start, end, max_points)
+        time_col, cols = self._level_columns(level)
+        step = max(level.bucket, (end - start) // max(1, max_points))
+        expression = _AGGREGATES[agg].format(**cols)
+
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT ({time_col} / ?) * ? AS point, {expression} FROM {level.table} "
+                f"WHERE series = ? AND {time_col} >= ? AND {time_col} < ? "
+                "GROUP BY point ORDER BY point",
+                (step, step, series, start, end)
+            ).fetchall()
+
+    def query_range(self, series: str, start: int, end: int) -> List[Tuple[int, float]]:
+        """Сырые точки ряда в интервале [start, end)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ts, value FROM samples WHERE series = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (series, start, end)
+            ).fetchall()
+
+    def sum_range(self, series: str, start: int, end: int) -> float:
+        """Сумма значений ряда в интервале [start, end) (точность — одна корзина уровня)"""
+        level = plan_level(start, end)
+        time_col, cols = self._level_columns(level)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COALESCE(SUM({cols['sum']}), 0) FROM {level.table} "
+                f"WHERE series = ? AND {time_col} >= ? AND {time_col} < ?",
+                (series, start, end)
+            ).fetchone()
+        return row[0]
+
+    def sum_by_prefix(self, prefix: str, suffix: str, start: int, end: int) -> Dict[str, float]:
+        """Суммы по всем рядам вида '{prefix}*{suffix}' в интервале [start, end)"""
+        level = plan_level(start, end)
+        time_col, cols = self._level_columns(level)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT series, SUM({cols['sum']}) FROM {level.table} "
+                f"WHERE series >= ? AND series < ? AND {time_col} >= ? AND {time_col} < ? GROUP BY series",
+                (prefix, prefix + "\uffff", start, end)
+            ).fetchall()
+        return {series: total for series, total in rows if series.endswith(suffix)}
+
+    def last_value(self, series: str) -> Optional[Tuple[int, float]]:
+        """Последняя точка ряда"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ts, value FROM samples WHERE series = ? ORDER BY ts DESC LIMIT 1",
+                (series,)
+            ).fetchone()
+            if row is None:
+                # Сырые точки уже вытеснены — берём последнее значение из дневных агрегатов
+                row = self._conn.execute(
+                    f"SELECT bucket, last FROM {LEVELS[-1].table} WHERE series = ? ORDER BY bucket DESC LIMIT 1",
+                    (series,)
+                ).fetchone()
+        return row
+
+    def first_ts(self, series: str) -> Optional[int]:
+        """Время самой старой сохранённой точки ряда на любом уровне"""
+        oldest = None
+        with self._lock:
+            for level in LEVELS:
+                time_col, _ = self._level_columns(level)
+                row = self._conn.execute(
+                    f"SELECT MIN({time_col}) FROM {level.table} WHERE series = ?", (series,)
+                ).fetchone()
+                if row and row[0] is not None:
+                    oldest = row[0] if oldest is None else min(oldest, row[0])
+        return oldest
+
+    def labels(self, series: Iterable[str]) -> Dict[str, str]:
+        """Подписи для набора рядов"""
+        series = list(series)
+        if not series:
+            return {}
+        placeholders = ",".join("?" * len(series))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT series, label FROM series_labels WHERE series IN ({placeholders})",
+                series
+            ).fetchall()
+        return dict(rows)
+
+
+_store: Optional[MetricsStore] = None
+
+
+def get_metrics_store() -> MetricsStore:
+    """Общий экземпляр хранилища метрик"""
+    global _store
+    if _store is None:
+        _store = MetricsStore()
+    return _store
+
+
+def close_metrics_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,263 @@
+"""
+Наблюдатель за нодами
+
+Один фоновый опрос /nodes на всех администраторов: сравнивает isConnected,
+isDisabled и версию xray с предыдущим подтверждённым состоянием и после
+debounce (N опросов подряд) рассылает события подписанным администраторам.
+Последний список нод публикуется в общий кэш, который читают экраны нод.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from modules.config import ADMIN_USER_IDS, DATA_DIR, NODE_WATCH_INTERVAL, NODE_WATCH_DEBOUNCE
+from modules.api.client import RemnaAPI
+from modules.api.nodes import get_all_nodes
+
+logger = logging.getLogger(__name__)
+
+# Отслеживаемые поля ноды и типы событий при их изменении
+_WATCHED_FIELDS = {
+    "isConnected": ("down", "up"),
+    "isDisabled": ("enabled", "disabled"),
+    "xrayVersion": ("xray_version", "xray_version"),
+}
+
+_EVENT_TEXTS = {
+    "down": "🔴 **Нода отключилась**",
+    "up": "🟢 **Нода снова в сети**",
+    "disabled": "⏸️ **Нода выключена**",
+    "enabled": "▶️ **Нода включена**",
+    "xray_version": "🔄 **Обновлена версия Xray**",
+}
+
+_MUTED_FILE = os.path.join(DATA_DIR, "node_watch_muted.json")
+
+
+class NodeEvent(NamedTuple):
+    """Подтверждённое изменение состояния ноды или панели"""
+    kind: str
+    node: Dict
+    old_value: object
+    new_value: object
+
+
+NodeListener = Callable[[NodeEvent], Awaitable[None]]
+
+
+class NodeWatcher:
+    """Единый опрос нод с debounce и общим кэшем списка"""
+
+    def __init__(self, bot: Optional[Bot] = None, interval: int = NODE_WATCH_INTERVAL,
+                 debounce: int = NODE_WATCH_DEBOUNCE):
+        self.bot = bot
+        self.interval = max(10, interval)
+        self.debounce = max(1, debounce)
+        self.nodes: List[Dict] = []
+        self.updated_at: Optional[float] = None
+        self.panel_available = True
+        self._confirmed: Dict[Tuple[str, str], object] = {}
+        self._pending: Dict[Tuple[str, str], Tuple[object, int]] = {}
+        self._panel_failures = 0
+        self._listeners: List[NodeListener] = []
+        self._muted: Set[int] = self._load_muted()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- Подписки администраторов ----------
+
+    @staticmethod
+    def _load_muted() -> Set[int]:
+        try:
+            with open(_MUTED_FILE, "r", encoding="utf-8") as f:
+                return set(json.load(f))
+        except FileNotFoundError:
+            return set()
+        except Exception as e:
+            logger.error(f"Error loading node watch subscriptions: {e}")
+            return set()
+
+    def _save_muted(self):
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(_MUTED_FILE, "w", encoding="utf-8") as f:
+                json.dump(sorted(self._muted), f)
+        except Exception as e:
+            logger.error(f"Error saving node watch subscriptions: {e}")
+
+    def is_subscribed(self, admin_id: int) -> bool:
+        return admin_id not in self._muted
+
+    def toggle_subscription(self, admin_id: int) -> bool:
+        """Переключить подписку администратора, вернуть новое состояние"""
+        if admin_id in self._muted:
+            self._muted.discard(admin_id)
+        else:
+            self._muted.add(admin_id)
+        self._save_muted()
+        return self.is_subscribed(admin_id)
+
+    def subscribe(self, listener: NodeListener):
+        """Подписать внутренний обработчик (например, движок алертов) на события"""
+        self._listeners.append(listener)
+
+    # ---------- Жизненный цикл ----------
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="node-watcher")
+            logger.info(f"Node watcher started (interval {self.interval}s, debounce {self.debounce})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Node watcher stopped")
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error polling nodes: {e}")
+            await asyncio.sleep(self.interval)
+
+    # ---------- Опрос ----------
+
+    def publish(self, nodes: List[Dict]):
+        """Положить свежий список нод в общий кэш"""
+        self.nodes = nodes
+        self.updated_at = time.time()
+
+    async def poll(self):
+        data = await RemnaAPI.get("nodes")
+        if data is None:
+            self._panel_failures += 1
+            if self.panel_available and self._panel_failures >= self.debounce:
+                self.panel_available = False
+                await self._dispatch(NodeEvent("panel_down", {}, True, False))
+            return
+
+        self._panel_failures = 0
+        if not self.panel_available:
+            self.panel_available = True
+            await self._dispatch(NodeEvent("panel_up", {}, False, True))
+
+        nodes = data.get('response', data) if isinstance(data, dict) else data
+        if not isinstance(nodes, list):
+            logger.error(f"Node watcher: unexpected /nodes response: {type(nodes)}")
+            return
+        self.publish(nodes)
+
+        for node in nodes:
+            uuid = node.get('uuid')
+            for field, (falsy_kind, truthy_kind) in _WATCHED_FIELDS.items():
+                event = self._observe((uuid, field), node.get(field))
+                if event is not None:
+                    old, new = event
+                    if field == "xrayVersion" and not (old and new):
+                        # Версия пропадает у отключённой ноды — это не обновление
+                        continue
+                    kind = truthy_kind if new else falsy_kind
+                    await self._dispatch(NodeEvent(kind, node, old, new))
+
+    def _observe(self, key: Tuple[str, str], value) -> Optional[Tuple[object, object]]:
+        """Учесть наблюдение; вернуть (старое, новое), когда изменение подтверждено debounce-ом"""
+        if key not in self._confirmed:
+            # Первое наблюдение — просто запоминаем состояние
+            self._confirmed[key] = value
+            return None
+
+        confirmed = self._confirmed[key]
+        if value == confirmed:
+            self._pending.pop(key, None)
+            return None
+
+        candidate, count = self._pending.get(key, (value, 0))
+        count = count + 1 if candidate == value else 1
+        if count < self.debounce:
+            self._pending[key] = (value, count)
+            return None
+
+        self._pending.pop(key, None)
+        self._confirmed[key] = value
+        return confirmed, value
+
+    async def _dispatch(self, event: NodeEvent):
+        logger.info(f"Node watcher event: {event.kind} {event.node.get('name', '')}")
+        for listener in self._listeners:
+            try:
+                await listener(event)
+            except Exception as e:
+                logger.error(f"Node watcher listener {listener} failed: {e}")
+
+        if event.kind in _EVENT_TEXTS:
+            await self._notify_admins(event)
+
+    async def _notify_admins(self, event: NodeEvent):
+        if self.bot is None:
+            return
+        node = event.node
+        text = f"{_EVENT_TEXTS[event.kind]}\n\n`{node.get('name', node.get('uuid'))}`"
+        if node.get('address'):
+            text += f" ({node['address']})"
+        if event.kind == "xray_version":
+            text += f"\n{event.old_value or '—'} → {event.new_value or '—'}"
+        elif event.kind == "down" and node.get('lastStatusMessage'):
+            # Сообщение ноды произвольное — убираем символы разметки
+            status_message = str(node['lastStatusMessage'])
+            for char in "*_`[":
+                status_message = status_message.replace(char, "")
+            text += f"\n{status_message[:200]}"
+
+        for admin_id in ADMIN_USER_IDS:
+            if not self.is_subscribed(admin_id):
+                continue
+            try:
+                await self.bot.send_message(admin_id, text)
+            except Exception as e:
+                logger.error(f"Failed to send node event to {admin_id}: {e}")
+
+
+_watcher: Optional[NodeWatcher] = None
+
+
+def get_node_watcher() -> NodeWatcher:
+    """Общий экземпляр наблюдателя за нодами"""
+    global _watcher
+    if _watcher is None:
+        _watcher = NodeWatcher()
+    return _watcher
+
+
+def invalidate_nodes_cache():
+    """Пометить кэш нод устаревшим (после действий с нодами из бота)"""
+    if _watcher is not None:
+        _watcher.updated_at = None
+
+
+async def get_nodes_cached() -> List[Dict]:
+    """Список нод из общего кэша наблюдателя или свежий запрос, если кэш устарел"""
+    watcher = get_node_watcher()
+    max_age = watcher.interval * 2
+    if watcher.updated_at is not None and time.time() - watcher.updated_at < max_age:
+        return list(watcher.nodes)
+
+    nodes = await get_all_nodes()
+    if nodes:
+        watcher.publish(nodes)
+    return nodes
@@ -0,0 +1,152 @@
+"""
+Откат массовых изменений пользователей
+
+Перед выполнением задачи, которая меняет поля пользователей (bulk update,
+продление, смена inbound'ов), прежние значения этих полей берутся из снимка
+пользователей за один проход и сохраняются в журнал задач. Хранятся они
+сгруппированными: пользователи с одинаковыми прежними значениями лежат одной
+записью (поля → список UUID), весь набор сжат zlib.
+
+Откат — отдельная задача того же журнала: группы превращаются в запросы
+/users/bulk/update (и /users/bulk/update-inbounds для inbound'ов), поэтому
+10 000 пользователей с общей прежней датой возвращаются парой запросов.
+Уникальные значения уходят поштучно с ограниченным параллелизмом.
+Откатываются только пользователи из уже выполненных шагов задачи.
+"""
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.config import BULK_CHUNK_SIZE
+from modules.services.bulk_planner import UpdatePlan, run_update_step
+from modules.services.durable_jobs import Step, register_job_kind
+from modules.services.job_journal import STEP_DONE, StepRecord, get_job_journal
+from modules.services.jobs import Job
+from modules.services.user_pages import get_user_pager
+from modules.services.user_snapshot import get_user_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Поле снимка с inbound'ами пользователя; откатывается через update-inbounds
+INBOUNDS_FIELD = "activeUserInbounds"
+
+
+def changed_fields(steps: Iterable[Step]) -> Iterable[Tuple[str, List[str]]]:
+    """(UUID, изменяемые поля) по шагам задачи"""
+    for payload, _ in steps:
+        op = payload.get("op")
+        if op == "bulk_update":
+            for uuid in payload["uuids"]:
+                yield uuid, list(payload["fields"])
+        elif op == "update":
+            for uuid, fields in payload["changes"]:
+                yield uuid, list(fields)
+        elif op == "update_inbounds":
+            for uuid in payload["uuids"]:
+                yield uuid, [INBOUNDS_FIELD]
+
+
+def user_inbound_uuids(user: Dict) -> List[str]:
+    return sorted(
+        inbound.get('uuid') if isinstance(inbound, dict) else inbound
+        for inbound in user.get(INBOUNDS_FIELD) or []
+    )
+
+
+async def capture(steps: List[Step]) -> Optional[bytes]:
+    """Прежние значения полей, которые изменят шаги, в сжатом виде
+
+    Returns:
+        Данные для отката или None, если изменять нечего или снимок недоступен
+    """
+    snapshot = get_user_snapshot()
+    if not await snapshot.ensure_fresh():
+        logger.warning("Rollback capture skipped: user snapshot is not available")
+        return None
+
+    fields_plan = UpdatePlan()
+    inbound_groups: Dict[Tuple[str, ...], List[str]] = {}
+    skipped = 0
+    for uuid, fields in changed_fields(steps):
+        user = snapshot.users.get(uuid)
+        if user is None:
+            skipped += 1
+            continue
+        previous = {field: user.get(field) for field in fields if field != INBOUNDS_FIELD}
+        if previous:
+            fields_plan.add(uuid, previous)
+        if INBOUNDS_FIELD in fields:
+            inbound_groups.setdefault(tuple(user_inbound_uuids(user)), []).append(uuid)
+
+    if not fields_plan.users and not inbound_groups:
+        return None
+    if skipped:
+        logger.warning(f"Rollback capture: {skipped} users are missing from the snapshot")
+
+    data = {
+        "fields": fields_plan.groups(),
+        "inbounds": [[list(inbounds), uuids] for inbounds, uuids in inbound_groups.items()],
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+
+def _completed_users(steps: List[StepRecord]) -> set:
+    return {uuid for step in steps if step.state == STEP_DONE for uuid, _ in changed_fields([(step.payload, step.count)])}
+
+
+def restore_steps(data: bytes, completed: set) -> List[Step]:
+    """Шаги отката для пользователей из completed"""
+    data = json.loads(zlib.decompress(data))
+
+    plan = UpdatePlan()
+    for fields, uuids in data["fields"]:
+        for uuid in uuids:
+            if uuid in completed:
+                plan.add(uuid, fields)
+    steps = plan.steps()
+
+    for inbounds, uuids in data["inbounds"]:
+        uuids = [uuid for uuid in uuids if uuid in completed]
+        for start in range(0, len(uuids), BULK_CHUNK_SIZE):
+            chunk = uuids[start:start + BULK_CHUNK_SIZE]
+            steps.append(({"op": "update_inbounds", "uuids": chunk, "inbounds": inbounds}, len(chunk)))
+    return steps
+
+
+# ================ ЗАДАЧА ОТКАТА ================
+
+async def _plan_rollback(job: Job, params: Dict[str, Any]) -> List[Step]:
+    journal = get_job_journal()
+    source = params["job_id"]
+    data = await asyncio.to_thread(journal.get_rollback, source)
+    if data is None:
+        return []
+    completed = _completed_users(await asyncio.to_thread(journal.steps, source))
+    return restore_steps(data, completed)
+
+
+async def _rollback_step(payload: Dict[str, Any], progress) -> Tuple[int, int]:
+    return await run_update_step(payload, progress=progress)
+
+
+def _rollback_summary(params: Dict[str, Any], steps: List[StepRecord]) -> str:
+    if not steps:
+        return "ℹ️ Нечего откатывать: задача не успела изменить пользователей"
+    restored = sum(step.succeeded for step in steps)
+    failed = sum(step.failed for step in steps)
+    message = f"✅ **Изменения задачи #{params['job_id']} отменены**\n\n"
+    message += f"• Восстановлено пользователей: {restored}\n"
+    if failed:
+        message += f"• Ошибок: {failed}\n"
+    requests = sum(step.count if step.payload["op"] == "update" else 1 for step in steps)
+    message += f"• Запросов к панели: {requests}"
+    return message
+
+
+register_job_kind(
+    "rollback", "↩️ Восстанавливаю прежние значения...",
+    _plan_rollback, _rollback_step, _rollback_summary,
+    after=lambda: get_user_pager().invalidate()
+)
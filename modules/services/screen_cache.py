@@ -0,0 +1,103 @@
+"""
+Общий кэш экранов статистики
+
+Экраны статистики одинаковы для всех администраторов, поэтому готовые текст и
+клавиатура хранятся по ключу (экран, параметры, поколение данных). Поколение
+берётся у источника данных: снимка пользователей, наблюдателя за нодами или
+счётчика правок, который обработчики увеличивают после изменений из бота.
+Если экран запросили одновременно несколько администраторов, он считается
+один раз, остальные ждут ту же задачу. Данные без ленты изменений (аптайм
+панели, трафик за сутки) обновляются не реже раза в SCREEN_CACHE_TTL секунд.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from aiogram import types
+
+from modules.config import SCREEN_CACHE_TTL
+from modules.api.users import get_all_users
+from modules.services.node_watcher import get_node_watcher
+from modules.services.user_snapshot import get_user_snapshot
+from modules.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+Screen = Tuple[str, types.InlineKeyboardMarkup]
+Render = Callable[[], Awaitable[Optional[Screen]]]
+
+
+class ScreenCache:
+    """Готовые экраны с однократным вычислением на ключ"""
+
+    def __init__(self, ttl: float = SCREEN_CACHE_TTL):
+        self._screens = TTLCache(ttl=ttl, max_size=128)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._versions: Dict[str, int] = {}
+
+    def version(self, source: str) -> int:
+        """Счётчик правок источника данных без собственного поколения"""
+        return self._versions.get(source, 0)
+
+    def bump(self, *sources: str):
+        """Отметить изменение данных из бота (хосты, inbound'ы)"""
+        for source in sources:
+            self._versions[source] = self._versions.get(source, 0) + 1
+
+    def is_cached(self, key: Hashable) -> bool:
+        return key in self._screens
+
+    async def get(self, key: Hashable, render: Render) -> Optional[Screen]:
+        """Экран из кэша или результат render(); None не кэшируется"""
+        screen = self._screens.get(key)
+        if screen is not None:
+            return screen
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key, render), name=f"screen-{key[0]}")
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: администратор, ушедший с экрана, не отменяет расчёт для остальных
+        return await asyncio.shield(task)
+
+    async def _render(self, key: Hashable, render: Render) -> Optional[Screen]:
+        screen = await render()
+        if screen is not None:
+            self._screens.set(key, screen)
+            logger.debug(f"Screen {key} rendered")
+        return screen
+
+
+def screen_key(screen: str, *params: Hashable, generation: Hashable = None) -> Hashable:
+    return screen, params, generation
+
+
+def users_generation() -> Optional[int]:
+    """Поколение снимка пользователей; None, пока снимок не загружен"""
+    snapshot = get_user_snapshot()
+    return snapshot.generation if snapshot.is_ready else None
+
+
+def nodes_generation() -> Optional[float]:
+    """Время последнего опроса нод наблюдателем"""
+    return get_node_watcher().updated_at
+
+
+async def get_users_cached() -> List[Dict]:
+    """Пользователи из снимка (согласованы с users_generation) или свежая выгрузка"""
+    snapshot = get_user_snapshot()
+    if snapshot.is_ready:
+        return list(snapshot.users.values())
+    return await get_all_users() or []
+
+
+_cache: Optional[ScreenCache] = None
+
+
+def get_screen_cache() -> ScreenCache:
+    """Общий для всех администраторов кэш экранов"""
+    global _cache
+    if _cache is None:
+        _cache = ScreenCache()
+    return _cache
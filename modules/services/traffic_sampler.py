@@ -0,0 +1,120 @@
+"""
+Фоновый сборщик трафика: периодически опрашивает /nodes/usage/realtime
+и /system/stats/bandwidth и пишет срезы в локальное хранилище метрик.
+
+Ряды:
+    node:{uuid}:traffic   — прирост трафика ноды за интервал (байты)
+    node:{uuid}:speed     — суммарная скорость ноды (байт/с)
+    panel:traffic         — прирост трафика по всем нодам за интервал
+    panel:bw:{period}     — собственные цифры панели (7d / 30d / month / year)
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from modules.config import METRICS_SAMPLE_INTERVAL
+from modules.api.nodes import get_nodes_usage_realtime
+from modules.api.system import SystemAPI
+from modules.services.metrics_store import get_metrics_store
+from modules.utils.formatters_aiogram import parse_bytes
+
+logger = logging.getLogger(__name__)
+
+# Соответствие полей ответа /system/stats/bandwidth и коротких имён рядов
+BANDWIDTH_PERIODS = {
+    "bandwidthLastSevenDays": "7d",
+    "bandwidthLast30Days": "30d",
+    "bandwidthCalendarMonth": "month",
+    "bandwidthCurrentYear": "year",
+}
+
+
+def node_traffic_series(node_uuid: str) -> str:
+    return f"node:{node_uuid}:traffic"
+
+
+def node_speed_series(node_uuid: str) -> str:
+    return f"node:{node_uuid}:speed"
+
+
+PANEL_TRAFFIC_SERIES = "panel:traffic"
+
+
+class TrafficSampler:
+    """Периодический опрос панели с записью в MetricsStore"""
+
+    def __init__(self, interval: int = METRICS_SAMPLE_INTERVAL):
+        self.interval = max(10, interval)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="traffic-sampler")
+            logger.info(f"Traffic sampler started (interval {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Traffic sampler stopped")
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.sample_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sampling traffic: {e}")
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(1.0, self.interval - elapsed))
+
+    async def sample_once(self):
+        """Снять один срез и записать его в хранилище"""
+        usage, bandwidth = await asyncio.gather(
+            get_nodes_usage_realtime(),
+            SystemAPI.get_bandwidth_stats(),
+        )
+        ts = int(time.time())
+
+        counters = {}
+        gauges = {}
+        labels = {}
+
+        for node in usage or []:
+            node_uuid = node.get('nodeUuid')
+            if not node_uuid:
+                continue
+            counters[node_traffic_series(node_uuid)] = float(node.get('totalBytes', 0) or 0)
+            gauges[node_speed_series(node_uuid)] = float(node.get('totalSpeedBps', 0) or 0)
+            if node.get('nodeName'):
+                labels[node_traffic_series(node_uuid)] = node['nodeName']
+
+        if isinstance(bandwidth, dict) and 'response' in bandwidth:
+            bandwidth = bandwidth['response']
+        if isinstance(bandwidth, dict):
+            for field, period in BANDWIDTH_PERIODS.items():
+                data = bandwidth.get(field)
+                if isinstance(data, dict) and data.get('current') is not None:
+                    gauges[f"panel:bw:{period}"] = float(parse_bytes(data['current']))
+                    gauges[f"panel:bw:{period}:prev"] = float(parse_bytes(data.get('previous')))
+
+        if not counters and not gauges:
+            logger.debug("Traffic sampler: nothing to record")
+            return
+
+        store = get_metrics_store()
+
+        def _write():
+            store.set_labels(labels)
+            # Суммарный прирост пишем отдельным рядом, чтобы не сканировать все ноды;
+            # весь срез — одна запись, чтобы поколение хранилища росло раз за опрос
+            store.record(ts, counters=counters, gauges=gauges, total_series=PANEL_TRAFFIC_SERIES)
+
+        await asyncio.to_thread(_write)
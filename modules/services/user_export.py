@@ -0,0 +1,114 @@
+"""
+Выгрузка пользователей в файл
+
+Пользователи читаются у панели страницами и сразу дописываются в файл,
+поэтому память не зависит от числа пользователей. Готовый файл лежит во
+временном каталоге, пока его не отправят администратору.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.services.user_pages import iter_user_pages
+from modules.utils.export_writers import EXPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    "uuid", "shortUuid", "username", "status", "usedTrafficBytes", "trafficLimitBytes",
+    "trafficLimitStrategy", "expireAt", "createdAt", "lastTrafficResetAt",
+    "telegramId", "email", "description", "tag",
+]
+
+UserFilter = Callable[[Dict, datetime], bool]
+
+
+def _expire_at(user: Dict) -> Optional[datetime]:
+    value = user.get('expireAt')
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_expiring(user: Dict, now: datetime) -> bool:
+    expire_at = _expire_at(user)
+    return expire_at is not None and now < expire_at < now + timedelta(days=7)
+
+
+def _is_expired(user: Dict, now: datetime) -> bool:
+    expire_at = _expire_at(user)
+    return expire_at is not None and expire_at < now
+
+
+# Категория → (название, фильтр по пользователю и текущему времени)
+EXPORT_CATEGORIES: Dict[str, Tuple[str, Optional[UserFilter]]] = {
+    "all_users": ("Все пользователи", None),
+    "active_users": ("Активные пользователи", lambda user, now: user.get('status') == 'ACTIVE'),
+    "expiring_users": ("Истекающие пользователи", _is_expiring),
+    "expired_users": ("Истекшие пользователи", _is_expired),
+}
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class ExportResult(NamedTuple):
+    path: str
+    filename: str
+    rows: int
+    size: int
+
+
+class ExportError(Exception):
+    """Выгрузку не удалось завершить"""
+
+
+async def export_users(category: str, fmt: str, compress: bool = False,
+                       progress: Optional[ProgressCallback] = None) -> ExportResult:
+    """Выгрузить пользователей категории в файл формата fmt (csv, ndjson, xlsx)
+
+    Файл нужно удалить после отправки.
+
+    Raises:
+        ExportError: формат или категория не поддерживаются
+        UsersPageError: панель не вернула страницу пользователей
+    """
+    if fmt not in EXPORT_FORMATS or category not in EXPORT_CATEGORIES:
+        raise ExportError(f"unsupported export {category}/{fmt}")
+    writer_class = EXPORT_FORMATS[fmt]
+    compress = compress and fmt != "xlsx"
+    _, user_filter = EXPORT_CATEGORIES[category]
+
+    filename = f"{category}_{datetime.now().strftime('%Y%m%d_%H%M')}.{writer_class.extension}"
+    if compress:
+        filename += ".gz"
+    fd, path = tempfile.mkstemp(prefix="remna_export_", suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+
+    try:
+        now = datetime.now(timezone.utc)
+        with writer_class(path, EXPORT_COLUMNS, compress=compress) as writer:
+            async for users, done, total in iter_user_pages():
+                rows: List[Dict] = users if user_filter is None else [u for u in users if user_filter(u, now)]
+                # Запись страницы — синхронный дисковый I/O, не держим им event loop
+                await asyncio.to_thread(writer.write_rows, rows)
+                if progress is not None:
+                    await progress(done, total)
+        result = ExportResult(path, filename, writer.rows, os.path.getsize(path))
+        logger.info(f"Exported {result.rows} users ({category}, {fmt}) to {path}: {result.size} bytes")
+        return result
+    except BaseException:
+        remove_export(path)
+        raise
+
+
+def remove_export(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Could not remove export file {path}: {e}")
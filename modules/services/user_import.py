@@ -0,0 +1,316 @@
+"""
+Массовый импорт пользователей
+
+Источник — файл CSV, JSON или NDJSON или «N пользователей по шаблону».
+Читаются колонки username, trafficLimitBytes, trafficLimitStrategy,
+hwidDeviceLimit, expireAt или expireDays, telegramId, email, description и
+tag; файл выгрузки подходит без правок, остальные его колонки (uuid,
+usedTrafficBytes, даты создания и сброса) пропускаются. Недостающие поля
+берутся из шаблона modules/utils/presets.USER_TEMPLATES.
+
+Строки проверяются одним потоковым проходом: CSV и NDJSON читаются построчно,
+имена сверяются с локальным снимком пользователей и между собой, ошибочные
+строки сразу отбрасываются с причиной. Проверенные пользователи создаются
+через run_bounded — с ограниченным параллелизмом и повтором при ошибке.
+Итог — CSV по каждой строке источника со ссылками на подписку; при отмене
+он пишется по тем, кого успели создать.
+"""
+import csv
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from modules.api.executor import TaskResult, run_bounded
+from modules.api.users import create_user
+from modules.config import IMPORT_MAX_USERS
+from modules.services.user_snapshot import get_user_snapshot
+from modules.utils.export_writers import CsvWriter
+from modules.utils.presets import USER_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+IMPORT_EXTENSIONS = (".csv", ".json", ".ndjson", ".jsonl")
+
+RESULT_COLUMNS = ["line", "username", "status", "uuid", "subscriptionUrl", "error"]
+
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]{3,36}$')
+TRAFFIC_STRATEGIES = ("NO_RESET", "DAY", "WEEK", "MONTH")
+# Срок по умолчанию, если в строке нет expireAt/expireDays (как в apply_template_to_user_data)
+DEFAULT_EXPIRE_DAYS = 30
+
+# Поля шаблона, которые передаются панели при создании
+_TEMPLATE_FIELDS = ("trafficLimitBytes", "trafficLimitStrategy", "hwidDeviceLimit", "description")
+
+
+class ImportFileError(Exception):
+    """Источник импорта не удалось прочитать"""
+
+
+class ImportPlan(NamedTuple):
+    """Итог проверки: (строка, данные для панели) и отброшенные (строка, имя, причина)"""
+    users: List[Tuple[int, Dict[str, Any]]]
+    rejected: List[Tuple[int, str, str]]
+
+
+class ImportResult(NamedTuple):
+    path: str
+    filename: str
+    created: int
+    failed: int
+    rejected: int
+    # Не созданы, потому что импорт остановили раньше
+    remaining: int = 0
+
+
+class ImportInterrupted(Exception):
+    """Импорт остановлен до конца; файл результата по уже созданным записан в result"""
+
+    def __init__(self, result: ImportResult):
+        super().__init__(f"import interrupted, {result.remaining} users not created")
+        self.result = result
+
+
+# ---------- Источники ----------
+
+def read_rows(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Строки файла импорта: (номер строки, поля)
+
+    Raises:
+        ImportFileError: неподдерживаемый формат или битый файл
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == ".csv":
+            # utf-8-sig — файлы из Excel и нашей выгрузки начинаются с BOM
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    yield reader.line_num, row
+        elif extension in (".ndjson", ".jsonl"):
+            with open(path, encoding="utf-8-sig") as file:
+                for number, line in enumerate(file, 1):
+                    if line.strip():
+                        yield number, json.loads(line)
+        elif extension == ".json":
+            # Массив JSON целиком; для больших списков удобнее NDJSON
+            with open(path, encoding="utf-8-sig") as file:
+                data = json.load(file)
+            if isinstance(data, dict):
+                data = data.get("users", [])
+            for number, row in enumerate(data, 1):
+                yield number, row
+        else:
+            raise ImportFileError(f"unsupported import file {extension}")
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise ImportFileError(f"cannot read {os.path.basename(path)}: {e}")
+
+
+def template_rows(count: int, prefix: str, taken: Set[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """count строк с именами prefix0001, prefix0002...; занятые имена пропускаются"""
+    width = max(4, len(str(count)))
+    number = 0
+    for line in range(1, count + 1):
+        while True:
+            number += 1
+            username = f"{prefix}{number:0{width}d}"
+            if username.lower() not in taken:
+                break
+        yield line, {"username": username}
+
+
+# ---------- Проверка ----------
+
+def _int_field(row: Dict[str, Any], *names: str) -> Optional[int]:
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            number = int(value)
+            if number < 0:
+                raise ValueError(f"{name} < 0")
+            return number
+    return None
+
+
+def build_user(row: Dict[str, Any], template: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Данные для POST /users из строки источника и шаблона
+
+    Raises:
+        ValueError: строка некорректна (текст — причина для файла результата)
+    """
+    if not isinstance(row, dict):
+        raise ValueError("строка не является объектом")
+    username = str(row.get("username") or "").strip()
+    if not USERNAME_PATTERN.match(username):
+        raise ValueError("имя: 3-36 символов, латиница, цифры, _ и -")
+
+    user = {field: template[field] for field in _TEMPLATE_FIELDS if field in template}
+    user["username"] = username
+
+    try:
+        traffic = _int_field(row, "trafficLimitBytes", "trafficLimit")
+        devices = _int_field(row, "hwidDeviceLimit")
+        telegram_id = _int_field(row, "telegramId")
+        expire_days = _int_field(row, "expireDays")
+    except (TypeError, ValueError):
+        raise ValueError("числовые поля должны быть целыми неотрицательными числами")
+    if traffic is not None:
+        user["trafficLimitBytes"] = traffic
+    if devices is not None:
+        user["hwidDeviceLimit"] = devices
+    if telegram_id:
+        user["telegramId"] = telegram_id
+
+    strategy = str(row.get("trafficLimitStrategy") or "").strip().upper()
+    if strategy:
+        if strategy not in TRAFFIC_STRATEGIES:
+            raise ValueError(f"trafficLimitStrategy: одно из {', '.join(TRAFFIC_STRATEGIES)}")
+        user["trafficLimitStrategy"] = strategy
+
+    expire_at = str(row.get("expireAt") or "").strip()
+    if expire_at:
+        try:
+            expire = datetime.fromisoformat(expire_at.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError("expireAt: дата в формате ISO 8601")
+        if expire.tzinfo is None:
+            expire = expire.replace(tzinfo=timezone.utc)
+    else:
+        expire = now + timedelta(days=expire_days if expire_days is not None else DEFAULT_EXPIRE_DAYS)
+    user["expireAt"] = expire.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+    for field in ("email", "description", "tag"):
+        value = str(row.get(field) or "").strip()
+        if value:
+            user[field] = value
+    return user
+
+
+def plan_import(rows: Iterable[Tuple[int, Dict[str, Any]]], template_name: str, taken: Set[str],
+                limit: int = IMPORT_MAX_USERS) -> ImportPlan:
+    """Проверить строки одним проходом и отбросить ошибочные и повторяющиеся имена
+
+    Raises:
+        ImportFileError: файл не удалось дочитать
+    """
+    template = USER_TEMPLATES.get(template_name, {})
+    now = datetime.now(timezone.utc)
+    seen = set(taken)
+    users: List[Tuple[int, Dict[str, Any]]] = []
+    rejected: List[Tuple[int, str, str]] = []
+
+    for line, row in rows:
+        username = str(row.get("username") or "") if isinstance(row, dict) else ""
+        try:
+            user = build_user(row, template, now)
+        except ValueError as e:
+            rejected.append((line, username, str(e)))
+            continue
+        key = user["username"].lower()
+        if key in seen:
+            rejected.append((line, username, "имя уже занято"))
+            continue
+        if len(users) >= limit:
+            rejected.append((line, username, f"больше {limit} пользователей за один импорт"))
+            continue
+        seen.add(key)
+        users.append((line, user))
+
+    logger.info(f"Import validated: {len(users)} users to create, {len(rejected)} rejected")
+    return ImportPlan(users, rejected)
+
+
+def recheck_import(plan: ImportPlan, taken: Set[str]) -> ImportPlan:
+    """Отбросить имена, занятые после проверки (между предпросмотром и запуском)"""
+    users: List[Tuple[int, Dict[str, Any]]] = []
+    rejected = list(plan.rejected)
+    for line, user in plan.users:
+        if user["username"].lower() in taken:
+            rejected.append((line, user["username"], "имя уже занято"))
+        else:
+            users.append((line, user))
+    return ImportPlan(users, rejected)
+
+
+async def taken_usernames() -> Optional[Set[str]]:
+    """Имена существующих пользователей (в нижнем регистре) по актуальному снимку
+
+    Returns:
+        Множество имён или None, если снимок пользователей недоступен
+    """
+    snapshot = get_user_snapshot()
+    if not await snapshot.ensure_fresh():
+        return None
+    return {str(user.get("username", "")).lower() for user in snapshot.users.values()}
+
+
+# ---------- Создание ----------
+
+async def run_import(plan: ImportPlan, progress=None) -> ImportResult:
+    """Создать пользователей плана и записать файл результата
+
+    Файл нужно удалить после отправки (remove_export из user_export).
+
+    Raises:
+        ImportInterrupted: progress прервал импорт (отмена задачи); файл
+            результата по созданным до остановки всё равно записан
+    """
+    # Итог по номеру строки — сохраняется по мере ответов панели, а не в конце
+    outcomes: Dict[int, TaskResult] = {}
+
+    async def create(item: Tuple[int, Dict[str, Any]]):
+        line, user = item
+        result = await create_user(user)
+        attempts = outcomes[line].attempts + 1 if line in outcomes else 1
+        outcomes[line] = TaskResult(item, result, attempts)
+        return result
+
+    stopped: Optional[Exception] = None
+    try:
+        await run_bounded(plan.users, create, progress=progress)
+    except Exception as e:
+        stopped = e
+    # Снимок больше не содержит всех пользователей панели
+    get_user_snapshot().mark_stale()
+
+    filename = f"import_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+    fd, path = tempfile.mkstemp(prefix="remna_import_", suffix=".csv")
+    os.close(fd)
+
+    rows = []
+    created_count = failed_count = 0
+    for line, user in plan.users:
+        task = outcomes.get(line)
+        row = {"line": line, "username": user["username"]}
+        if task is None:
+            row.update(status="skipped", error="импорт остановлен до создания")
+        elif task.ok:
+            created = task.result if isinstance(task.result, dict) else {}
+            row.update(status="created", uuid=created.get("uuid", ""),
+                       subscriptionUrl=created.get("subscriptionUrl", ""))
+            created_count += 1
+        else:
+            row.update(status="failed", error=f"панель отклонила запрос ({task.attempts} попыт.)")
+            failed_count += 1
+        rows.append(row)
+    rows.extend(
+        {"line": line, "username": username, "status": "rejected", "error": reason}
+        for line, username, reason in plan.rejected
+    )
+    rows.sort(key=lambda row: row["line"])
+
+    with CsvWriter(path, RESULT_COLUMNS) as writer:
+        writer.write_rows(rows)
+
+    remaining = len(plan.users) - len(outcomes)
+    result = ImportResult(path, filename, created_count, failed_count, len(plan.rejected), remaining)
+    logger.info(
+        f"Import {'stopped' if stopped else 'finished'}: {result.created} created, {result.failed} failed, "
+        f"{result.rejected} rejected, {result.remaining} not started"
+    )
+    if stopped is not None:
+        raise ImportInterrupted(result) from stopped
+    return result
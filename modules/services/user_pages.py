@@ -0,0 +1,120 @@
+"""
+Постраничная загрузка списка пользователей
+
+Экран списка запрашивает у панели только нужное окно (start/size), общее
+количество приходит в том же ответе. После показа страницы следующая
+загружается в фоне, поэтому переход «вперёд» обычно не ждёт панель.
+Одинаковые запросы, пришедшие одновременно, выполняются один раз.
+"""
+import asyncio
+import itertools
+import logging
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.api.users import get_users_page
+from modules.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Сколько живёт загруженная страница; кнопка «Обновить» сбрасывает кэш сразу
+_PAGE_TTL = 60
+
+PageKey = Tuple[int, int]
+
+# Размер страницы при полном обходе пользователей (экспорт, массовые операции)
+SCAN_PAGE_SIZE = 500
+
+
+class UsersPageError(Exception):
+    """Панель не вернула страницу пользователей при полном обходе"""
+
+
+class Page(NamedTuple):
+    """Загруженная страница пользователей"""
+    users: List[Dict]
+    total: int
+    version: int    # меняется при каждой загрузке — ключ для кэша отрисованных страниц
+
+
+class UserPager:
+    """Кэш страниц пользователей с предзагрузкой следующей"""
+
+    def __init__(self, ttl: float = _PAGE_TTL):
+        self.generation = 0
+        self._pages = TTLCache(ttl=ttl, max_size=64)
+        self._inflight: Dict[PageKey, asyncio.Task] = {}
+        self._versions = itertools.count(1)
+
+    def invalidate(self):
+        """Сбросить загруженные страницы (после изменений или по «Обновить»)"""
+        self._pages.clear()
+        self.generation += 1
+
+    async def get_page(self, page: int, per_page: int) -> Optional[Page]:
+        """Пользователи страницы page и общее количество; None, если панель не ответила"""
+        key = (page * per_page, per_page)
+        result = self._pages.get(key)
+        if result is None:
+            result = await self._load(key)
+        if result is not None:
+            next_key = ((page + 1) * per_page, per_page)
+            if next_key[0] < result.total:
+                self._prefetch(next_key)
+        return result
+
+    def _task(self, key: PageKey) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, self.generation), name=f"users-page-{key}")
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(self, key: PageKey) -> Optional[Page]:
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(self._task(key))
+
+    def _prefetch(self, key: PageKey):
+        if self._pages.get(key) is None:
+            self._task(key)
+
+    async def _fetch(self, key: PageKey, generation: int) -> Optional[Page]:
+        loaded = await get_users_page(*key)
+        if loaded is None:
+            return None
+        result = Page(*loaded, version=next(self._versions))
+        # Ответ на запрос до invalidate() в кэш не кладём
+        if generation == self.generation:
+            self._pages.set(key, result)
+        return result
+
+
+_pager: Optional[UserPager] = None
+
+
+def get_user_pager() -> UserPager:
+    """Общий экземпляр постраничной загрузки пользователей"""
+    global _pager
+    if _pager is None:
+        _pager = UserPager()
+    return _pager
+
+
+async def iter_user_pages(page_size: int = SCAN_PAGE_SIZE) -> AsyncIterator[Tuple[List[Dict], int, int]]:
+    """Все пользователи панели страницами: (пользователи, прочитано, всего)
+
+    Raises:
+        UsersPageError: страница не загрузилась — обход неполный
+    """
+    start = 0
+    while True:
+        page = await get_users_page(start, page_size)
+        if page is None:
+            raise UsersPageError(f"panel did not return users page at offset {start}")
+        users, total = page
+        if not users:
+            return
+        start += len(users)
+        yield users, start, total
+        if start >= total:
+            return
@@ -0,0 +1,141 @@
+"""
+Локальный снимок пользователей панели
+
+Периодически выгружает всех пользователей, хранит их по UUID и вычисляет разницу
+с предыдущей синхронизацией. Подписчики (алерты, кэши экранов) получают только
+изменившиеся записи, а generation позволяет инвалидировать производные кэши.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.config import USER_SNAPSHOT_INTERVAL
+from modules.api.users import get_all_users
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotDiff(NamedTuple):
+    """Изменения между двумя синхронизациями"""
+    added: List[Dict]
+    changed: List[Tuple[Dict, Dict]]   # (старая запись, новая запись)
+    removed: List[Dict]
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+DiffListener = Callable[[SnapshotDiff], Awaitable[None]]
+
+
+class UserSnapshot:
+    """Снимок пользователей с инкрементальными диффами"""
+
+    def __init__(self, interval: int = USER_SNAPSHOT_INTERVAL):
+        self.interval = max(30, interval)
+        self.users: Dict[str, Dict] = {}
+        self.generation = 0
+        self.synced_at: Optional[float] = None
+        self._listeners: List[DiffListener] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock = asyncio.Lock()
+        self._stale = False
+
+    @property
+    def is_ready(self) -> bool:
+        return self.synced_at is not None
+
+    def mark_stale(self):
+        """Бот сам изменил пользователей — перед точным чтением снимок нужно перечитать"""
+        self._stale = True
+
+    async def ensure_fresh(self) -> bool:
+        """Синхронизировать снимок, если он не загружен или устарел после изменений из бота
+
+        Returns:
+            True, если снимок актуален
+        """
+        if not self.is_ready or self._stale:
+            await self.sync()
+        return self.is_ready and not self._stale
+
+    def subscribe(self, listener: DiffListener):
+        """Подписаться на диффы синхронизаций"""
+        self._listeners.append(listener)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="user-snapshot")
+            logger.info(f"User snapshot sync started (interval {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("User snapshot sync stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error syncing user snapshot: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sync(self) -> Optional[SnapshotDiff]:
+        """Выгрузить пользователей и применить дифф к снимку"""
+        async with self._sync_lock:
+            # Изменения, сделанные во время выгрузки, снова пометят снимок устаревшим
+            was_stale, self._stale = self._stale, False
+            users = await get_all_users()
+            if not users and self.users:
+                # Пустой ответ при непустом снимке почти наверняка ошибка панели
+                logger.warning("User snapshot: panel returned no users, keeping previous snapshot")
+                self._stale = self._stale or was_stale
+                return None
+
+            fresh = {user['uuid']: user for user in users or [] if user.get('uuid')}
+            diff = SnapshotDiff(
+                added=[user for uuid, user in fresh.items() if uuid not in self.users],
+                changed=[
+                    (self.users[uuid], user) for uuid, user in fresh.items()
+                    if uuid in self.users and self.users[uuid] != user
+                ],
+                removed=[user for uuid, user in self.users.items() if uuid not in fresh],
+            )
+
+            self.users = fresh
+            self.synced_at = time.time()
+            if diff:
+                self.generation += 1
+                logger.info(
+                    f"User snapshot: +{len(diff.added)} ~{len(diff.changed)} -{len(diff.removed)} "
+                    f"(generation {self.generation})"
+                )
+                await self._notify(diff)
+            return diff
+
+    async def _notify(self, diff: SnapshotDiff):
+        for listener in self._listeners:
+            try:
+                await listener(diff)
+            except Exception as e:
+                logger.error(f"User snapshot listener {listener} failed: {e}")
+
+
+_snapshot: Optional[UserSnapshot] = None
+
+
+def get_user_snapshot() -> UserSnapshot:
+    """Общий экземпляр снимка пользователей"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = UserSnapshot()
+    return _snapshot
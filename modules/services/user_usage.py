@@ -0,0 +1,84 @@
+"""
+История использования трафика пользователем (по дням и нодам)
+
+Данные берутся из /users/stats/usage/{uuid}/range. Завершённые дни окна кэшируются
+по ключу (uuid, окно, дата), а текущий день догружается отдельным коротким запросом
+со своим TTL — повторное открытие экрана не делает запросов к панели.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from modules.config import USER_USAGE_CACHE_TTL, USER_USAGE_TODAY_TTL
+from modules.api.users import get_user_usage_range
+from modules.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Доступные окна истории (в днях)
+USAGE_WINDOWS = (7, 14, 30)
+DEFAULT_USAGE_WINDOW = 7
+
+_history_cache = TTLCache(ttl=USER_USAGE_CACHE_TTL, max_size=512)
+_today_cache = TTLCache(ttl=USER_USAGE_TODAY_TTL, max_size=512)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+async def _fetch(user_uuid: str, start: datetime, end: datetime) -> Optional[List[Dict]]:
+    return await get_user_usage_range(user_uuid, _iso(start), _iso(end))
+
+
+async def get_user_daily_usage(user_uuid: str, days: int = DEFAULT_USAGE_WINDOW) -> Optional[Dict]:
+    """Трафик пользователя за последние days дней (включая сегодня)
+
+    Returns:
+        Dict с ключами:
+            daily — список (дата YYYY-MM-DD, байты) по всем дням окна, по возрастанию
+            nodes — список (имя ноды, байты) по убыванию
+            total — сумма за окно
+        или None, если панель не ответила
+    """
+    now = datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    window_start = today_start - timedelta(days=days - 1)
+    today_key = today_start.strftime("%Y-%m-%d")
+
+    history_key = (user_uuid, days, today_key)
+    history = _history_cache.get(history_key)
+    if history is None and days > 1:
+        history = await _fetch(user_uuid, window_start, today_start - timedelta(milliseconds=1))
+        if history is None:
+            return None
+        _history_cache.set(history_key, history)
+
+    today = _today_cache.get((user_uuid, today_key))
+    if today is None:
+        today = await _fetch(user_uuid, today_start, now)
+        if today is None:
+            today = []
+        else:
+            _today_cache.set((user_uuid, today_key), today)
+
+    per_day = {
+        (window_start + timedelta(days=offset)).strftime("%Y-%m-%d"): 0
+        for offset in range(days)
+    }
+    per_node: Dict[str, float] = {}
+
+    for record in (history or []) + today:
+        date = str(record.get('date', ''))[:10]
+        total = record.get('total', 0) or 0
+        if date in per_day:
+            per_day[date] += total
+        node_name = record.get('nodeName') or 'Unknown'
+        per_node[node_name] = per_node.get(node_name, 0) + total
+
+    return {
+        "daily": list(per_day.items()),
+        "nodes": sorted(per_node.items(), key=lambda item: item[1], reverse=True),
+        "total": sum(per_day.values()),
+    }
+
@@ -0,0 +1,43 @@
+"""
+Компактный формат callback_data
+
+Данные кнопки — короткий код действия и аргументы через ":". UUID кодируется
+в 22 символа base64url вместо 36, поэтому в лимит Telegram в 64 байта
+помещаются код действия, UUID и ещё несколько аргументов.
+"""
+import base64
+import uuid
+from typing import List, Tuple
+
+SEPARATOR = ":"
+MAX_CALLBACK_BYTES = 64
+
+
+def pack_uuid(value: str) -> str:
+    """UUID → 22 символа base64url"""
+    return base64.urlsafe_b64encode(uuid.UUID(str(value)).bytes).rstrip(b"=").decode()
+
+
+def unpack_uuid(value: str) -> str:
+    """22 символа base64url → UUID; обычная запись UUID возвращается как есть"""
+    if len(value) == 36:
+        return value
+    return str(uuid.UUID(bytes=base64.urlsafe_b64decode(value + "==")))
+
+
+def pack(action: str, *args) -> str:
+    """Собрать callback_data из кода действия и аргументов
+
+    Raises:
+        ValueError: данные не помещаются в 64 байта
+    """
+    data = SEPARATOR.join([action, *(str(arg) for arg in args)])
+    if len(data.encode()) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data is longer than {MAX_CALLBACK_BYTES} bytes: {data}")
+    return data
+
+
+def unpack(data: str) -> Tuple[str, List[str]]:
+    """Разобрать callback_data на код действия и аргументы"""
+    action, *args = (data or "").split(SEPARATOR)
+    return action, args
@@ -0,0 +1,58 @@
+"""
+Отрисовка PNG-графиков через matplotlib
+
+Функции модуля выполняются в отдельном процессе (ProcessPoolExecutor), поэтому
+принимают и возвращают только простые данные и не импортируют ничего из бота.
+"""
+import io
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+_FIGSIZE = (8, 4.5)
+_DPI = 110
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _to_png(fig) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def render_lines(title: str, lines: Sequence[Tuple[str, List[int], List[float]]], ylabel: str) -> bytes:
+    """Линейный график: lines — список (подпись, unix-время, значения)"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=_FIGSIZE, dpi=_DPI)
+    try:
+        for label, xs, ys in lines:
+            ax.plot([datetime.fromtimestamp(x) for x in xs], ys, label=label, linewidth=1.5)
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        ax.grid(True, alpha=0.3)
+        if len(lines) > 1:
+            ax.legend(loc="upper left", fontsize="small")
+        fig.autofmt_xdate()
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
+
+
+def render_bars(title: str, labels: List[str], values: List[float], ylabel: str) -> bytes:
+    """Столбчатая диаграмма"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=_FIGSIZE, dpi=_DPI)
+    try:
+        bars = ax.bar(labels, values, color="#4a90d9")
+        ax.bar_label(bars, fmt="%d")
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        ax.grid(True, axis="y", alpha=0.3)
+        return _to_png(fig)
+    finally:
+        plt.close(fig)
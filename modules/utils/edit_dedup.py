@@ -0,0 +1,121 @@
+"""
+Дедупликация редактирования сообщений
+
+Request-middleware сессии бота: запоминает хэш текста и клавиатуры, которые
+сейчас показаны в каждом сообщении, и не отправляет в Telegram правку, которая
+ничего не меняет. Если изменилась только клавиатура, правка текста заменяется
+на edit_reply_markup. Ответ "message is not modified" считается успехом.
+"""
+import logging
+from typing import Hashable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup,
+    EditMessageText, Response, SendMessage, TelegramMethod
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message
+
+from modules.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# (хэш текста, хэш клавиатуры)
+Fingerprint = Tuple[int, int]
+
+
+def _message_key(method) -> Optional[Hashable]:
+    if getattr(method, "inline_message_id", None):
+        return method.inline_message_id
+    if getattr(method, "chat_id", None) is not None and getattr(method, "message_id", None) is not None:
+        return method.chat_id, method.message_id
+    return None
+
+
+def _markup_hash(markup) -> int:
+    return hash(markup.model_dump_json(exclude_none=True)) if markup is not None else 0
+
+
+def _text_hash(method) -> int:
+    entities = tuple(entity.model_dump_json() for entity in method.entities or ())
+    return hash((method.text, str(method.parse_mode), entities))
+
+
+def _not_modified(error: TelegramBadRequest) -> bool:
+    return "message is not modified" in str(error)
+
+
+class EditDedupMiddleware(BaseRequestMiddleware):
+    """Пропускает правки сообщений, не меняющие текст и клавиатуру"""
+
+    def __init__(self, max_size: int = 5000, ttl: float = 2 * 86400):
+        self._shown = TTLCache(ttl=ttl, max_size=max_size)
+        self.skipped = 0
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType],
+                       bot: Bot, method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        if isinstance(method, EditMessageText):
+            return await self._edit_text(make_request, bot, method)
+        if isinstance(method, EditMessageReplyMarkup):
+            return await self._edit_markup(make_request, bot, method)
+
+        response = await make_request(bot, method)
+
+        if isinstance(method, SendMessage) and isinstance(response.result, Message):
+            key = (method.chat_id, response.result.message_id)
+            self._shown.set(key, (_text_hash(method), _markup_hash(method.reply_markup)))
+        elif isinstance(method, (EditMessageMedia, EditMessageCaption, DeleteMessage)):
+            # Содержимое сообщения изменилось в обход отслеживаемых правок
+            self._shown.pop(_message_key(method))
+        return response
+
+    def _skip(self) -> Response:
+        self.skipped += 1
+        return Response(ok=True, result=True)
+
+    async def _edit_text(self, make_request, bot: Bot, method: EditMessageText) -> Response:
+        key = _message_key(method)
+        if key is None:
+            return await make_request(bot, method)
+
+        fingerprint = (_text_hash(method), _markup_hash(method.reply_markup))
+        shown: Optional[Fingerprint] = self._shown.get(key)
+        if shown == fingerprint:
+            return self._skip()
+
+        request = method
+        if shown is not None and shown[0] == fingerprint[0]:
+            # Текст тот же — достаточно обновить клавиатуру
+            request = EditMessageReplyMarkup(
+                chat_id=method.chat_id,
+                message_id=method.message_id,
+                inline_message_id=method.inline_message_id,
+                reply_markup=method.reply_markup,
+            )
+        return await self._send(make_request, bot, request, key, fingerprint)
+
+    async def _edit_markup(self, make_request, bot: Bot, method: EditMessageReplyMarkup) -> Response:
+        key = _message_key(method)
+        shown: Optional[Fingerprint] = self._shown.get(key) if key is not None else None
+        if shown is None:
+            return await make_request(bot, method)
+
+        fingerprint = (shown[0], _markup_hash(method.reply_markup))
+        if shown == fingerprint:
+            return self._skip()
+        return await self._send(make_request, bot, method, key, fingerprint)
+
+    async def _send(self, make_request, bot: Bot, method, key: Hashable, fingerprint: Fingerprint) -> Response:
+        try:
+            response = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if not _not_modified(e):
+                self._shown.pop(key)
+                raise
+            # Telegram подтвердил, что в сообщении уже это содержимое
+            response = Response(ok=True, result=True)
+        self._shown.set(key, fingerprint)
+        return response
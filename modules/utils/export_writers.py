@@ -0,0 +1,180 @@
+"""
+Потоковая запись таблиц в файл: CSV, NDJSON, XLSX
+
+Строки пишутся в файл по мере поступления и в памяти не накапливаются.
+XLSX собирается без сторонних библиотек: лист пишется потоком прямо в
+zip-архив, строки хранятся как inline-строки, без общей таблицы строк.
+"""
+import csv
+import gzip
+import io
+import json
+import re
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterable, List, Sequence
+from xml.sax.saxutils import escape
+
+Row = Dict[str, Any]
+
+
+class ExportWriter:
+    """Запись строк в файл; колонки задаются при создании"""
+
+    extension = ""
+    media_type = "application/octet-stream"
+
+    def __init__(self, path: str, columns: Sequence[str], compress: bool = False):
+        self.path = path
+        self.columns = list(columns)
+        self.rows = 0
+
+    def write_rows(self, rows: Iterable[Row]):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_text(path: str, compress: bool) -> io.TextIOBase:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class CsvWriter(ExportWriter):
+    extension = "csv"
+    media_type = "text/csv"
+
+    def __init__(self, path: str, columns: Sequence[str], compress: bool = False):
+        super().__init__(path, columns, compress)
+        self._file = _open_text(path, compress)
+        if not compress:
+            # BOM — чтобы Excel открыл файл в UTF-8
+            self._file.write("\ufeff")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+
+    def write_rows(self, rows: Iterable[Row]):
+        for row in rows:
+            self._csv.writerow(["" if row.get(column) is None else row.get(column) for column in self.columns])
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+
+class NdjsonWriter(ExportWriter):
+    extension = "ndjson"
+    media_type = "application/x-ndjson"
+
+    def __init__(self, path: str, columns: Sequence[str], compress: bool = False):
+        super().__init__(path, columns, compress)
+        self._file = _open_text(path, compress)
+
+    def write_rows(self, rows: Iterable[Row]):
+        for row in rows:
+            record = {column: row.get(column) for column in self.columns}
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str))
+            self._file.write("\n")
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+
+# Символы, запрещённые в XML 1.0
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value: Any) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxWriter(ExportWriter):
+    """XLSX уже сжат zip'ом, поэтому compress игнорируется"""
+
+    extension = "xlsx"
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    def __init__(self, path: str, columns: Sequence[str], compress: bool = False):
+        super().__init__(path, columns, compress)
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_STATIC.items():
+            self._zip.writestr(name, content)
+        self._sheet: BinaryIO = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._write_row(self.columns)
+
+    def _write(self, text: str):
+        self._sheet.write(text.encode("utf-8"))
+
+    def _write_row(self, values: List[Any]):
+        self._write("<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>")
+
+    def write_rows(self, rows: Iterable[Row]):
+        for row in rows:
+            self._write_row([row.get(column) for column in self.columns])
+            self.rows += 1
+
+    def close(self):
+        self._write("</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+EXPORT_FORMATS = {
+    "csv": CsvWriter,
+    "ndjson": NdjsonWriter,
+    "xlsx": XlsxWriter,
+}
@@ -2,6 +2,7 @@
 Утилиты для форматирования данных в Aiogram боте
 """
 import datetime
+import re
 from typing import Dict, Any, List
 
 def format_bytes(bytes_value: int) -> str:
@@ -22,6 +23,47 @@ def format_bytes(bytes_value: int) -> str:
     else:
         return f"{size:.1f} {units[unit_index]}"
 
+def parse_bytes(value: Any) -> int:
+    """Разобрать размер вида '12.5 GiB' / '300 MB' / 1024 в байты"""
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip().replace(",", ".")
+    if not text:
+        return 0
+
+    match = re.match(r"^(-?\d+(?:\.\d+)?)\s*([A-Za-z]*)", text)
+    if not match:
+        return 0
+    amount = float(match.group(1))
+
+    unit = match.group(2).upper().replace("I", "")
+    multipliers = {
+        "": 1, "B": 1,
+        "KB": 1024, "K": 1024,
+        "MB": 1024 ** 2, "M": 1024 ** 2,
+        "GB": 1024 ** 3, "G": 1024 ** 3,
+        "TB": 1024 ** 4, "T": 1024 ** 4,
+        "PB": 1024 ** 5, "P": 1024 ** 5,
+    }
+    return int(amount * multipliers.get(unit, 1))
+
+def format_sparkline(values: List[float]) -> str:
+    """Построить текстовый мини-график из ряда значений"""
+    if not values:
+        return ""
+
+    bars = "▁▂▃▄▅▆▇█"
+    low = min(values)
+    high = max(values)
+    if high == low:
+        return (bars[0] if high == 0 else bars[3]) * len(values)
+
+    scale = (len(bars) - 1) / (high - low)
+    return "".join(bars[int(round((value - low) * scale))] for value in values)
+
 def format_duration(seconds: int) -> str:
     """Форматировать длительность в человекочитаемый формат"""
     if seconds <= 0:
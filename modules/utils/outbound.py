@@ -0,0 +1,160 @@
+"""
+Исходящие запросы к Telegram: ограничение скорости и слияние правок
+
+Request-middleware сессии бота пропускает сообщения через два token bucket —
+общий на бота и отдельный на каждый чат — и при 429 ждёт retry_after вместо
+ошибки в хэндлере. Для прогресса длительных операций есть неблокирующая
+очередь правок: пока правка сообщения ждёт бюджета, новые правки того же
+сообщения заменяют её, и в Telegram уходит только последняя.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+from aiogram import Bot, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, EditMessageText, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from modules.config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять запрос после 429
+_MAX_RETRIES = 3
+
+MessageKey = Tuple[int, int]
+
+
+class TokenBucket:
+    """Token bucket с FIFO-очередью ожидающих"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(0.01, rate)
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд (ответ 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """Ограничение исходящих сообщений и очередь сливаемых правок"""
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 chat_rate: float = TELEGRAM_CHAT_RATE, chat_burst: int = TELEGRAM_CHAT_BURST):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        self._order: Dict[Hashable, asyncio.Lock] = {}
+        self._pending: Dict[MessageKey, Tuple[Bot, EditMessageText]] = {}
+        self._flushers: Dict[MessageKey, asyncio.Task] = {}
+        self._own: Set[int] = set()
+        self.coalesced = 0
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    # ---------- Middleware ----------
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType],
+                       bot: Bot, method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery и прочие запросы не про сообщения в чатах
+            return await make_request(bot, method)
+
+        if isinstance(method, (EditMessageText, DeleteMessage)) and id(method) not in self._own:
+            # Прямая правка или удаление важнее отложенного прогресса этого сообщения
+            self.discard(chat_id, method.message_id)
+
+        bucket = self._chat_bucket(chat_id)
+        # Запросы в один чат уходят строго по очереди: итог операции не обгонит её прогресс
+        async with self._order.setdefault(chat_id, asyncio.Lock()):
+            for attempt in range(_MAX_RETRIES + 1):
+                await bucket.acquire()
+                await self._global.acquire()
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    if attempt == _MAX_RETRIES:
+                        raise
+                    logger.warning(f"Flood control for chat {chat_id}: retry after {e.retry_after}s")
+                    bucket.block(e.retry_after)
+
+    # ---------- Сливаемые правки ----------
+
+    def edit(self, message: types.Message, text: str,
+             reply_markup: Optional[types.InlineKeyboardMarkup] = None):
+        """Поставить правку сообщения в очередь, не дожидаясь отправки
+
+        Если предыдущая правка этого сообщения ещё не отправлена, она заменяется.
+        """
+        key = (message.chat.id, message.message_id)
+        if key in self._pending:
+            self.coalesced += 1
+        method = EditMessageText(
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            text=text,
+            reply_markup=reply_markup
+        )
+        self._pending[key] = (message.bot, method)
+
+        flusher = self._flushers.get(key)
+        if flusher is None or flusher.done():
+            self._flushers[key] = asyncio.create_task(self._flush(key), name=f"outbound-edit-{key}")
+
+    def discard(self, chat_id: int, message_id: int):
+        """Отменить неотправленную правку сообщения"""
+        self._pending.pop((chat_id, message_id), None)
+
+    async def _flush(self, key: MessageKey):
+        try:
+            while key in self._pending:
+                bot, method = self._pending.pop(key)
+                self._own.add(id(method))
+                try:
+                    await bot(method)
+                except Exception as e:
+                    logger.warning(f"Queued edit of {key} failed: {e}")
+                finally:
+                    self._own.discard(id(method))
+        finally:
+            self._flushers.pop(key, None)
+
+
+_limiter: Optional[OutboundLimiter] = None
+
+
+def get_outbound() -> OutboundLimiter:
+    """Общий ограничитель исходящих запросов"""
+    global _limiter
+    if _limiter is None:
+        _limiter = OutboundLimiter()
+    return _limiter
@@ -0,0 +1,39 @@
+"""
+Кэш готовых страниц списков (текст + клавиатура)
+
+Ключ — (экран, сортировка, фильтр, страница, поколение данных). Поколение
+меняется при каждой новой загрузке списка, поэтому листание внутри одной
+загрузки берёт готовую страницу из кэша, а после обновления старые записи
+просто вытесняются.
+"""
+import itertools
+from typing import Hashable, Optional, Tuple
+
+from aiogram import types
+
+from modules.utils.cache import TTLCache
+
+RenderedPage = Tuple[str, types.InlineKeyboardMarkup]
+
+# Даты в строках («осталось N дн.») со временем устаревают — держим недолго
+_RENDER_TTL = 300
+
+_pages = TTLCache(ttl=_RENDER_TTL, max_size=256)
+_generations = itertools.count(1)
+
+
+def new_generation() -> int:
+    """Номер поколения для только что загруженного списка"""
+    return next(_generations)
+
+
+def page_key(view: str, page: int, generation: Hashable, sort: str = "", filter: str = "") -> Hashable:
+    return view, sort, filter, page, generation
+
+
+def get_rendered(key: Hashable) -> Optional[RenderedPage]:
+    return _pages.get(key)
+
+
+def remember_rendered(key: Hashable, text: str, markup: types.InlineKeyboardMarkup):
+    _pages.set(key, (text, markup))
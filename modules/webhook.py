@@ -0,0 +1,80 @@
+"""
+Режим webhook: встроенный aiohttp-сервер вместо long polling
+
+Telegram сам отправляет обновления на WEBHOOK_URL + WEBHOOK_PATH, запросы
+проверяются по секретному токену. Обработка идёт в фоне, число одновременно
+обрабатываемых обновлений ограничено WEBHOOK_MAX_CONCURRENT.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from modules.config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_CONCURRENT
+)
+
+logger = logging.getLogger(__name__)
+
+# Telegram принимает max_connections в диапазоне 1-100
+_MAX_CONNECTIONS_LIMIT = 100
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Ограничивает число обновлений, которые обрабатываются одновременно"""
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
+
+
+def _webhook_url() -> str:
+    return WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH
+
+
+async def _set_webhook(bot: Bot, dispatcher: Dispatcher):
+    await bot.set_webhook(
+        url=_webhook_url(),
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        max_connections=min(_MAX_CONNECTIONS_LIMIT, max(1, WEBHOOK_MAX_CONCURRENT)),
+        drop_pending_updates=True
+    )
+    logger.info(f"Webhook set to {_webhook_url()}")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Запустить aiohttp-сервер и зарегистрировать webhook в Telegram"""
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set: webhook requests are not authenticated")
+
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(WEBHOOK_MAX_CONCURRENT))
+    dp.startup.register(_set_webhook)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=WEBHOOK_SECRET or None
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()